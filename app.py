@@ -1,11 +1,16 @@
 import streamlit as st
-import pandas as pd
-import joblib
-import numpy as np
-import matplotlib.pyplot as plt
-from datetime import datetime
 from PIL import Image
 
+from src.atribuicao import desenhar as desenhar_atribuicao
+from src.cache import atribuicao_niveis, carregar_ativo, projetar_niveis
+from src.estresse_reverso import resolver
+from src.graficos import chave_grafico, png
+from src.instrumentacao import medir, painel, rotulos, rotulado
+from src.monte_carlo import processo_historico, processo_manual, projetar_caminhos, resumir
+from src.paralelo import pool, submeter
+from src.registro import ErroArtefato
+from src.simulacao import detectar_escala
+
 # Configuração
 Image.MAX_IMAGE_PIXELS = None
 st.set_page_config(page_title="Simulador Macro", layout="wide", page_icon="📈")
@@ -14,80 +19,90 @@ st.title("📈 Simulador de Cenários Econômicos")
 st.markdown("Sensibilidade: Selic (Geral), IPCA (Consumo) e Dólar (Rural).")
 
 # Funções
-def load_assets(segmento):
+def load_assets(carga):
+    # O registro devolve o bundle do segmento (ou os .pkl/.csv soltos, se a pasta não foi migrada)
+    # Ridge + StandardScaler já vêm compilados em (pesos, bias)
+    # Cache de processo: só relê o disco quando algum arquivo do segmento muda (mtime)
+    # A carga roda no pool de threads; aqui só lemos o resultado (e mostramos o erro na thread do script)
+    # Devolve o Ativo inteiro: a versão dele entra na chave do cache de projeções
     try:
-        model = joblib.load(f"models/model_{segmento}.pkl")
-        scaler = joblib.load(f"models/scaler_{segmento}.pkl")
-        cols = pd.read_csv(f"models/columns_{segmento}.csv").columns.tolist()
-        last_vals = pd.read_csv(f"models/last_values_{segmento}.csv", index_col=0).squeeze()
-        return model, scaler, cols, last_vals
+        return carga.result()
+    except ErroArtefato as e:
+        st.error(f"ERRO CRÍTICO: {e}")
+        return None
     except FileNotFoundError:
-        return None, None, None, None
+        return None
 
-def predict_scenario(model, scaler, feature_names, inputs_iniciais, selic_trend, ipca_trend, dolar_trend, months=18, is_decimal=False):
+def montar_projecao(segmento, ativo, inputs_iniciais, trends, is_decimal, estresse_mc=None, referencia=None):
     """
-    Simulação Completa com correção de escala (Decimal vs Porcentagem)
+    Pipeline de um segmento (roda no pool de threads): projeções + gráfico, sem tocar no Streamlit.
+    - estresse_mc: (processo, n_caminhos) liga o leque Monte Carlo em volta do cenário do usuário
+    - referencia: "estavel" ou "inicio" liga a atribuição por fator (barras empilhadas abaixo do gráfico)
     """
-    predictions = []
-    current_input = inputs_iniciais.copy()
+    # Passamos o flag 'is_decimal' para a função saber se precisa dividir por 100
+    # Projeções memorizadas (entre sessões): o "Cenário Estável" só muda com os valores iniciais
+    projecao = projetar_niveis(ativo, inputs_iniciais, *trends, is_decimal=is_decimal).tolist()
+    projecao_base = projetar_niveis(ativo, inputs_iniciais, 0.0, 0.0, 0.0, is_decimal=is_decimal).tolist()
     
-    # --- AJUSTE DE ESCALA (TRADUÇÃO) ---
-    # Se o modelo foi treinado em decimais (0.10), mas o usuário digitou (10.0),
-    # nós convertemos as entradas iniciais para decimal antes de começar.
-    if is_decimal:
-        base_selic = float(current_input.get('selic_lag_6', 0.10)) / 100
-        base_ipca = float(current_input.get('ipca_lag_6', 0.005)) / 100
-    else:
-        base_selic = float(current_input.get('selic_lag_6', 10.0))
-        base_ipca = float(current_input.get('ipca_lag_6', 0.5))
-        
-    base_dolar = float(current_input.get('dolar_ptax_lag_6', 5.0)) 
+    resumo = None
+    if estresse_mc is not None:
+        # Mesma semente a cada rerun: o leque não "pisca" quando outro controle muda
+        processo, n_caminhos = estresse_mc
+        desvios = processo.simular(n_caminhos, 18, rng=0)
+        selic_trend, ipca_trend, dolar_trend = trends
+        resumo = resumir(projetar_caminhos(
+            ativo.model, ativo.scaler, ativo.cols, inputs_iniciais, desvios, is_decimal=is_decimal,
+            selic_trend=selic_trend, ipca_trend=ipca_trend, dolar_trend=dolar_trend
+        ))
     
-    current_month = int(current_input.get('mes', datetime.now().month))
+    # Gráfico: PNG memorizado pelos valores desenhados (mesma posição dos sliders = consulta ao cache)
+    # A Figure é a da thread do pool, reaproveitada e limpa a cada desenho: nada fica vivo entre reruns
+    def desenhar(fig):
+        ax = fig.subplots()
     
-    for i in range(months):
-        # 1. Atualizar Economia
-        # A tendência vem do slider (ex: +0.5). 
-        # Se for decimal, temos que dividir a tendência também? 
-        # R: Sim! Se o modelo opera em 0.10, um aumento de 1% é +0.01
-        
-        factor = 100 if is_decimal else 1
-        
-        new_selic = max(0, (base_selic * factor) + (selic_trend * (i+1)))
-        new_ipca = max(-1, (base_ipca * factor) + (ipca_trend * (i+1)))
-        
-        # Devolve para a escala do modelo
-        current_input['selic_lag_6'] = new_selic / factor if is_decimal else new_selic
-        current_input['ipca_lag_6'] = new_ipca / factor if is_decimal else new_ipca
-        
-        if 'dolar_ptax_lag_6' in feature_names:
-            current_input['dolar_ptax_lag_6'] = max(2.0, base_dolar + (dolar_trend * (i+1)))
-        
-        # 2. Sazonalidade
-        current_month += 1
-        if current_month > 12: current_month = 1
-        
-        if 'mes' in feature_names: current_input['mes'] = current_month
-        if 'periodo_safra' in feature_names: 
-            current_input['periodo_safra'] = 1 if current_month in [2,3,4,5] else 0
-            
-        # 3. Prever
-        df_input = pd.DataFrame([current_input])
-        df_input = df_input.reindex(columns=feature_names, fill_value=0)
-        
-        scaled = scaler.transform(df_input)
-        pred = model.predict(scaled)[0]
-        
-        # Se o alvo também foi treinado em decimal (ex: inadimplencia 0.03), multiplicamos por 100 para mostrar bonito
-        # Mas geralmente inadimplência já está em % no banco de dados. Vamos assumir que sim.
-        pred = max(0.0, pred)
-        
-        predictions.append(pred)
-        
-    return predictions
+        # Cores temáticas
+        cor_linha = '#2ca02c' if 'Rural' in segmento else '#1f77b4'
+    
+        if resumo is not None:
+            # Leque: faixa P5–P95, mediana e expected shortfall (média dos 5% piores caminhos)
+            ax.fill_between(range(1, 19), resumo["p5"], resumo["p95"], color=cor_linha, alpha=0.15, label="Monte Carlo P5–P95")
+            ax.plot(range(1, 19), resumo["p50"], linewidth=1.5, color=cor_linha, alpha=0.7, label="Mediana (P50)")
+            ax.plot(range(1, 19), resumo["es95"], linestyle=':', linewidth=2, color='#d62728', label="Expected Shortfall 95%")
+    
+        ax.plot(range(1, 19), projecao, marker='o', linewidth=3, color=cor_linha, label="Seu Cenário")
+        ax.plot(range(1, 19), projecao_base, linestyle='--', color='gray', alpha=0.5, label="Cenário Estável")
+    
+        titulo_grafico = nomes_limpos.get(segmento, segmento)
+        ax.set_title(f"Projeção: {titulo_grafico}", fontsize=14)
+        ax.set_xlabel("Meses à Frente")
+        ax.set_ylabel("Inadimplência (%)")
+        ax.legend()
+        ax.grid(True, linestyle='--', alpha=0.3)
+    
+        y_vals = projecao + projecao_base
+        if resumo is not None:
+            y_vals = y_vals + resumo["p5"].tolist() + resumo["es95"].tolist()
+        # Evita crash se lista vazia
+        if len(y_vals) > 0:
+            ax.set_ylim(min(y_vals)*0.95, max(y_vals)*1.05)
+
+    with medir("render"):
+        imagem = png(chave_grafico("app", segmento, projecao, projecao_base, resumo), desenhar)
+
+    # Atribuição por fator: quanto de cada mês vem da Selic, do IPCA, do Dólar e da sazonalidade
+    imagem_atribuicao = None
+    if referencia is not None:
+        atribuicao = atribuicao_niveis(ativo, inputs_iniciais, *trends, is_decimal=is_decimal, referencia=referencia)
+        titulo = f"Contribuição por Fator: {nomes_limpos.get(segmento, segmento)}"
+        with medir("render"):
+            imagem_atribuicao = png(
+                chave_grafico("app_atribuicao", segmento, referencia, atribuicao["grupos"], atribuicao["projecao"], atribuicao["referencia"]),
+                lambda fig: desenhar_atribuicao(fig.subplots(), atribuicao, titulo)
+            )
+    
+    return projecao, projecao_base, imagem, resumo, imagem_atribuicao
 
 # Interface
-tabs = st.tabs(["👤 Pessoa Física", "🏢 Pessoa Jurídica", "🚜 Rural PF", "🚜 Rural PJ"])
 mapa = {"👤 Pessoa Física": "PF", "🏢 Pessoa Jurídica": "PJ", "🚜 Rural PF": "Rural_PF", "🚜 Rural PJ": "Rural_PJ"}
 
 nomes_limpos = {
@@ -95,14 +110,27 @@ nomes_limpos = {
     "Rural_PF": "Rural Pessoa Física", "Rural_PJ": "Rural Pessoa Jurídica"
 }
 
+# Abas com estado: só a aba aberta simula (as outras só mostram os parâmetros)
+# Versões do Streamlit sem esse recurso caem nas abas comuns, e aí todas simulam
+try:
+    tabs = st.tabs(list(mapa.keys()), key="aba_segmento", on_change="rerun")
+except TypeError:
+    tabs = st.tabs(list(mapa.keys()))
+
+# Os quatro segmentos carregam em paralelo (depois da primeira vez, é só o cache de processo)
+cargas = submeter(carregar_ativo, mapa.values())
+pendentes = {}
+
 for tab_name, segmento in mapa.items():
-    with tabs[list(mapa.keys()).index(tab_name)]:
+    tab = tabs[list(mapa.keys()).index(tab_name)]
+    with tab:
         
-        model, scaler, cols, last_vals = load_assets(segmento)
+        ativo = load_assets(cargas[segmento])
         
-        if not model:
+        if ativo is None:
             st.error(f"Modelo para {segmento} não encontrado.")
             continue
+        last_vals = ativo.last_vals
             
         c1, c2 = st.columns([1, 2])
         
@@ -110,14 +138,8 @@ for tab_name, segmento in mapa.items():
             st.subheader("Cenário Macro")
             
             # --- DETECTOR DE ESCALA ---
-            # Verifica se a Selic salva está em decimal (ex: 0.11) ou % (11.0)
-            raw_selic = float(last_vals.get('selic_lag_6', 10.0))
-            is_decimal = raw_selic < 1.0 # Se for menor que 1, assumimos que é decimal
-            
             # Valores para EXIBIÇÃO (Sempre em %)
-            display_selic = raw_selic * 100 if is_decimal else raw_selic
-            display_ipca = float(last_vals.get('ipca_lag_6', 0.5))
-            if is_decimal and display_ipca < 1: display_ipca *= 100
+            is_decimal, display_selic, display_ipca = detectar_escala(last_vals)
                 
             start_selic = st.number_input("Selic Inicial (%)", value=display_selic, step=0.5, key=f"s_{segmento}")
             
@@ -138,40 +160,92 @@ for tab_name, segmento in mapa.items():
             inputs_iniciais = last_vals.copy()
             inputs_iniciais['selic_lag_6'] = start_selic 
             inputs_iniciais['ipca_lag_6'] = start_ipca
-            if 'dolar_ptax_lag_6' in inputs_iniciais.index:
+            if 'dolar_ptax_lag_6' in inputs_iniciais:
                 inputs_iniciais['dolar_ptax_lag_6'] = start_dolar
 
-        with c2:
-            try:
-                # Passamos o flag 'is_decimal' para a função saber se precisa dividir por 100
-                projecao = predict_scenario(model, scaler, cols, inputs_iniciais, trend_selic, trend_ipca, trend_dolar, is_decimal=is_decimal)
-                projecao_base = predict_scenario(model, scaler, cols, inputs_iniciais, 0.0, 0.0, 0.0, is_decimal=is_decimal)
-                
-                # Gráfico
-                fig, ax = plt.subplots(figsize=(10, 5))
-                
-                # Cores temáticas
-                cor_linha = '#2ca02c' if 'Rural' in segmento else '#1f77b4'
-                
-                ax.plot(range(1, 19), projecao, marker='o', linewidth=3, color=cor_linha, label="Seu Cenário")
-                ax.plot(range(1, 19), projecao_base, linestyle='--', color='gray', alpha=0.5, label="Cenário Estável")
-                
-                titulo_grafico = nomes_limpos.get(segmento, segmento)
-                ax.set_title(f"Projeção: {titulo_grafico}", fontsize=14)
-                ax.set_xlabel("Meses à Frente")
-                ax.set_ylabel("Inadimplência (%)")
-                ax.legend()
-                ax.grid(True, linestyle='--', alpha=0.3)
-                
-                y_vals = projecao + projecao_base
-                # Evita crash se lista vazia
-                if len(y_vals) > 0:
-                    ax.set_ylim(min(y_vals)*0.95, max(y_vals)*1.05)
-                
-                st.pyplot(fig)
-                
-                var_total = projecao[-1] - projecao[0]
-                st.info(f"Variação Projetada: {var_total:+.2f} pp")
+            # --- ESTRESSE MONTE CARLO ---
+            # Trajetórias aleatórias correlacionadas em volta das tendências acima
+            estresse_mc = None
+            with st.expander("🎲 Estresse Monte Carlo"):
+                if st.toggle("Ativar leque de cenários", key=f"mc_{segmento}"):
+                    n_caminhos = st.select_slider("Caminhos", [1000, 5000, 10000, 20000], value=10000, key=f"mcn_{segmento}")
+                    origem = st.radio(
+                        "Volatilidade", ["Histórica (AR(1))", "Histórica (Passeio Aleatório)", "Informada"],
+                        key=f"mco_{segmento}"
+                    )
+                    if origem == "Informada":
+                        vols = (
+                            st.number_input("Selic (pp/mês)", 0.0, 5.0, 0.25, 0.05, key=f"mvs_{segmento}"),
+                            st.number_input("IPCA (pp/mês)", 0.0, 2.0, 0.10, 0.01, key=f"mvi_{segmento}"),
+                            st.number_input("Dólar (R$/mês)", 0.0, 2.0, 0.15, 0.05, key=f"mvd_{segmento}"),
+                        )
+                        processo = processo_manual(vols, is_decimal=is_decimal)
+                    else:
+                        processo = processo_historico("ar1" if "AR(1)" in origem else "passeio")
+                    estresse_mc = (processo, n_caminhos)
+
+            # --- ESTRESSE REVERSO ---
+            # A pergunta inversa: qual tendência mínima leva o segmento ao limite? (forma fechada no Ridge)
+            with st.expander("🎯 Estresse Reverso"):
+                if st.toggle("Buscar cenário de ruptura", key=f"rr_{segmento}"):
+                    limite = st.number_input("Limite de Inadimplência (%)", 0.0, 100.0, 6.0, 0.25, key=f"rl_{segmento}")
+                    mes_limite = st.select_slider("Até o mês", [3, 6, 12, 18], value=12, key=f"rm_{segmento}")
+                    moveis = st.multiselect("Podem se mover", ["Selic", "IPCA", "Dólar"], default=["Selic"], key=f"rv_{segmento}")
+                    variaveis = [{"Selic": "selic", "IPCA": "ipca", "Dólar": "dolar"}[nome] for nome in moveis]
+                    ruptura = resolver(ativo.model, ativo.scaler, ativo.cols, inputs_iniciais, limite, mes_limite, variaveis, is_decimal) if variaveis else None
+                    if ruptura is None:
+                        st.caption("Nenhum cenário dentro dos limites de tendência atinge esse nível.")
+                    else:
+                        st.caption(
+                            f"Selic {ruptura['selic_trend']:+.3f} pp/mês | IPCA {ruptura['ipca_trend']:+.3f} pp/mês | "
+                            f"Dólar {ruptura['dolar_trend']:+.3f} R$/mês → {ruptura['pico']:.2f}% no mês {ruptura['mes_ruptura']} "
+                            f"(severidade {ruptura['severidade']:.2f} dp, {ruptura['metodo']})"
+                        )
+
+            # --- ATRIBUIÇÃO POR FATOR ---
+            # De onde vem a diferença para o Cenário Estável: contribuição de cada fator, mês a mês
+            referencia = None
+            with st.expander("🧩 Atribuição por Fator"):
+                if st.toggle("Mostrar contribuição por fator", key=f"af_{segmento}"):
+                    comparar = st.radio(
+                        "Comparar com", ["Cenário Estável (mesmo mês)", "Cenário Estável (mês 1)"],
+                        key=f"afr_{segmento}"
+                    )
+                    referencia = "estavel" if "mesmo mês" in comparar else "inicio"
+
+        # open é None quando as abas não guardam estado: nesse caso todas simulam
+        if getattr(tab, "open", None) is not False:
+            futuro = pool().submit(
+                rotulado, segmento, montar_projecao, segmento, ativo, inputs_iniciais,
+                (trend_selic, trend_ipca, trend_dolar), is_decimal, estresse_mc, referencia
+            )
+            pendentes[segmento] = (c2, futuro)
+
+# Monta a tela depois que todos os segmentos foram enviados ao pool:
+# o tempo da interação fica limitado pelo segmento mais lento, não pela soma
+for segmento, (c2, futuro) in pendentes.items():
+    with c2:
+        try:
+            projecao, projecao_base, imagem, resumo, imagem_atribuicao = futuro.result()
+            
+            with rotulos(segmento), medir("exibicao"):
+                st.image(imagem, width="stretch")
+            
+            var_total = projecao[-1] - projecao[0]
+            st.info(f"Variação Projetada: {var_total:+.2f} pp")
+            
+            if resumo is not None:
+                st.caption(
+                    f"Mês 18 — P5: {resumo['p5'][-1]:.2f}% | P50: {resumo['p50'][-1]:.2f}% | "
+                    f"P95: {resumo['p95'][-1]:.2f}% | Expected Shortfall 95%: {resumo['es95'][-1]:.2f}%"
+                )
+
+            if imagem_atribuicao is not None:
+                with rotulos(segmento), medir("exibicao"):
+                    st.image(imagem_atribuicao, width="stretch")
+
+        except Exception as e:
+            st.error(f"Erro: {e}")
 
-            except Exception as e:
-                st.error(f"Erro: {e}")
\ No newline at end of file
+# Painel de diagnóstico (só com SIMULADOR_PERFIL=1)
+painel(st)
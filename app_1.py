@@ -1,9 +1,11 @@
 import streamlit as st
-import pandas as pd
-import joblib
 import numpy as np
-import plotly.graph_objects as go
-from pathlib import Path
+
+from src.cache import carregar_ativo
+from src.graficos import chave_grafico, plotly
+from src.instrumentacao import fixar_rotulos, medir, painel
+from src.sensibilidade import curvas_resposta, jacobiano, tornado
+from src.simulacao import predict_rows, vetor_entrada
 
 # --- 1. Configuração da Página ---
 st.set_page_config(
@@ -29,21 +31,18 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- 2. Funções de Carga ---
-@st.cache_resource
 def load_model_assets(segmento):
     """
     Carrega o Modelo, Scaler, Lista de Colunas e Metadados para o segmento escolhido.
     """
-    base_path = Path("models")
-    
     try:
-        model = joblib.load(base_path / f"model_{segmento}.pkl")
-        scaler = joblib.load(base_path / f"scaler_{segmento}.pkl")
-        cols_df = pd.read_csv(base_path / f"columns_{segmento}.csv")
-        cols = cols_df.columns.tolist()
-        meta = joblib.load(base_path / f"meta_{segmento}.pkl")
+        # Bundle do registro (ou arquivos soltos); modelos lineares já vêm com o scaler dobrado nos coeficientes
+        # O cache de processo (compartilhado com os outros apps) recarrega sozinho se o modelo for retreinado
+        ativo = carregar_ativo(segmento)
+        if ativo.meta is None:
+            return None, None, None, None
         
-        return model, scaler, cols, meta
+        return ativo.model, ativo.scaler, ativo.cols, ativo.meta
     except FileNotFoundError:
         return None, None, None, None
 
@@ -71,6 +70,7 @@ with col_select:
     )
 
 # Carga dos Dados
+fixar_rotulos(segmento_escolhido)
 model, scaler, feature_cols, meta = load_model_assets(segmento_escolhido)
 
 if model is None:
@@ -115,28 +115,13 @@ st.sidebar.caption("*Demais variáveis são mantidas no último valor observado
 
 # --- 5. Processamento da Previsão ---
 
-# A. Montar o DataFrame de Entrada
-df_input = pd.DataFrame([last_features])
-
-# Garantir que o DF tenha todas as colunas esperadas pelo modelo, na ordem certa
-for col in feature_cols:
-    if col not in df_input.columns:
-        df_input[col] = 0
-
-# Reordenar colunas
-df_input = df_input[feature_cols]
-
-# B. Atualizar com os inputs do usuário
-for col, val in input_values.items():
-    if col in df_input.columns:
-        df_input[col] = val
-    
-    if f"{col}_lag_3" in df_input.columns: df_input[f"{col}_lag_3"] = val
-    if f"{col}_lag_6" in df_input.columns: df_input[f"{col}_lag_6"] = val
+# A. Montar o vetor de entrada (NumPy puro, sem DataFrame)
+# Todas as colunas esperadas pelo modelo, na ordem certa; as ausentes ficam em 0
+# B. Atualizar com os inputs do usuário (os lags de 3, 6 e 12 meses seguem o histórico observado)
+x_input = vetor_entrada(feature_cols, last_features, input_values)
 
 # C. Escalar e Prever
-X_scaled = scaler.transform(df_input)
-delta_pred = model.predict(X_scaled)[0]
+delta_pred = predict_rows(model, scaler, x_input[None, :])[0]
 
 # D. Calcular Resultado Final
 # Previsão = Ponto de Partida (Simulado) + Variação Prevista
@@ -180,59 +165,103 @@ with c3:
     st.markdown('</div>', unsafe_allow_html=True)
 
 # --- 7. Gráfico de Sensibilidade ---
+# Import tardio: o Plotly só é carregado depois que a previsão já está na tela
+import plotly.graph_objects as go
+
 st.markdown("---")
 st.subheader("🔎 Análise de Sensibilidade: Selic vs Inadimplência")
 st.markdown("Como a taxa de juros impacta este modelo específico, mantendo os outros fatores constantes?")
 
 # Gerar dados para o gráfico
 selic_range = np.linspace(2.0, 25.0, 40)
-preds_sensibilidade = []
-
-# Loop para simular vários cenários de Selic
-X_temp = df_input.copy()
-idx_selic = df_input.columns.get_loc("selic") if "selic" in df_input.columns else -1
-
-if idx_selic != -1:
-    # Matriz repetida (otimização numpy)
-    X_sens = np.tile(X_temp.values, (len(selic_range), 1))
-    # Substituir coluna Selic
-    X_sens[:, idx_selic] = selic_range
-    # Escalar
-    X_sens_scaled = scaler.transform(X_sens)
-    # Prever Deltas
-    deltas = model.predict(X_sens_scaled)
-    # Somar à base
-    preds_final = inad_anterior_simulada + deltas
+
+# Curvas de reação de todas as features numa avaliação só (a Selic usa a faixa fixa acima)
+grades_fixas = {"selic": selic_range} if "selic" in feature_cols else None
+_, curvas_sens = curvas_resposta(model, scaler, feature_cols, x_input, grades=grades_fixas, n_pontos=len(selic_range))
+
+if "selic" in feature_cols:
+    # Somar os deltas à base
+    preds_final = inad_anterior_simulada + curvas_sens[feature_cols.index("selic")]
     
-    # Plotly
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=selic_range, 
-        y=preds_final,
-        mode='lines',
-        name='Curva de Reação',
-        line=dict(color='#ff4b4b', width=3)
-    ))
+    # Figura memorizada pelos valores desenhados: só é montada quando a curva ou o ponto mudam
+    def montar_curva():
+        # Plotly
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=selic_range, 
+            y=preds_final,
+            mode='lines',
+            name='Curva de Reação',
+            line=dict(color='#ff4b4b', width=3)
+        ))
     
-    # Marcador do ponto escolhido
-    fig.add_trace(go.Scatter(
-        x=[selic_input],
-        y=[previsao_final],
-        mode='markers',
-        name='Sua Escolha',
-        marker=dict(color='black', size=12)
-    ))
+        # Marcador do ponto escolhido
+        fig.add_trace(go.Scatter(
+            x=[selic_input],
+            y=[previsao_final],
+            mode='markers',
+            name='Sua Escolha',
+            marker=dict(color='black', size=12)
+        ))
     
-    fig.update_layout(
-        title="Curva de Sensibilidade da Selic",
-        xaxis_title="Taxa Selic (%)",
-        yaxis_title=f"Inadimplência Prevista {segmento_escolhido} (%)",
-        height=400,
-        hovermode="x unified"
-    )
-    st.plotly_chart(fig, use_container_width=True)
+        fig.update_layout(
+            title="Curva de Sensibilidade da Selic",
+            xaxis_title="Taxa Selic (%)",
+            yaxis_title=f"Inadimplência Prevista {segmento_escolhido} (%)",
+            height=400,
+            hovermode="x unified"
+        )
+        return fig
+
+    with medir("render"):
+        fig = plotly(chave_grafico("app_1_selic", segmento_escolhido, preds_final, selic_input, previsao_final), montar_curva)
+    with medir("exibicao"):
+        st.plotly_chart(fig, use_container_width=True)
 else:
     st.warning("A variável 'selic' não foi encontrada nas features deste modelo específico.")
 
+# --- 8. Tornado: Todos os Drivers ---
+st.markdown("---")
+st.subheader("🌪️ Principais Drivers do Modelo")
+st.markdown("Impacto na previsão de um choque de ±1 desvio padrão em cada variável, mantendo as demais constantes.")
+
+impacto_baixo, impacto_alto = tornado(model, scaler, x_input)
+# Plotly desenha de baixo para cima: o maior impacto fica no topo
+ordem = np.argsort(np.abs(impacto_alto - impacto_baixo))
+nomes_drivers = [feature_cols[i] for i in ordem]
+
+def montar_tornado():
+    fig_tornado = go.Figure()
+    fig_tornado.add_trace(go.Bar(
+        y=nomes_drivers, x=impacto_baixo[ordem],
+        orientation='h', name='-1 desvio', marker_color='#00C853'
+    ))
+    fig_tornado.add_trace(go.Bar(
+        y=nomes_drivers, x=impacto_alto[ordem],
+        orientation='h', name='+1 desvio', marker_color='#ff4b4b'
+    ))
+    fig_tornado.update_layout(
+        barmode='overlay',
+        xaxis_title="Impacto na Inadimplência Prevista (p.p.)",
+        height=max(300, 30 * len(feature_cols)),
+        hovermode="y unified"
+    )
+    return fig_tornado
+
+with medir("render"):
+    fig_tornado = plotly(chave_grafico("app_1_tornado", nomes_drivers, impacto_baixo[ordem], impacto_alto[ordem]), montar_tornado)
+with medir("exibicao"):
+    st.plotly_chart(fig_tornado, use_container_width=True)
+
+with st.expander("Derivadas parciais (p.p. de inadimplência por unidade da variável)"):
+    st.dataframe({
+        "Variável": feature_cols,
+        "Valor Atual": x_input.tolist(),
+        "Derivada": jacobiano(model, scaler, x_input).tolist()
+    }, hide_index=True)
+
+# Painel de diagnóstico (só com SIMULADOR_PERFIL=1)
+painel(st)
+
 # Rodapé
 st.caption("Desenvolvido para análise estratégica de risco. Modelo preditivo v1.0")
\ No newline at end of file
@@ -1,10 +1,10 @@
 import streamlit as st
-import pandas as pd
-import joblib
-import numpy as np
-import plotly.graph_objects as go
-from pathlib import Path
-from datetime import datetime
+
+from src.cache import atribuicao_deltas, carregar_ativo, projetar_arena, projetar_deltas
+from src.graficos import chave_grafico, plotly
+from src.instrumentacao import medir, painel, rotulos, rotulado
+from src.paralelo import pool, submeter
+from src.registro import ErroArtefato
 
 # --- 1. Configuração da Página ---
 st.set_page_config(
@@ -30,93 +30,148 @@ Compare como diferentes "cérebros" de Inteligência Artificial reagem a choques
 """)
 
 # --- 2. Carga de Artefatos ---
-@st.cache_resource
-# Trecho ajustado da função load_assets no app_2.py
-
-def load_assets(segmento, algoritmo_nome):
-    base_path = Path("models")
-    
+def load_assets(carga):
     try:
-        model = joblib.load(base_path / f"model_{segmento}_{algoritmo_nome}.pkl")
+        # O registro resolve model_{segmento}_{algoritmo} com o scaler/colunas do segmento
+        # Ridge chega compilado em (pesos, bias); RandomForest e XGBoost em arrays planos de nós (src.compilacao)
+        # Cache de processo por segmento/algoritmo/mtime, compartilhado com app.py e app_1.py
+        # A carga roda no pool de threads; os avisos de erro ficam aqui, na thread do script
+        # Devolve o Ativo inteiro: a versão dele entra na chave do cache de projeções
+        return carga.result()
         
+    except ErroArtefato as e:
         # --- PROTEÇÃO CONTRA O ERRO DE 50 vs 45 ---
-        # Verifica quantas features o modelo espera
-        n_features_model = getattr(model, "n_features_in_", None)
-        
-        # Carrega o Scaler
-        scaler = joblib.load(base_path / f"scaler_{segmento}.pkl")
-        
-        # Verifica se o Scaler bate com o Modelo
-        if n_features_model and scaler.n_features_in_ != n_features_model:
-            st.error(f"ERRO CRÍTICO: O Scaler tem {scaler.n_features_in_} colunas, mas o Modelo quer {n_features_model}.")
-            st.warning("Solução: Delete os arquivos da pasta 'models/' e rode o Notebook de treinamento novamente.")
-            return None, None, None, None
-
-        cols = pd.read_csv(base_path / f"columns_{segmento}.csv").columns.tolist()
-        last_vals = pd.read_csv(base_path / f"last_values_{segmento}.csv", index_col=0).squeeze()
-        
-        return model, scaler, cols, last_vals
+        # O registro confere se Scaler, Modelo e colunas têm o mesmo número de features
+        st.error(f"ERRO CRÍTICO: {e}")
+        st.warning("Solução: Delete os arquivos da pasta 'models/' e rode o Notebook de treinamento novamente.")
+        return None
         
     except FileNotFoundError:
-        return None, None, None, None
+        return None
 
-# --- 3. Motor de Simulação Dinâmica ---
-def run_simulation(model, scaler, feature_names, initial_input, start_inad, selic_trend, months=18):
+def montar_projecao(aba_nome, ativo, algoritmo_nome, start_inad, selic_trend, atribuicao=False):
     """
-    Simula o futuro mês a mês.
-    Lógica:
-    1. Atualiza Selic baseada na tendência escolhida.
-    2. Atualiza Sazonalidade (Mês).
-    3. Prever o Delta.
-    4. Atualiza o valor acumulado.
+    Pipeline de um segmento (roda no pool de threads): projeções + gráfico, sem tocar no Streamlit.
+    - atribuicao: liga o gráfico de contribuição por fator (deltas acumulados contra o Cenário Estável)
     """
-    predictions = []
-    current_inad = start_inad
+    # 1. Simulação "Base" (Selic Constante) e 2. "Cenário" (Com a tendência escolhida)
+    # Projeções memorizadas (entre sessões): a base só depende do modelo e do ponto de partida
+    pred_base = projetar_deltas(ativo, ativo.last_vals, start_inad, 0.0).tolist()
+    pred_scenario = projetar_deltas(ativo, ativo.last_vals, start_inad, selic_trend).tolist()
     
-    # Prepara o dicionário de input inicial
-    current_input = initial_input.copy()
+    # --- Plotagem com Plotly ---
+    # Figura memorizada pelos valores desenhados: só é montada quando a projeção muda
+    def montar():
+        # Import tardio: o backend de gráficos só entra quando há projeção para desenhar
+        import plotly.graph_objects as go
     
-    # Descobre qual mês estamos (pela feature 'mes' ou data atual)
-    current_month = int(current_input.get('mes', datetime.now().month))
+        fig = go.Figure()
     
-    # Valor base da Selic (pega o lag mais recente disponível ou define 10.5 como padrão)
-    selic_base = current_input.get('selic_lag_6', current_input.get('selic', 10.5))
+        meses = list(range(1, 19))
     
-    for i in range(months):
-        # --- A. Choque na Economia (Cenário) ---
-        delta_selic = selic_trend * (i + 1)
-        new_selic = max(2.0, min(30.0, selic_base + delta_selic))
-        
-        for col in feature_names:
-            if 'selic' in col.lower():
-                current_input[col] = new_selic
-        
-        # --- B. Atualiza Sazonalidade ---
-        current_month += 1
-        if current_month > 12: current_month = 1
-        
-        if 'mes' in feature_names: current_input['mes'] = current_month
-        
-        # --- C. Previsão ---
-        df_step = pd.DataFrame([current_input])
-        
-        # Garante ordem e colunas corretas (preenche faltantes com 0)
-        df_step = df_step.reindex(columns=feature_names, fill_value=0)
-        
-        # Escala e Prevê
-        X_scaled = scaler.transform(df_step)
-        delta_pred = model.predict(X_scaled)[0]
-        
-        # --- D. Acumulação ---
-        current_inad += delta_pred
-        
-        # Trava de segurança (não existe inadimplência < 0)
-        current_inad = max(0.0, current_inad)
-        predictions.append(current_inad)
-        
-    return predictions
+        # Linha Base (Cinza)
+        fig.add_trace(go.Scatter(
+            x=meses, y=pred_base,
+            mode='lines',
+            name='Cenário Estável',
+            line=dict(color='gray', width=2, dash='dot'),
+            opacity=0.6
+        ))
+    
+        # Linha Cenário (Colorida)
+        cor_linha = '#ff4b4b' if pred_scenario[-1] > start_inad else '#00C853'
+        fig.add_trace(go.Scatter(
+            x=meses, y=pred_scenario,
+            mode='lines+markers',
+            name=f'Cenário Simulad ({algoritmo_nome})',
+            line=dict(color=cor_linha, width=4)
+        ))
+    
+        # Layout
+        fig.update_layout(
+            title=f"Projeção de 18 Meses: {aba_nome}",
+            xaxis_title="Meses à Frente",
+            yaxis_title="Taxa de Inadimplência (%)",
+            hovermode="x unified",
+            height=500,
+            template="plotly_white",
+            yaxis=dict(showgrid=True, gridcolor='#f0f0f0')
+        )
+        return fig
+
+    with medir("render"):
+        fig = plotly(chave_grafico("app_2", aba_nome, algoritmo_nome, start_inad, pred_base, pred_scenario), montar)
+
+    fig_atribuicao = None
+    if atribuicao:
+        from src.atribuicao import figura_plotly
+
+        resultado = atribuicao_deltas(ativo, ativo.last_vals, start_inad, selic_trend)
+        with medir("render"):
+            fig_atribuicao = plotly(
+                chave_grafico("app_2_atribuicao", aba_nome, algoritmo_nome, resultado["grupos"], resultado["projecao"], resultado["referencia"]),
+                lambda: figura_plotly(resultado, f"Contribuição por Fator ({algoritmo_nome}): {aba_nome}")
+            )
+    
+    return pred_scenario, fig, fig_atribuicao
+
+def montar_arena(aba_nome, ativos, start_inad, selic_trend):
+    """
+    Arena (roda no pool de threads): todos os algoritmos do segmento numa passada só,
+    com as curvas sobrepostas e a faixa de consenso (média e envelope mín–máx).
+    """
+    preds = projetar_arena(list(ativos.values()), next(iter(ativos.values())).last_vals, start_inad, selic_trend)
+    cenarios = preds[:, 1]
+    consenso = cenarios.mean(axis=0)
+    
+    # Figura memorizada pelos valores desenhados: só é montada quando a projeção muda
+    def montar():
+        import plotly.graph_objects as go
+    
+        fig = go.Figure()
+        meses = list(range(1, 19))
+    
+        # Faixa de consenso: do algoritmo mais otimista ao mais pessimista
+        fig.add_trace(go.Scatter(x=meses, y=cenarios.max(axis=0).tolist(), mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(
+            x=meses, y=cenarios.min(axis=0).tolist(), mode='lines', line=dict(width=0),
+            fill='tonexty', fillcolor='rgba(128, 128, 128, 0.2)', name='Faixa de Consenso (mín–máx)'
+        ))
+    
+        for (algoritmo_nome, _), linha in zip(ativos.items(), preds):
+            cor = cores_algoritmos.get(algoritmo_nome, '#333333')
+            fig.add_trace(go.Scatter(
+                x=meses, y=linha[0].tolist(), mode='lines', name=f'Estável ({algoritmo_nome})',
+                line=dict(color=cor, width=1, dash='dot'), opacity=0.5
+            ))
+            fig.add_trace(go.Scatter(
+                x=meses, y=linha[1].tolist(), mode='lines+markers', name=algoritmo_nome,
+                line=dict(color=cor, width=3)
+            ))
+    
+        fig.add_trace(go.Scatter(
+            x=meses, y=consenso.tolist(), mode='lines', name='Consenso (média)',
+            line=dict(color='black', width=4, dash='dash')
+        ))
+    
+        fig.update_layout(
+            title=f"Arena de 18 Meses: {aba_nome}",
+            xaxis_title="Meses à Frente",
+            yaxis_title="Taxa de Inadimplência (%)",
+            hovermode="x unified",
+            height=500,
+            template="plotly_white",
+            yaxis=dict(showgrid=True, gridcolor='#f0f0f0')
+        )
+        return fig
 
-# --- 4. Sidebar: Configuração da IA ---
+    with medir("render"):
+        fig = plotly(chave_grafico("app_2_arena", aba_nome, list(ativos), preds), montar)
+    
+    finais = {algoritmo_nome: float(linha[1, -1]) for algoritmo_nome, linha in zip(ativos, preds)}
+    return finais, float(consenso[-1]), fig
+
+# --- 3. Sidebar: Configuração da IA ---
 st.sidebar.header("🧠 Configuração da IA")
 
 algo_options = {
@@ -125,7 +180,21 @@ algo_options = {
     "Ridge (Linear)": "Ridge"
 }
 
-nome_amigavel = st.sidebar.selectbox("Escolha o Algoritmo:", list(algo_options.keys()))
+cores_algoritmos = {"RandomForest": "#1f77b4", "XGBoost": "#ff7f0e", "Ridge": "#9467bd"}
+
+# Arena: os três algoritmos de cada segmento carregados e simulados juntos
+modo_arena = st.sidebar.toggle(
+    "⚔️ Modo Arena (todos os algoritmos)",
+    help="Sobrepõe as projeções de RandomForest, XGBoost e Ridge com a faixa de consenso."
+)
+
+nome_amigavel = st.sidebar.selectbox("Escolha o Algoritmo:", list(algo_options.keys()), disabled=modo_arena)
+
+# Atribuição: de onde vem a diferença para o Cenário Estável (um algoritmo por vez)
+mostrar_atribuicao = st.sidebar.toggle(
+    "🧩 Atribuição por Fator", disabled=modo_arena,
+    help="Contribuição de cada fator (Selic, sazonalidade, ...) para a diferença entre o cenário e o Cenário Estável."
+)
 algoritmo_chave = algo_options[nome_amigavel]
 
 st.sidebar.info(f"""
@@ -135,7 +204,7 @@ st.sidebar.info(f"""
 {'Simples, robusto e mostra a tendência macro.' if 'Ridge' in nome_amigavel else ''}
 """)
 
-# --- 5. Interface Principal (Tabs) ---
+# --- 4. Interface Principal (Tabs) ---
 
 # Mapeamento: Nome na Aba -> Sufixo do Arquivo
 segmentos = {
@@ -145,18 +214,34 @@ segmentos = {
     "🚜 Rural PJ": "Rural_PJ"
 }
 
-tabs = st.tabs(list(segmentos.keys()))
+# Abas com estado: só a aba aberta simula (as outras só mostram os parâmetros)
+# Versões do Streamlit sem esse recurso caem nas abas comuns, e aí todas simulam
+try:
+    tabs = st.tabs(list(segmentos.keys()), key="aba_segmento", on_change="rerun")
+except TypeError:
+    tabs = st.tabs(list(segmentos.keys()))
+
+# Carregar Modelos Específicos: os quatro segmentos (e, na Arena, os três algoritmos) em paralelo
+algoritmos = list(algo_options.values()) if modo_arena else [algoritmo_chave]
+cargas = submeter(carregar_ativo, [f"{segmento_id}_{algo}" for segmento_id in segmentos.values() for algo in algoritmos])
+pendentes = {}
 
 for aba_nome, segmento_id in segmentos.items():
-    with tabs[list(segmentos.keys()).index(aba_nome)]:
+    tab = tabs[list(segmentos.keys()).index(aba_nome)]
+    with tab:
         
-        # Carregar Modelo Específico
-        model, scaler, cols, last_vals = load_assets(segmento_id, algoritmo_chave)
+        ativos = {algo: load_assets(cargas[f"{segmento_id}_{algo}"]) for algo in algoritmos}
+        ativos = {algo: ativo for algo, ativo in ativos.items() if ativo is not None}
         
-        if model is None:
-            st.warning(f"⚠️ Modelo '{algoritmo_chave}' para '{segmento_id}' não encontrado.")
+        if not ativos:
+            st.warning(f"⚠️ Modelo '{' / '.join(algoritmos)}' para '{segmento_id}' não encontrado.")
             st.caption("Dica: Verifique se rodou o notebook '06_treinamento_comparativo.ipynb' ou '07'.")
             continue
+        if modo_arena and len(ativos) < len(algoritmos):
+            faltando = [algo for algo in algoritmos if algo not in ativos]
+            st.caption(f"Arena sem {', '.join(faltando)}: modelo não encontrado para '{segmento_id}'.")
+        ativo = next(iter(ativos.values()))
+        last_vals = ativo.last_vals
 
         # --- Layout de Colunas ---
         c_settings, c_chart = st.columns([1, 3])
@@ -187,63 +272,65 @@ for aba_nome, segmento_id in segmentos.items():
             total_change = selic_trend * 12
             st.caption(f"Impacto em 1 ano: **{total_change:+.2f}% na Selic**")
 
-        with c_chart:
-            # --- Executar Simulação ---
-            try:
-                # 1. Simulação "Base" (Selic Constante)
-                pred_base = run_simulation(model, scaler, cols, last_vals, start_inad, selic_trend=0.0)
-                
-                # 2. Simulação "Cenário" (Com a tendência escolhida)
-                pred_scenario = run_simulation(model, scaler, cols, last_vals, start_inad, selic_trend=selic_trend)
-                
-                # --- Plotagem com Plotly ---
-                fig = go.Figure()
-                
-                meses = list(range(1, 19))
-                
-                # Linha Base (Cinza)
-                fig.add_trace(go.Scatter(
-                    x=meses, y=pred_base,
-                    mode='lines',
-                    name='Cenário Estável',
-                    line=dict(color='gray', width=2, dash='dot'),
-                    opacity=0.6
-                ))
+        # --- Executar Simulação ---
+        # open é None quando as abas não guardam estado: nesse caso todas simulam
+        if getattr(tab, "open", None) is not False:
+            if modo_arena:
+                futuro = pool().submit(rotulado, f"{segmento_id}_Arena", montar_arena, aba_nome, ativos, start_inad, selic_trend)
+            else:
+                futuro = pool().submit(rotulado, ativo.chave, montar_projecao, aba_nome, ativo, algoritmo_chave, start_inad, selic_trend, mostrar_atribuicao)
+            pendentes[segmento_id] = (c_chart, start_inad, futuro)
+
+# Monta a tela depois que todos os segmentos foram enviados ao pool:
+# o tempo da interação fica limitado pelo segmento mais lento, não pela soma
+for segmento_id, (c_chart, start_inad, futuro) in pendentes.items():
+    with c_chart:
+        try:
+            if modo_arena:
+                finais, consenso_final, fig = futuro.result()
                 
-                # Linha Cenário (Colorida)
-                cor_linha = '#ff4b4b' if pred_scenario[-1] > start_inad else '#00C853'
-                fig.add_trace(go.Scatter(
-                    x=meses, y=pred_scenario,
-                    mode='lines+markers',
-                    name=f'Cenário Simulad ({algoritmo_chave})',
-                    line=dict(color=cor_linha, width=4)
-                ))
+                with rotulos(f"{segmento_id}_Arena"), medir("exibicao"):
+                    st.plotly_chart(fig, use_container_width=True)
                 
-                # Layout
-                fig.update_layout(
-                    title=f"Projeção de 18 Meses: {aba_nome}",
-                    xaxis_title="Meses à Frente",
-                    yaxis_title="Taxa de Inadimplência (%)",
-                    hovermode="x unified",
-                    height=500,
-                    template="plotly_white",
-                    yaxis=dict(showgrid=True, gridcolor='#f0f0f0')
+                # Métricas Finais: um cartão por algoritmo + o consenso
+                colunas = st.columns(len(finais) + 1)
+                for coluna, (algoritmo_nome, final) in zip(colunas, finais.items()):
+                    coluna.metric(
+                        label=f"Mês 18 • {algoritmo_nome}",
+                        value=f"{final:.2f}%",
+                        delta=f"{final - start_inad:+.2f} p.p.",
+                        delta_color="inverse"
+                    )
+                colunas[-1].metric(
+                    label="Mês 18 • Consenso",
+                    value=f"{consenso_final:.2f}%",
+                    delta=f"{consenso_final - start_inad:+.2f} p.p.",
+                    delta_color="inverse"
                 )
-                
+                continue
+            
+            pred_scenario, fig, fig_atribuicao = futuro.result()
+            
+            with rotulos(f"{segmento_id}_{algoritmo_chave}"), medir("exibicao"):
                 st.plotly_chart(fig, use_container_width=True)
-                
-                # Métricas Finais
-                delta_total = pred_scenario[-1] - start_inad
-                st.metric(
-                    label="Projeção para o Mês 18",
-                    value=f"{pred_scenario[-1]:.2f}%",
-                    delta=f"{delta_total:+.2f} p.p. acumulados",
-                    delta_color="inverse" # Vermelho se subir
-                )
-                
-            except Exception as e:
-                st.error("Erro na Simulação.")
-                st.exception(e)
+                if fig_atribuicao is not None:
+                    st.plotly_chart(fig_atribuicao, use_container_width=True)
+            
+            # Métricas Finais
+            delta_total = pred_scenario[-1] - start_inad
+            st.metric(
+                label="Projeção para o Mês 18",
+                value=f"{pred_scenario[-1]:.2f}%",
+                delta=f"{delta_total:+.2f} p.p. acumulados",
+                delta_color="inverse" # Vermelho se subir
+            )
+            
+        except Exception as e:
+            st.error("Erro na Simulação.")
+            st.exception(e)
+
+# Painel de diagnóstico (só com SIMULADOR_PERFIL=1)
+painel(st)
 
 # Rodapé
 st.markdown("---")
@@ -0,0 +1,132 @@
+"""
+Teste de carga do serviço HTTP (src.servico).
+
+Abre 'concorrencia' conexões keep-alive e dispara pedidos sem pausa durante 'duracao' segundos.
+Reporta vazão, latências p50/p99 (do ponto de vista do cliente) e o tamanho médio dos micro-lotes
+que o serviço formou. Cliente HTTP/1.1 mínimo sobre asyncio, sem dependências extras.
+
+Uso:
+    python -m src.servico --porta 8000 &
+    python -m benchmarks.carga_servico --porta 8000 --rota /projecao --concorrencia 64 --duracao 10
+    python -m benchmarks.carga_servico --iniciar --models models   # sobe o serviço num subprocesso
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+CORPOS = {
+    "/projecao": lambda rng, seg: {"segmento": seg, "selic_trend": round(rng.uniform(-0.5, 0.5), 2),
+                                   "ipca_trend": round(rng.uniform(-0.2, 0.2), 2), "dolar_trend": round(rng.uniform(-0.5, 0.5), 2)},
+    "/projecao_delta": lambda rng, seg: {"segmento": seg, "algoritmo": "RandomForest", "selic_trend": round(rng.uniform(-0.5, 0.5), 2)},
+    "/delta": lambda rng, seg: {"segmento": seg, "selic": round(rng.uniform(2, 20), 2), "ipca": round(rng.uniform(-1, 2), 2)},
+}
+
+
+async def _pedido(reader, writer, host, rota, corpo):
+    dados = json.dumps(corpo).encode()
+    writer.write(
+        f"POST {rota} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(dados)}\r\n\r\n".encode() + dados
+    )
+    await writer.drain()
+    cabecalho = await reader.readuntil(b"\r\n\r\n")
+    status = int(cabecalho.split(b" ", 2)[1])
+    tamanho = 0
+    for linha in cabecalho.split(b"\r\n"):
+        if linha.lower().startswith(b"content-length:"):
+            tamanho = int(linha.split(b":", 1)[1])
+    await reader.readexactly(tamanho)
+    return status
+
+
+async def _cliente(host, porta, rota, segmentos, fim, latencias, erros, seed):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, porta)
+    try:
+        while time.perf_counter() < fim:
+            corpo = CORPOS[rota](rng, rng.choice(segmentos))
+            inicio = time.perf_counter()
+            status = await _pedido(reader, writer, host, rota, corpo)
+            latencias.append(time.perf_counter() - inicio)
+            if status != 200:
+                erros.append(status)
+    finally:
+        writer.close()
+
+
+async def _get(host, porta, rota):
+    reader, writer = await asyncio.open_connection(host, porta)
+    writer.write(f"GET {rota} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    resposta = await reader.read()
+    writer.close()
+    return json.loads(resposta.split(b"\r\n\r\n", 1)[1])
+
+
+async def _aguardar(host, porta, limite=30.0):
+    fim = time.perf_counter() + limite
+    while True:
+        try:
+            return await _get(host, porta, "/saude")
+        except (OSError, ValueError, IndexError):
+            if time.perf_counter() > fim:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def carga(host, porta, rota, segmentos, concorrencia, duracao):
+    """
+    Roda o teste e devolve as latências (s), os status com erro e o tempo total.
+    """
+    latencias, erros = [], []
+    inicio = time.perf_counter()
+    fim = inicio + duracao
+    await asyncio.gather(*[
+        _cliente(host, porta, rota, segmentos, fim, latencias, erros, seed) for seed in range(concorrencia)
+    ])
+    return np.array(latencias), erros, time.perf_counter() - inicio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do serviço de projeções.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8000)
+    parser.add_argument("--rota", default="/projecao", choices=sorted(CORPOS))
+    parser.add_argument("--segmentos", nargs="+", default=["PF", "PJ", "Rural_PF", "Rural_PJ"])
+    parser.add_argument("--concorrencia", type=int, default=32, help="Conexões simultâneas")
+    parser.add_argument("--duracao", type=float, default=10.0, help="Segundos de teste")
+    parser.add_argument("--iniciar", action="store_true", help="Sobe o serviço num subprocesso antes do teste")
+    parser.add_argument("--models", default="models")
+    args = parser.parse_args(argv)
+
+    processo = None
+    if args.iniciar:
+        processo = subprocess.Popen([sys.executable, "-m", "src.servico", "--host", args.host,
+                                     "--porta", str(args.porta), "--models", args.models])
+    try:
+        saude = asyncio.run(_aguardar(args.host, args.porta))
+        print(f"Modelos no serviço: {', '.join(saude['modelos'])}")
+
+        latencias, erros, total = asyncio.run(
+            carga(args.host, args.porta, args.rota, args.segmentos, args.concorrencia, args.duracao)
+        )
+        p50, p99 = np.percentile(latencias * 1000, [50, 99])
+        print(f"{args.rota}: {len(latencias)} pedidos em {total:.1f}s com {args.concorrencia} conexões")
+        print(f"  vazão {len(latencias) / total:.0f} req/s | p50 {p50:.2f} ms | p99 {p99:.2f} ms | erros {len(erros)}")
+
+        for nome, stats in asyncio.run(_get(args.host, args.porta, "/saude"))["micro_lotes"].items():
+            print(f"  micro-lote {nome:<28} {stats['lotes']} lotes, {stats['media_por_lote']} pedidos/lote")
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Carteira sintética para o src.carteira: gera milhões de contratos (CSV ou Parquet) em lotes, com
+memória constante, e mede a vazão da pontuação com 1..N processos.
+
+Colunas geradas: contrato, tipo_pessoa (PF/PJ), rural (S/N), segmento, produto, saldo, lgd, prazo, fator.
+A conferência compara a perda esperada com a conta direta (pandas, contrato a contrato) numa amostra.
+
+Uso:
+    python -m benchmarks.carteira_sintetica --linhas 20000000 --saida /tmp/carteira.parquet
+    python -m benchmarks.carteira_sintetica --linhas 5000000 --saida /tmp/carteira.csv --workers 1 2 4
+"""
+import argparse
+import resource
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PRODUTOS = np.array(["consignado", "cartao", "veiculos", "capital_giro", "custeio", "investimento"])
+LOTE = 1_000_000
+
+
+def lote_sintetico(n, rng, inicio=0):
+    pj = rng.random(n) < 0.3
+    rural = rng.random(n) < 0.15
+    segmento = np.array(["PF", "PJ", "Rural_PF", "Rural_PJ"])[pj + 2 * rural]
+    return pd.DataFrame({
+        "contrato": np.arange(inicio, inicio + n),
+        "tipo_pessoa": np.where(pj, "PJ", "PF"),
+        "rural": np.where(rural, "S", "N"),
+        "segmento": segmento,
+        "produto": PRODUTOS[rng.integers(0, len(PRODUTOS), n)],
+        "saldo": np.round(rng.lognormal(9, 1.2, n), 2),
+        "lgd": np.round(rng.uniform(0.2, 0.7, n), 3),
+        "prazo": rng.integers(1, 60, n),
+        "fator": np.round(rng.lognormal(0, 0.3, n), 3),
+    })
+
+
+def gerar(caminho, linhas, semente=0, lote=LOTE):
+    """
+    Grava a carteira em lotes (um row group por lote no Parquet, acréscimos no CSV).
+    """
+    rng = np.random.default_rng(semente)
+    parquet = str(caminho).lower().endswith(".parquet")
+    escritor = None
+    for inicio in range(0, linhas, lote):
+        df = lote_sintetico(min(lote, linhas - inicio), rng, inicio)
+        if parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            tabela = pa.Table.from_pandas(df, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(caminho, tabela.schema, compression="zstd")
+            escritor.write_table(tabela)
+        else:
+            df.to_csv(caminho, mode="a" if inicio else "w", header=not inicio, index=False)
+    if escritor is not None:
+        escritor.close()
+
+
+def conferir(caminho, cenarios, base_path, amostra=200_000):
+    """
+    Perda esperada do src.carteira x conta direta, contrato a contrato, nas primeiras 'amostra' linhas.
+    Devolve o maior erro relativo.
+    """
+    from src.carteira import MESES, pontuar, resolver_colunas, tabela_projecoes
+    from src.artefatos import SEGMENTOS
+
+    if str(caminho).endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        df = next(pq.ParquetFile(caminho).iter_batches(batch_size=amostra)).to_pandas()
+    else:
+        df = pd.read_csv(caminho, nrows=amostra)
+    parcial = Path(caminho).with_name("_conferencia.csv")
+    df.to_csv(parcial, index=False)
+    try:
+        r = pontuar(parcial, cenarios, parcial.with_suffix(".saida.csv"), base_path,
+                    colunas=resolver_colunas(parcial), workers=1, log=lambda _: None)
+    finally:
+        parcial.unlink()
+        parcial.with_suffix(".saida.csv").unlink(missing_ok=True)
+
+    taxas = tabela_projecoes(cenarios, base_path)
+    indice = df["segmento"].map({seg: i for i, seg in enumerate(SEGMENTOS)}).to_numpy()
+    meses = np.arange(1, MESES + 1)
+    ativo = df["prazo"].to_numpy()[:, None] >= meses
+    peso = (df["saldo"] * df["fator"] * df["lgd"]).to_numpy()[:, None] * ativo
+    direta = np.stack([(peso * taxas[indice, c] / 100).sum(axis=0) for c in range(taxas.shape[1])])
+    return float(np.max(np.abs(r["perdas"] - direta) / np.abs(direta)))
+
+
+def main(argv=None):
+    from src.carteira import pontuar, resolver_colunas
+    from src.grade_cenarios import montar_grade
+
+    parser = argparse.ArgumentParser(description="Gera uma carteira sintética e mede a vazão do src.carteira.")
+    parser.add_argument("--linhas", type=int, default=5_000_000)
+    parser.add_argument("--saida", default="carteira.parquet", help=".parquet ou .csv")
+    parser.add_argument("--models", default="models")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1], help="Processos a medir")
+    parser.add_argument("--reaproveitar", action="store_true", help="Usa o arquivo se já existir")
+    args = parser.parse_args(argv)
+
+    caminho = Path(args.saida)
+    if not (args.reaproveitar and caminho.exists()):
+        inicio = time.perf_counter()
+        gerar(caminho, args.linhas)
+        print(f"{args.linhas:,} contratos em {caminho} ({caminho.stat().st_size / 2**20:,.0f} MB) em {time.perf_counter() - inicio:.1f}s")
+
+    cenarios = montar_grade(np.linspace(-0.5, 0.5, 5), np.linspace(-0.2, 0.2, 3), [0.0, 0.1])
+    erro = conferir(caminho, cenarios, args.models)
+    print(f"Conferência com a conta direta: erro relativo máximo {erro:.2e}")
+
+    for workers in args.workers:
+        inicio = time.perf_counter()
+        r = pontuar(caminho, cenarios, caminho.with_suffix(".perdas.parquet"), args.models,
+                    colunas=resolver_colunas(caminho, por="produto"), workers=workers, log=lambda _: None)
+        total = time.perf_counter() - inicio
+        # Pico de memória do processo principal e do maior processo do pool
+        pico = max(resource.getrusage(quem).ru_maxrss for quem in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+        pico_mb = pico / 2**20 if sys.platform == "darwin" else pico / 1024
+        print(f"workers {workers}: {r['contratos']:,} contratos em {r['leitura']:.1f}s "
+              f"({r['contratos'] / r['leitura']:,.0f}/s) | total {total:.1f}s | pico de RSS {pico_mb:,.0f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Memória por processo com N workers vivos ao mesmo tempo, como vários servidores do Streamlit atrás
+de um balanceador: carga privada (SIMULADOR_HOSPEDAGEM=0) x nós das árvores em memória compartilhada
+(src.hospedagem).
+
+Cada worker importa o src.cache, carrega todos os modelos do índice do registro, roda uma projeção
+com cada um (o caminho dos apps) e informa a memória antes e depois da carga. Todos ficam vivos até o
+último medir, então páginas compartilhadas contam uma vez só no PSS (Linux: /proc/self/smaps_rollup):
+- RSS: páginas residentes do processo, compartilhadas ou não
+- PSS: cada página compartilhada dividida pelo número de processos que a mapeiam
+- privado: o que só aquele processo tem (o que cada worker a mais custa)
+
+Uso:
+    python -m benchmarks.memoria_workers --models models --workers 4
+    python -m benchmarks.memoria_workers --models /tmp/modelos --workers 2 8 --pasta /tmp/segmentos
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+MODOS = {"privado": "0", "compartilhado": "1"}
+CAMPOS = ("Rss", "Pss", "Private_Clean", "Private_Dirty")
+
+
+def memoria_mb():
+    """
+    {RSS, PSS, privado} do processo atual em MB (smaps_rollup); fora do Linux, só o RSS (statm/ru_maxrss).
+    """
+    try:
+        valores = {}
+        with open("/proc/self/smaps_rollup") as f:
+            for linha in f:
+                nome, _, resto = linha.partition(":")
+                if nome in CAMPOS:
+                    valores[nome] = int(resto.split()[0]) / 1024
+        return {"rss": valores["Rss"], "pss": valores["Pss"], "privado": valores["Private_Clean"] + valores["Private_Dirty"]}
+    except (OSError, KeyError):
+        from benchmarks.soak_graficos import rss_mb
+
+        return {"rss": rss_mb(), "pss": None, "privado": None}
+
+
+def worker(base_path):
+    """
+    Um worker: carrega todos os modelos do índice, projeta com cada um, mede e espera o fim da rodada.
+    """
+    from src.cache import carregar_ativo
+    from src.defasagens import ler_historico
+    from src.grade_cenarios import inputs_segmento
+    from src.registro import ler_indice
+    from src.simulacao import project_deltas, project_levels
+
+    # O histórico da base (pandas) entra antes da primeira medição: é o mesmo nos dois modos
+    ler_historico()
+    antes = memoria_mb()
+    inicio = time.perf_counter()
+    for chave in sorted(ler_indice(base_path)):
+        ativo = carregar_ativo(chave, base_path)
+        if "_" in chave.replace("Rural_", ""):
+            start_inad = float(ativo.last_vals.get("target_lag_1", 3.0))
+            project_deltas(ativo.model, ativo.scaler, ativo.cols, ativo.last_vals, start_inad, [0.0, 0.1])
+        else:
+            inputs_iniciais, is_decimal = inputs_segmento(ativo.last_vals)
+            project_levels(ativo.model, ativo.scaler, ativo.cols, inputs_iniciais, [0.0, 0.1], 0.0, 0.0, is_decimal=is_decimal)
+    carga = time.perf_counter() - inicio
+    depois = memoria_mb()
+    print(json.dumps({"antes": antes, "depois": depois, "carga": carga,
+                      "modulos": sorted(m for m in ("sklearn", "xgboost") if m in sys.modules)}), flush=True)
+    # Vivo até o pai ter lido todos os workers: o PSS divide as páginas entre todos
+    sys.stdin.read()
+
+
+def rodada(base_path, workers, modo, pasta):
+    """
+    Sobe 'workers' processos no modo pedido, espera todos medirem e devolve as medições.
+    """
+    env = {**os.environ, "SIMULADOR_HOSPEDAGEM": MODOS[modo], "SIMULADOR_HOSPEDAGEM_PASTA": pasta}
+    comando = [sys.executable, "-m", "benchmarks.memoria_workers", "--worker", "--models", base_path]
+    processos = [subprocess.Popen(comando, stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env, text=True)
+                 for _ in range(workers)]
+    try:
+        medidas = [json.loads(p.stdout.readline()) for p in processos]
+    finally:
+        for p in processos:
+            p.stdin.close()
+            p.wait()
+    return medidas
+
+
+def _media(medidas, momento, campo):
+    valores = [m[momento][campo] for m in medidas]
+    return None if None in valores else sum(valores) / len(valores)
+
+
+def _mb(valor):
+    return f"{valor:9.1f}" if valor is not None else f"{'-':>9}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memória por worker: modelos privados x nós compartilhados.")
+    parser.add_argument("--models", default="models")
+    parser.add_argument("--workers", type=int, nargs="+", default=[4], help="Processos vivos ao mesmo tempo")
+    parser.add_argument("--pasta", default=None, help="Pasta dos segmentos (padrão: temporária, apagada no fim)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        worker(args.models)
+        return 0
+
+    from src.hospedagem import publicar
+
+    with tempfile.TemporaryDirectory(prefix="segmentos_") as temporaria:
+        pasta = args.pasta or temporaria
+        inicio = time.perf_counter()
+        segmentos = [caminho for _, caminho in publicar(args.models, pasta) if caminho is not None]
+        tamanho = sum(caminho.stat().st_size for caminho in segmentos) / 2**20
+        print(f"{len(segmentos)} segmentos publicados em {pasta} ({tamanho:.1f} MB) em {time.perf_counter() - inicio:.2f}s\n")
+
+        print(f"{'modo':<14} {'workers':>7} {'RSS MB':>9} {'PSS MB':>9} {'privado':>9} {'+modelos':>9} {'carga s':>8}  importa")
+        for workers in args.workers:
+            for modo in MODOS:
+                medidas = rodada(args.models, workers, modo, pasta)
+                # +modelos: quanto o RSS cresceu da importação até o fim da carga + primeira projeção
+                crescimento = _media(medidas, "depois", "rss") - _media(medidas, "antes", "rss")
+                carga = sum(m["carga"] for m in medidas) / len(medidas)
+                print(f"{modo:<14} {workers:>7} {_mb(_media(medidas, 'depois', 'rss'))} {_mb(_media(medidas, 'depois', 'pss'))} "
+                      f"{_mb(_media(medidas, 'depois', 'privado'))} {_mb(crescimento)} {carga:8.2f}  {', '.join(medidas[0]['modulos']) or '-'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Teste de resistência da camada de gráficos: milhares de reruns de um app, com a memória medida ao longo do caminho.
+
+Cada rerun move um slider para um valor sorteado de uma grade finita (as posições se repetem, como
+na mão de um usuário). O cache de gráficos roda com capacidade menor que a grade (--cache, padrão 8,
+via SIMULADOR_CACHE_GRAFICOS; a grade tem 21 posições): depois de cheio ele segue acertando parte dos
+reruns e, nos demais, renderiza de novo e descarta o item mais antigo, inclusive na janela medida.
+A cada 'amostra' reruns registra o RSS do processo, as Figures do matplotlib vivas e o estado do
+cache (itens, misses e descartes). Depois do aquecimento a memória tem que ficar plana. O RSS oscila
+dezenas de MB entre amostras (coletor, arenas do malloc), então a comparação é entre janelas: a
+mediana das --janela primeiras amostras depois do aquecimento contra a mediana das --janela últimas.
+A final não pode passar da inicial mais a folga (--folga, em MB), a mediana das Figures não pode
+crescer e o cache tem que ter descartado itens nesse trecho; senão o script sai com código 1.
+
+Uso:
+    python -m benchmarks.soak_graficos --reruns 2000
+    python -m benchmarks.soak_graficos --reruns 300 --amostra 20 --janela 5
+    python -m benchmarks.soak_graficos --app app_2.py --pasta /tmp/modelos --reruns 5000 --folga 30 --cache 16
+"""
+import argparse
+import gc
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Slider movido em cada app e a grade de valores sorteados
+SLIDERS = {
+    "app.py": ("ts_PF", [round(-0.5 + 0.05 * k, 2) for k in range(21)]),
+    "app_1.py": ("Selic (%)", [round(5.0 + 0.5 * k, 1) for k in range(21)]),
+    "app_2.py": ("trend_PF", [round(-0.5 + 0.05 * k, 2) for k in range(21)]),
+}
+# Capacidade do cache de gráficos no soak: abaixo das 21 posições da grade, para haver descartes
+CAPACIDADE_CACHE = 8
+
+
+def rss_mb():
+    """
+    Memória residente atual (Linux: /proc); fora do Linux, o pico (ru_maxrss).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico / 2**20 if sys.platform == "darwin" else pico / 1024
+
+
+def figuras_vivas():
+    from matplotlib.figure import Figure
+
+    return sum(isinstance(objeto, Figure) for objeto in gc.get_objects())
+
+
+def _slider(at, chave):
+    for slider in at.slider:
+        if slider.key == chave or slider.label == chave:
+            return slider
+    raise LookupError(f"Slider '{chave}' não encontrado.")
+
+
+def soak(app, reruns=2000, pasta=".", amostra=100, semente=0, cache=CAPACIDADE_CACHE, log=print):
+    """
+    Roda os reruns e devolve as amostras [(rerun, rss_mb, figuras, itens_cache, misses, descartes, ms_por_rerun)].
+    """
+    # Antes do primeiro import do src.graficos: a capacidade é lida na criação do cache
+    os.environ["SIMULADOR_CACHE_GRAFICOS"] = str(cache)
+    from streamlit.testing.v1 import AppTest
+
+    from src.graficos import GRAFICOS
+
+    chave, grade = SLIDERS[Path(app).name]
+    app = str(Path(app).resolve())
+    os.chdir(pasta)
+    rng = random.Random(semente)
+
+    at = AppTest.from_file(app, default_timeout=300).run()
+    amostras = []
+    inicio = time.perf_counter()
+    for k in range(1, reruns + 1):
+        _slider(at, chave).set_value(rng.choice(grade))
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+        if k % amostra == 0 or k == reruns:
+            gc.collect()
+            ms = (time.perf_counter() - inicio) * 1000 / amostra
+            stats = GRAFICOS.stats()
+            amostras.append((k, rss_mb(), figuras_vivas(), stats["itens"], stats["misses"], stats["descartes"], ms))
+            log(f"{k:>7} {amostras[-1][1]:>9.1f} {amostras[-1][2]:>8} {stats['itens']:>7} {stats['misses']:>7} "
+                f"{stats['descartes']:>9} {ms:>9.1f}")
+            inicio = time.perf_counter()
+    return amostras
+
+
+def janelas(amostras, inicio, janela):
+    """
+    (inicial, final): as 'janela' amostras logo depois do rerun 'inicio' e as 'janela' últimas.
+    Com menos de 2 x janela amostras nesse trecho, cada uma fica com metade dele.
+    """
+    medidas = [a for a in amostras if a[0] >= inicio] or amostras[-1:]
+    janela = max(1, min(janela, len(medidas) // 2))
+    return medidas[:janela], medidas[-janela:]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memória ao longo de milhares de reruns (camada de gráficos).")
+    parser.add_argument("--app", default="app.py", help="app.py, app_1.py ou app_2.py")
+    parser.add_argument("--pasta", default=".", help="Pasta de trabalho do app (onde está models/)")
+    parser.add_argument("--reruns", type=int, default=2000)
+    parser.add_argument("--amostra", type=int, default=100, help="Reruns entre medições")
+    parser.add_argument("--aquecimento", type=float, default=0.2, help="Fração inicial ignorada (cache enchendo)")
+    parser.add_argument("--folga", type=float, default=20.0, help="Crescimento tolerado do RSS após o aquecimento (MB)")
+    parser.add_argument("--janela", type=int, default=5, help="Amostras de cada janela comparada (mediana)")
+    parser.add_argument("--cache", type=int, default=CAPACIDADE_CACHE, help="Capacidade do cache de gráficos (abaixo da grade)")
+    args = parser.parse_args(argv)
+
+    print(f"{'rerun':>7} {'RSS MB':>9} {'figuras':>8} {'cache':>7} {'misses':>7} {'descartes':>9} {'ms/rerun':>9}")
+    amostras = soak(args.app, args.reruns, args.pasta, args.amostra, cache=args.cache)
+
+    inicial, final = janelas(amostras, args.aquecimento * args.reruns, args.janela)
+    if len(inicial) < args.janela:
+        print(f"\nAviso: só {len(inicial)} amostra(s) por janela; aumente --reruns ou diminua --amostra.")
+    rss_inicial, rss_final = (statistics.median(a[1] for a in j) for j in (inicial, final))
+    figuras_inicial, figuras_final = (statistics.median(a[2] for a in j) for j in (inicial, final))
+    crescimento = rss_final - rss_inicial
+    descartes = final[-1][5] - inicial[0][5]
+    print(f"\nRSS (mediana de {len(inicial)} amostras), reruns {inicial[0][0]}-{inicial[-1][0]} -> {final[0][0]}-{final[-1][0]}: "
+          f"{rss_inicial:.1f} MB -> {rss_final:.1f} MB ({crescimento:+.1f} MB); Figures do matplotlib vivas: "
+          f"{figuras_inicial:g} -> {figuras_final:g}; misses {final[-1][4] - inicial[0][4]}, descartes {descartes} no trecho medido")
+    # As threads do pool guardam uma Figure cada (reaproveitada): o número pode existir, mas não crescer
+    if crescimento > args.folga or figuras_final > figuras_inicial:
+        print(f"Falhou: RSS cresceu mais de {args.folga:.0f} MB ou o número de Figures aumentou.")
+        return 1
+    # Sem descartes depois do aquecimento o soak não exercitou a troca de itens (cache maior que a grade)
+    if descartes == 0:
+        print(f"Falhou: o cache (capacidade {args.cache}) não descartou nada após o aquecimento; use --cache menor que a grade.")
+        return 1
+    print("Memória estável.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Benchmark de inicialização dos simuladores.
+
+Para cada app, roda um interpretador novo (cold start) e mede:
+- import do Streamlit;
+- imports do próprio app (lidos do topo do arquivo, na ordem em que o app os faz);
+- tempo até a primeira projeção (carga do segmento + simulação);
+- quais bibliotecas pesadas (pandas, sklearn, matplotlib, ...) o app carregou além das que o Streamlit já traz.
+
+Uso:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --segmento Rural_PF --repeticoes 5 --completo
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+APPS = ["app.py", "app_1.py", "app_2.py"]
+PESADAS = ["pandas", "sklearn", "matplotlib", "plotly", "joblib"]
+
+
+def _primeira_projecao(app, segmento, algoritmo, base_path):
+    """
+    Reproduz o caminho do app até o primeiro número na tela, sem a interface.
+    """
+    from src.registro import carregar
+    from src.simulacao import detectar_escala, predict_rows, project_deltas, project_levels
+
+    if app == "app_2.py":
+        try:
+            ativo = carregar(f"{segmento}_{algoritmo}", base_path)
+        except FileNotFoundError:
+            ativo = carregar(segmento, base_path)
+        start_inad = float(ativo.last_vals.get('target_lag_1', 3.0))
+        return project_deltas(ativo.model, ativo.scaler, ativo.cols, ativo.last_vals, start_inad, [0.0, 0.1])
+
+    ativo = carregar(segmento, base_path)
+    if app == "app_1.py":
+        valores = (ativo.meta or {}).get("X_ultimo_real", ativo.last_vals or {})
+        x = [[float(valores.get(col, 0)) for col in ativo.cols]]
+        return predict_rows(ativo.model, ativo.scaler, x)
+
+    is_decimal, display_selic, display_ipca = detectar_escala(ativo.last_vals)
+    inputs_iniciais = dict(ativo.last_vals, selic_lag_6=display_selic, ipca_lag_6=display_ipca)
+    return project_levels(ativo.model, ativo.scaler, ativo.cols, inputs_iniciais,
+                          [0.1, 0.0], [0.0, 0.0], [0.0, 0.0], is_decimal=is_decimal)
+
+
+def medir(app, segmento="PF", algoritmo="Ridge", base_path="models"):
+    """
+    Executado no processo filho: imprime um JSON com os tempos em segundos.
+    """
+    import ast
+
+    inicio = time.perf_counter()
+    import streamlit  # noqa: F401
+    t_streamlit = time.perf_counter() - inicio
+    do_streamlit = {nome for nome in PESADAS if nome in sys.modules}
+
+    with open(app, encoding="utf-8") as f:
+        arvore = ast.parse(f.read(), filename=app)
+    topo = [no for no in arvore.body if isinstance(no, (ast.Import, ast.ImportFrom))]
+
+    inicio = time.perf_counter()
+    exec(compile(ast.Module(body=topo, type_ignores=[]), app, "exec"), {})
+    t_imports = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    _primeira_projecao(app, segmento, algoritmo, base_path)
+    t_projecao = time.perf_counter() - inicio
+
+    print(json.dumps({
+        "streamlit": t_streamlit,
+        "imports": t_imports,
+        "projecao": t_projecao,
+        "carregadas": [nome for nome in PESADAS if nome in sys.modules and nome not in do_streamlit],
+    }))
+
+
+def medir_completo(app):
+    """
+    Executado no processo filho: roda o script inteiro pelo AppTest do Streamlit.
+    """
+    import os
+
+    inicio = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    AppTest.from_file(os.path.abspath(app), default_timeout=300).run()
+    print(json.dumps({"completo": time.perf_counter() - inicio}))
+
+
+def _filho(codigo):
+    saida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True)
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tempo de import e até a primeira projeção de cada app.")
+    parser.add_argument("--apps", nargs="+", default=APPS)
+    parser.add_argument("--segmento", default="PF")
+    parser.add_argument("--algoritmo", default="Ridge", help="Algoritmo usado pelo app_2")
+    parser.add_argument("--models", default="models")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--completo", action="store_true", help="Também roda o script inteiro via AppTest")
+    args = parser.parse_args(argv)
+
+    print(f"{'app':<10} {'streamlit':>10} {'imports':>10} {'1ª proj.':>10} {'total':>10} {'completo':>10}  carregadas")
+    for app in args.apps:
+        codigo = f"from benchmarks.startup import medir; medir({app!r}, {args.segmento!r}, {args.algoritmo!r}, {args.models!r})"
+        medidas = [_filho(codigo) for _ in range(args.repeticoes)]
+        mediana = {chave: statistics.median(m[chave] for m in medidas) for chave in ("streamlit", "imports", "projecao")}
+        total = sum(mediana.values())
+
+        completo = ""
+        if args.completo:
+            completo = f"{_filho(f'from benchmarks.startup import medir_completo; medir_completo({app!r})')['completo']:.3f}s"
+
+        print(f"{app:<10} {mediana['streamlit']:>9.3f}s {mediana['imports']:>9.3f}s {mediana['projecao']:>9.3f}s "
+              f"{total:>9.3f}s {completo:>10}  {', '.join(medidas[-1]['carregadas']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
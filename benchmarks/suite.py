@@ -0,0 +1,302 @@
+"""
+Suíte de benchmarks dos caminhos de carga, previsão e projeção, com linha de base em JSON.
+
+Casos (um por segmento/algoritmo encontrado na pasta de modelos):
+- carga/legado/<chave>: arquivos soltos (model_*.pkl, scaler_*.pkl, ...) via carregar_legado;
+- carga/registro/<chave>: bundle do registro (só quando a pasta foi migrada);
+- predict_linha/<seg>: uma linha, como o app_1.py;
+- projecao_nivel/<seg>: 18 meses, como o app.py;
+- projecao_delta/<seg>_<algo>: 18 meses, como o app_2.py;
+- sensibilidade/<seg>: varredura da Selic (curvas_resposta, como o app_1.py);
+- lote/<seg>: lote grande de cenários (project_levels, como o src.grade_cenarios);
+- arvores/<floresta|xgboost>/<1|100000>/<compilado|nativo>: RandomForest e XGBoost pequenos treinados aqui
+  (mesmo formato dos testes), predict compilado x nativo em 1 e 100 mil linhas. É aqui, e não no pytest,
+  que se confere que o compilado ganha na linha do slider e empata no lote (acima de linhas_nativo ele delega).
+
+As entradas são sintéticas: ruído em volta dos last_values_*.csv da pasta, com semente fixa, para que
+duas rodadas meçam exatamente a mesma conta. Cada caso é calibrado para ~0,2 s por repetição e guarda a
+mediana, o mínimo e o p95 do tempo por chamada. Sem cache de processo: carregar_ativo/ATIVOS ficam de fora.
+
+'comparar' confronta duas rodadas pela mediana (ou pelo mínimo) e sai com código 1 se algum caso piorar
+além do limite. O padrão (25%) absorve o ruído de uma máquina compartilhada; as linhas de base só valem
+para a máquina em que foram geradas.
+
+Uso:
+    python -m benchmarks.suite rodar --saida benchmarks/baselines/referencia.json
+    python -m benchmarks.suite rodar --filtro projecao --repeticoes 9 --saida atual.json
+    python -m benchmarks.suite comparar benchmarks/baselines/referencia.json atual.json --limite 0.10
+"""
+import argparse
+import json
+import platform
+import re
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from src.compilacao import compilar_arvores
+from src.registro import ErroArtefato, abrir_bundle, carregar_legado, ler_indice, PASTA_REGISTRO
+from src.sensibilidade import curvas_resposta
+from src.simulacao import detectar_escala, predict_rows, project_deltas, project_levels
+
+ALGORITMOS = ("Ridge", "RandomForest", "XGBoost")
+SEMENTE = 42
+ALVO_S = 0.2
+N_LOTE = 10_000
+SELIC_SENSIBILIDADE = np.linspace(2.0, 25.0, 40)
+N_FEATURES_ARVORES = 8
+LINHAS_ARVORES = (1, 100_000)
+
+
+# --- 1. Entradas Sintéticas ---
+def chaves(base_path="models"):
+    """
+    Segmentos/algoritmos com model_*.pkl na pasta (ex: 'PF', 'PF_Ridge').
+    """
+    return sorted(p.stem[len("model_"):] for p in Path(base_path).glob("model_*.pkl"))
+
+
+def _perturbar(last_vals, rng, escala=0.05):
+    # Ruído relativo em volta do último valor observado (colunas de calendário ficam como estão)
+    return {col: valor if col in ("mes", "periodo_safra") else valor * (1 + escala * rng.standard_normal())
+            for col, valor in last_vals.items()}
+
+
+def _trends(rng, n):
+    return rng.uniform(-0.5, 0.5, n), rng.uniform(-0.2, 0.2, n), rng.uniform(-0.5, 0.5, n)
+
+
+def _dados_arvores(n, seed, faltantes=0.0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, N_FEATURES_ARVORES))
+    if faltantes:
+        X[rng.random(X.shape) < faltantes] = np.nan
+    return X
+
+
+def arvores_sinteticas():
+    """
+    {nome: modelo} com um RandomForest e um XGBoost (se instalado) treinados em dados sintéticos com NaN.
+    """
+    from sklearn.ensemble import RandomForestRegressor
+
+    X = _dados_arvores(2000, SEMENTE, faltantes=0.1)
+    y = np.nansum(X[:, :3], axis=1) + np.random.default_rng(SEMENTE + 1).normal(size=len(X))
+    modelos = {"floresta": RandomForestRegressor(n_estimators=30, max_depth=8, n_jobs=1, random_state=SEMENTE).fit(X, y)}
+    try:
+        import xgboost
+    except ImportError:
+        return modelos
+    modelos["xgboost"] = xgboost.XGBRegressor(n_estimators=50, max_depth=6, n_jobs=1, random_state=SEMENTE).fit(X, y)
+    return modelos
+
+
+# --- 2. Casos ---
+def casos(base_path="models", n_lote=N_LOTE):
+    """
+    Monta os casos como {nome: função sem argumentos}. Os ativos são carregados aqui, fora da medição.
+    """
+    rng = np.random.default_rng(SEMENTE)
+    indice = ler_indice(base_path)
+    saida = {}
+
+    for chave in chaves(base_path):
+        try:
+            ativo = carregar_legado(chave, base_path)
+        except (FileNotFoundError, ErroArtefato):
+            continue
+        saida[f"carga/legado/{chave}"] = lambda chave=chave: carregar_legado(chave, base_path)
+        if chave in indice:
+            caminho = Path(base_path) / PASTA_REGISTRO / indice[chave]["arquivo"]
+            saida[f"carga/registro/{chave}"] = lambda caminho=caminho: abrir_bundle(caminho)
+        if not ativo.last_vals:
+            continue
+
+        valores = _perturbar(ativo.last_vals, rng)
+        x = np.array([float(valores.get(col, 0)) for col in ativo.cols])
+
+        if chave.rpartition("_")[2] not in ALGORITMOS:
+            # Modelos em nível: app_1 (linha e sensibilidade), app.py (18 meses) e grade (lote)
+            saida[f"predict_linha/{chave}"] = lambda a=ativo, x=x: predict_rows(a.model, a.scaler, x[None, :])
+            grades = {"selic": SELIC_SENSIBILIDADE} if "selic" in ativo.cols else None
+            saida[f"sensibilidade/{chave}"] = lambda a=ativo, x=x, g=grades: curvas_resposta(
+                a.model, a.scaler, a.cols, x, grades=g, n_pontos=len(SELIC_SENSIBILIDADE))
+
+            is_decimal, display_selic, display_ipca = detectar_escala(valores)
+            iniciais = dict(valores, selic_lag_6=display_selic, ipca_lag_6=display_ipca)
+            # Tendência escolhida + "Cenário Estável", como na tela do app.py
+            s, i, d = (np.append(t, 0.0) for t in _trends(rng, 1))
+            saida[f"projecao_nivel/{chave}"] = lambda a=ativo, v=iniciais, s=s, i=i, d=d, dec=is_decimal: project_levels(
+                a.model, a.scaler, a.cols, v, s, i, d, is_decimal=dec)
+            s, i, d = _trends(rng, n_lote)
+            saida[f"lote/{chave}"] = lambda a=ativo, v=iniciais, s=s, i=i, d=d, dec=is_decimal: project_levels(
+                a.model, a.scaler, a.cols, v, s, i, d, is_decimal=dec)
+        else:
+            start_inad = float(valores.get("target_lag_1", 3.0))
+            trend = rng.uniform(-0.5, 0.5, 2)
+            saida[f"projecao_delta/{chave}"] = lambda a=ativo, v=valores, s0=start_inad, t=trend: project_deltas(
+                a.model, a.scaler, a.cols, v, s0, t)
+
+    # Compilado x nativo, independente da pasta de modelos
+    for nome, model in arvores_sinteticas().items():
+        compilado = compilar_arvores(model)
+        if compilado is None:
+            continue
+        for n in LINHAS_ARVORES:
+            X = _dados_arvores(n, SEMENTE + n)
+            saida[f"arvores/{nome}/{n}/compilado"] = lambda c=compilado, X=X: c.predict(X)
+            saida[f"arvores/{nome}/{n}/nativo"] = lambda m=model, X=X: m.predict(X)
+    return saida
+
+
+# --- 3. Medição ---
+def cronometrar(funcao, repeticoes=5, alvo=ALVO_S):
+    """
+    Tempo por chamada, em segundos: calibra o número de chamadas por repetição para ~alvo segundos
+    e devolve mediana, mínimo e p95 das repetições.
+    """
+    funcao()  # aquecimento (imports tardios, caches do numpy/sklearn)
+    numero = 1
+    while True:
+        inicio = time.perf_counter()
+        for _ in range(numero):
+            funcao()
+        duracao = time.perf_counter() - inicio
+        if duracao >= alvo / 5 or numero >= 1 << 20:
+            break
+        numero *= 2
+    numero = max(1, int(numero * alvo / max(duracao, 1e-9)))
+
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for _ in range(numero):
+            funcao()
+        tempos.append((time.perf_counter() - inicio) / numero)
+    tempos.sort()
+    return {
+        "mediana_s": statistics.median(tempos),
+        "min_s": tempos[0],
+        "p95_s": tempos[min(len(tempos) - 1, int(np.ceil(0.95 * len(tempos))) - 1)],
+        "chamadas": numero,
+        "repeticoes": repeticoes,
+    }
+
+
+def ambiente():
+    import sklearn
+
+    return {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "maquina": f"{platform.system()} {platform.machine()} ({platform.node()})",
+    }
+
+
+def rodar(base_path="models", filtro=None, repeticoes=5, n_lote=N_LOTE, alvo=ALVO_S, log=print):
+    """
+    Roda os casos (nome casando com a regex 'filtro', se dada). Devolve o dicionário da linha de base.
+    """
+    resultados = {}
+    for nome, funcao in casos(base_path, n_lote).items():
+        if filtro and not re.search(filtro, nome):
+            continue
+        resultados[nome] = cronometrar(funcao, repeticoes, alvo)
+        log(f"{nome:<40} {_formatar(resultados[nome]['mediana_s']):>10}")
+    return {"ambiente": ambiente(), "models": str(base_path), "n_lote": n_lote, "casos": resultados}
+
+
+# --- 4. Comparação ---
+def _formatar(segundos):
+    for unidade, fator in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if segundos >= fator:
+            return f"{segundos / fator:.2f} {unidade}"
+    return f"{segundos / 1e-9:.0f} ns"
+
+
+def comparar(base, atual, limite=0.25, metrica="mediana_s"):
+    """
+    Razão atual/base da métrica ('mediana_s' ou 'min_s') por caso. Devolve [(nome, base_s, atual_s, razão, situação)].
+    Situação: 'regressão' (razão > 1 + limite), 'melhora' (razão < 1 - limite), 'ok', 'novo' ou 'removido'.
+    """
+    linhas = []
+    for nome in sorted(set(base["casos"]) | set(atual["casos"])):
+        antes = base["casos"].get(nome, {}).get(metrica)
+        depois = atual["casos"].get(nome, {}).get(metrica)
+        if antes is None or depois is None:
+            linhas.append((nome, antes, depois, None, "novo" if antes is None else "removido"))
+            continue
+        razao = depois / antes
+        situacao = "regressão" if razao > 1 + limite else "melhora" if razao < 1 - limite else "ok"
+        linhas.append((nome, antes, depois, razao, situacao))
+    return linhas
+
+
+# --- 5. Linha de Comando ---
+def _ler(caminho):
+    return json.loads(Path(caminho).read_text(encoding="utf-8"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de carga, previsão e projeção com linha de base em JSON.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_rodar = sub.add_parser("rodar", help="Mede todos os casos e grava a linha de base")
+    p_rodar.add_argument("--models", default="models", help="Pasta dos artefatos")
+    p_rodar.add_argument("--filtro", help="Regex sobre o nome do caso (ex: 'projecao|lote')")
+    p_rodar.add_argument("--repeticoes", type=int, default=5)
+    p_rodar.add_argument("--alvo", type=float, default=ALVO_S, help="Segundos por repetição")
+    p_rodar.add_argument("--lote", type=int, default=N_LOTE, help="Cenários nos casos lote/*")
+    p_rodar.add_argument("--saida", help="Grava o JSON (ex: benchmarks/baselines/referencia.json)")
+    p_rodar.add_argument("--base", help="Compara com esta linha de base logo após rodar")
+    p_rodar.add_argument("--limite", type=float, default=0.25, help="Piora tolerada (0.25 = 25%%)")
+    p_rodar.add_argument("--metrica", default="mediana_s", choices=["mediana_s", "min_s"])
+
+    p_comparar = sub.add_parser("comparar", help="Compara duas rodadas e aponta regressões")
+    p_comparar.add_argument("base", help="JSON da linha de base")
+    p_comparar.add_argument("atual", help="JSON da rodada nova")
+    p_comparar.add_argument("--limite", type=float, default=0.25, help="Piora tolerada (0.25 = 25%%)")
+    p_comparar.add_argument("--metrica", default="mediana_s", choices=["mediana_s", "min_s"],
+                            help="min_s só compara rodadas com o mesmo número de repetições")
+    args = parser.parse_args(argv)
+
+    if args.comando == "rodar":
+        atual = rodar(args.models, args.filtro, args.repeticoes, args.lote, args.alvo)
+        if args.saida:
+            Path(args.saida).parent.mkdir(parents=True, exist_ok=True)
+            Path(args.saida).write_text(json.dumps(atual, indent=2, ensure_ascii=False), encoding="utf-8")
+        if not args.base:
+            return 0
+        base = _ler(args.base)
+        if args.filtro:
+            # Rodada parcial: só os casos medidos entram na comparação
+            base["casos"] = {nome: medida for nome, medida in base["casos"].items() if re.search(args.filtro, nome)}
+    else:
+        base, atual = _ler(args.base), _ler(args.atual)
+
+    if base["ambiente"]["maquina"] != atual["ambiente"]["maquina"]:
+        print(f"Atenção: linhas de base de máquinas diferentes ({base['ambiente']['maquina']} x {atual['ambiente']['maquina']}).")
+    if base.get("n_lote") != atual.get("n_lote"):
+        print(f"Atenção: lotes de tamanhos diferentes ({base.get('n_lote')} x {atual.get('n_lote')} cenários).")
+    print(f"\n{'caso':<40} {'base':>10} {'atual':>10} {'razão':>7}  situação")
+    linhas = comparar(base, atual, args.limite, args.metrica)
+    for nome, antes, depois, razao, situacao in linhas:
+        print(f"{nome:<40} {_formatar(antes) if antes else '—':>10} {_formatar(depois) if depois else '—':>10} "
+              f"{f'{razao:.2f}x' if razao else '—':>7}  {situacao}")
+
+    regressoes = [linha[0] for linha in linhas if linha[4] == "regressão"]
+    if regressoes:
+        print(f"\n{len(regressoes)} regressão(ões) acima de {args.limite:.0%}: {', '.join(regressoes)}")
+        return 1
+    print(f"\nNenhuma regressão acima de {args.limite:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
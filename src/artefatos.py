@@ -0,0 +1,15 @@
+from src.cache import carregar_ativo
+
+SEGMENTOS = ["PF", "PJ", "Rural_PF", "Rural_PJ"]
+
+
+def load_assets(segmento, base_path="models"):
+    """
+    Carrega Modelo, Scaler, Lista de Colunas e Últimos Valores do segmento (sem depender do Streamlit).
+    Resolve pelo registro de modelos (src.registro), com o cache de processo.
+    """
+    try:
+        ativo = carregar_ativo(segmento, base_path)
+        return ativo.model, ativo.scaler, ativo.cols, ativo.last_vals
+    except FileNotFoundError:
+        return None, None, None, None
@@ -0,0 +1,468 @@
+"""
+Atribuição por fator: quanto da projeção de cada mês vem da Selic, do IPCA, do Dólar, da sazonalidade
+(mes, periodo_safra) e do resto, em relação ao "Cenário Estável".
+
+Para cada mês t, a diferença entre o modelo no cenário (x_t) e na referência (r_t) é repartida entre as
+features, com soma exata: Σ_j φ_j(t) = f(x_t) - f(r_t).
+- Lineares (ModeloLinear, ou linear + StandardScaler): φ_j = peso_j x (x_j - r_j), com o scaler já
+  dobrado nos pesos.
+- Árvores (ModeloArvores do src.compilacao; as nativas são compiladas aqui): Shapley com uma única
+  referência, folha a folha. Um híbrido (features de S vindas de x, as demais de r) chega a uma folha
+  quando cada feature do caminho cumpre as condições dele. Se A são as features que só x cumpre e B as
+  que só r cumpre, a folha entra com +v·(|A|-1)!|B|!/(|A|+|B|)! em cada feature de A e com
+  -v·|A|!(|B|-1)!/(|A|+|B|)! em cada uma de B. Só os híbridos que chegam a alguma folha são percorridos
+  (o ramo se divide onde x e r divergem), com todas as linhas e árvores juntas; linhas iguais à
+  referência e árvores sem split nas features que mudaram ficam de fora.
+  Com poucas features diferentes entre x e r (k <= JOGADORES_ENUMERACAO, o caso dos sliders), é mais
+  barato prever os 2^k híbridos de cada linha num lote só e aplicar os pesos de Shapley: mesmo
+  resultado, e os híbridos extremos (tudo de x, tudo de r) já são a projeção e a referência.
+  O TreeSHAP "path-dependent" explicaria a distância até a média do treino, e não até o Cenário
+  Estável, e a soma não fecharia com a diferença entre as curvas.
+- Outros modelos: Shapley exato entre os grupos (2^grupos previsões num lote só), sem o detalhe por feature.
+
+Referência:
+- "estavel": o Cenário Estável no mesmo mês. Mede a distância entre as duas curvas; o calendário é o
+  mesmo nas duas, então a sazonalidade se cancela.
+- "inicio": o Cenário Estável no primeiro mês, repetido. Mede quanto a curva andou desde o início,
+  com a sazonalidade e os lags que ainda percorrem o histórico. Mais features mudam, e nas árvores a
+  atribuição passa da enumeração para o percurso (várias vezes o custo da projeção).
+Nos modelos de variação (app_2.py), as contribuições dos deltas se acumulam mês a mês, como o nível.
+A trava em 0% da inadimplência não é aditiva; o que ela corta aparece como "Trava em 0%".
+
+Uso:
+    python -m src.atribuicao --segmento PF --selic 0.5 --ipca 0.1
+    python -m src.atribuicao --segmento PF_RandomForest --selic 0.25 --models /tmp/modelos
+"""
+import argparse
+import weakref
+from functools import lru_cache
+from itertools import combinations
+from math import lgamma
+
+import numpy as np
+
+from src.compilacao import ModeloArvores, ModeloLinear, compilar_arvores, compilar_linear
+from src.defasagens import decompor
+from src.instrumentacao import medir
+from src.simulacao import (acumular, caminhos_delta, caminhos_nivel, feature_tensor, predict_rows,
+                           transform)
+
+GRUPOS = ("Selic", "IPCA", "Dólar", "Sazonalidade", "Outros")
+TRAVA = "Trava em 0%"
+CORES = {
+    "Selic": "#1f77b4", "IPCA": "#ff7f0e", "Dólar": "#2ca02c",
+    "Sazonalidade": "#9467bd", "Outros": "#8c564b", TRAVA: "#7f7f7f",
+}
+REFERENCIAS = ("estavel", "inicio")
+# Diferenças menores que isso (em pp) não viram a faixa "Trava em 0%"
+TOLERANCIA_TRAVA = 1e-9
+# Até quantas features diferentes entre cenário e referência a enumeração dos híbridos ganha do
+# percurso das árvores (medido em RandomForest e XGBoost de 100 árvores)
+JOGADORES_ENUMERACAO = 4
+
+
+# --- 1. Grupos ---
+def grupo(coluna):
+    """
+    Fator de uma coluna: 'selic_lag_6' -> 'Selic', 'dolar_ptax' -> 'Dólar', 'mes' -> 'Sazonalidade'.
+    """
+    serie = decompor(coluna)[0].lower()
+    if serie in ("mes", "periodo_safra"):
+        return "Sazonalidade"
+    for nome, raiz in (("Selic", "selic"), ("IPCA", "ipca"), ("Dólar", "dolar")):
+        if raiz in serie:
+            return nome
+    return "Outros"
+
+
+@lru_cache(maxsize=64)
+def _rotulos(colunas):
+    """
+    Fator de cada coluna, os grupos presentes (na ordem de GRUPOS) e a matriz (colunas x grupos) que
+    soma as colunas de cada grupo. Uma vez por lista de colunas.
+    """
+    rotulos = np.array([grupo(col) for col in colunas])
+    nomes = [nome for nome in GRUPOS if np.any(rotulos == nome)]
+    return rotulos, nomes, (rotulos[:, None] == np.array(nomes)[None]).astype(float)
+
+
+def somar_grupos(feature_names, por_feature):
+    """
+    {grupo: soma das colunas do grupo (linhas,)}, na ordem de GRUPOS e só com os grupos presentes.
+    """
+    _, nomes, soma = _rotulos(tuple(feature_names))
+    return dict(zip(nomes, (por_feature @ soma).T))
+
+
+# --- 2. Árvores ---
+@lru_cache(maxsize=64)
+def _pesos_shapley(d):
+    """
+    pesos[p, q] = p! q! / (p + q + 1)!: peso de cada feature de A (p = |A| - 1, q = |B|) e, trocando os papéis, de B.
+    """
+    p, q = np.meshgrid(np.arange(d + 1), np.arange(d + 1), indexing="ij")
+    lg = np.vectorize(lgamma)
+    return np.exp(lg(p + 1) + lg(q + 1) - lg(p + q + 2))
+
+
+def _difere(X, R):
+    # (linhas x features): x e r diferentes (NaN nos dois conta como igual)
+    return (X != R) & ~(np.isnan(X) & np.isnan(R))
+
+
+@lru_cache(maxsize=16)
+def _enumeracao(k):
+    """
+    Máscaras dos 2^k híbridos (2^k x k; True = feature vinda de X) e a matriz (k x 2^k) de pesos de Shapley:
+    na máscara, +|S|!(k-|S|-1)!/k! com S = máscara sem a feature; fora dela, o mesmo peso com S = máscara, negativo.
+    """
+    tomados = ((np.arange(2 ** k)[:, None] >> np.arange(k)) & 1).astype(bool)
+    tamanho = tomados.sum(axis=1)
+    pesos = _pesos_shapley(k)
+    W = np.where(tomados.T, pesos[np.maximum(tamanho - 1, 0), np.maximum(k - tamanho, 0)],
+                 -pesos[np.minimum(tamanho, k - 1), np.maximum(k - tamanho - 1, 0)])
+    return tomados, W
+
+
+def shapley_hibridos(modelo, X, R, difere=None):
+    """
+    φ (linhas x features) de qualquer modelo com predict sobre X e R já escalados, por enumeração: com as
+    k features que diferem em alguma linha, prevê os 2^k híbridos das linhas que diferem num lote só e
+    aplica os pesos de Shapley (features iguais são jogadores nulos, φ = 0). Custo 2^k: só para k pequeno.
+    Devolve (φ, f(X), f(R)); os híbridos extremos já são as duas previsões.
+    """
+    X = np.atleast_2d(X)
+    R = np.broadcast_to(R, X.shape)
+    difere = _difere(X, R) if difere is None else difere
+    colunas = np.flatnonzero(difere.any(axis=0))
+    linhas = np.flatnonzero(difere.any(axis=1))
+    iguais = np.flatnonzero(~difere.any(axis=1))
+    k = len(colunas)
+
+    # Híbrido do subconjunto (máscara de bits): features no subconjunto vêm de X
+    tomados, W = _enumeracao(k)
+    hibridos = np.broadcast_to(R[linhas], (2 ** k, len(linhas), X.shape[1])).copy()
+    hibridos[:, :, colunas] = np.where(tomados[:, None, :], X[linhas][:, colunas], R[linhas][:, colunas])
+    # Linhas iguais à referência entram uma vez só: f(x) = f(r)
+    valores = np.asarray(modelo.predict(np.concatenate([hibridos.reshape(-1, X.shape[1]), X[iguais]])), dtype=float)
+    V = valores[:2 ** k * len(linhas)].reshape(2 ** k, len(linhas))
+    phi = np.zeros(X.shape)
+    phi[np.ix_(linhas, colunas)] = (W @ V).T
+
+    f_x, f_r = np.empty(len(X)), np.empty(len(X))
+    f_x[linhas], f_r[linhas] = V[-1], V[0]
+    f_x[iguais] = f_r[iguais] = valores[2 ** k * len(linhas):]
+    return phi, f_x, f_r
+
+
+def _vai_esquerda(modelo, Z, linhas, no):
+    z = Z[linhas, modelo.feature[no]]
+    vai = z < modelo.limiar[no] if modelo.estrito else z <= modelo.limiar[no]
+    if modelo.faltante_esquerda is not None:
+        vai |= np.isnan(z) & modelo.faltante_esquerda[no]
+    return vai
+
+
+def shapley_arvores(modelo, X, R):
+    """
+    φ (linhas x features) de um ModeloArvores, X e R já escalados, com soma f(X) - f(R).
+    Percorre só os caminhos dos híbridos: os estados (linha, árvore, ramo) descem juntos, um nível por
+    passo. Onde x e r vão para o mesmo lado o estado só desce; onde divergem numa feature ainda livre,
+    o estado se divide (um ramo com a feature de x, outro com a de r). Feature já escolhida no ramo segue
+    o lado escolhido. Na folha, o ramo conhece A e B e entra com os pesos de Shapley.
+    """
+    # Mesmo arredondamento do predict: comparações em float32
+    X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+    R = np.ascontiguousarray(np.broadcast_to(np.asarray(R, dtype=np.float32), X.shape))
+    n, n_features = X.shape
+    d = modelo.profundidade
+    filhos = modelo.filhos
+
+    # Só linhas em que x e r diferem, e só árvores que usam alguma feature que difere
+    difere = _difere(X, R)
+    linhas_dif = np.flatnonzero(difere.any(axis=1))
+    arvores = np.flatnonzero(_features_por_arvore(modelo)[:, difere.any(axis=0)].any(axis=1))
+    linhas = np.repeat(linhas_dif, len(arvores))
+    no = np.tile(modelo.raizes[arvores], len(linhas_dif))
+    # Features escolhidas no ramo (até d) e de que lado (True = de x)
+    escolhidas = np.full((len(no), d), -1, dtype=np.intp)
+    de_x = np.zeros((len(no), d), dtype=bool)
+    k = np.zeros(len(no), dtype=np.intp)
+
+    for _ in range(d):
+        ativos = np.flatnonzero(filhos[2 * no] != no)
+        if not len(ativos):
+            break
+        f = modelo.feature[no[ativos]]
+        vx = _vai_esquerda(modelo, X, linhas[ativos], no[ativos])
+        vr = _vai_esquerda(modelo, R, linhas[ativos], no[ativos])
+        igual = escolhidas[ativos] == f[:, None]
+        tomada = igual.any(axis=1)
+        lado = np.where(tomada, np.where((igual & de_x[ativos]).any(axis=1), vx, vr), vx)
+        divide = ~tomada & (vx != vr)
+
+        # Ramo de r: cópias dos estados que se dividem
+        novos = ativos[divide]
+        no_r = filhos[2 * no[novos] + ~vr[divide]]
+        esc_r, de_x_r, k_r = escolhidas[novos].copy(), de_x[novos].copy(), k[novos].copy()
+        esc_r[np.arange(len(novos)), k_r] = f[divide]
+        k_r += 1
+
+        # Ramo de x (e estados que só descem): no próprio lugar
+        no[ativos] = filhos[2 * no[ativos] + ~lado]
+        divididos = ativos[divide]
+        escolhidas[divididos, k[divididos]] = f[divide]
+        de_x[divididos, k[divididos]] = True
+        k[divididos] += 1
+
+        linhas = np.concatenate([linhas, linhas[novos]])
+        no = np.concatenate([no, no_r])
+        escolhidas = np.concatenate([escolhidas, esc_r])
+        de_x = np.concatenate([de_x, de_x_r])
+        k = np.concatenate([k, k_r])
+
+    phi = np.zeros(n * n_features)
+    com = np.flatnonzero(k)
+    if len(com):
+        a = de_x[com].sum(axis=1)
+        b = k[com] - a
+        pesos = _pesos_shapley(int(d))
+        v = modelo.valor[no[com]] * modelo.escala
+        ganho = v * pesos[np.maximum(a - 1, 0), b]
+        perda = v * pesos[a, np.maximum(b - 1, 0)]
+        valido = escolhidas[com] >= 0
+        peso = np.where(de_x[com], ganho[:, None], -perda[:, None])
+        chave = linhas[com][:, None] * n_features + escolhidas[com]
+        phi += np.bincount(chave[valido], weights=peso[valido], minlength=n * n_features)
+    return phi.reshape(n, n_features)
+
+
+_COMPILADAS = weakref.WeakKeyDictionary()
+_USO = weakref.WeakKeyDictionary()
+
+
+def _features_por_arvore(modelo):
+    """
+    (árvores x features): a árvore tem algum split na feature. Calculado uma vez por modelo.
+    """
+    if modelo not in _USO:
+        tamanhos = np.diff(np.append(modelo.raizes, len(modelo.feature)))
+        arvore = np.repeat(np.arange(len(modelo.raizes)), tamanhos)
+        interno = modelo.filhos[0::2] != np.arange(len(modelo.feature))
+        uso = np.zeros((len(modelo.raizes), modelo.n_features_in_), dtype=bool)
+        uso[arvore[interno], modelo.feature[interno]] = True
+        _USO[modelo] = uso
+    return _USO[modelo]
+
+
+def _arvores(model):
+    if isinstance(model, ModeloArvores):
+        return model
+    # SIMULADOR_ARVORES=nativo: a projeção segue nativa, mas a atribuição precisa dos arrays
+    try:
+        if model not in _COMPILADAS:
+            _COMPILADAS[model] = compilar_arvores(model)
+        return _COMPILADAS[model]
+    except TypeError:
+        return compilar_arvores(model)
+
+
+# --- 3. Contribuições ---
+def contribuicoes(model, scaler, X, R):
+    """
+    φ (linhas x features) com Σφ = f(X) - f(R), antes da trava em 0%, o método usado e (f(X), f(R))
+    quando o cálculo já as previu (senão None). Devolve (None, None, None) quando o modelo não tem
+    caminho exato por feature.
+    """
+    linear = model if isinstance(model, ModeloLinear) else compilar_linear(model, scaler)
+    if linear is not None:
+        return (X - R) * linear.pesos, "linear", None
+    arvores = _arvores(model)
+    if arvores is None:
+        return None, None, None
+    Xs, Rs = transform(scaler, X), transform(scaler, np.broadcast_to(R, X.shape))
+    difere = _difere(Xs, Rs)
+    if difere.any(axis=0).sum() <= JOGADORES_ENUMERACAO:
+        # O modelo da projeção (compilado ou nativo): f(X) e f(R) saem como no predict_rows
+        phi, f_x, f_r = shapley_hibridos(model, Xs, Rs, difere)
+        return phi, "arvores", (f_x, f_r)
+    return shapley_arvores(arvores, Xs, Rs), "arvores", None
+
+
+def shapley_grupos(model, scaler, feature_names, X, R):
+    """
+    Shapley exato entre os grupos (jogadores = fatores), para qualquer modelo: 2^grupos híbridos num lote.
+    """
+    rotulos, nomes, _ = _rotulos(tuple(feature_names))
+    g = len(nomes)
+    R = np.broadcast_to(R, X.shape)
+    # Híbrido do subconjunto (máscara de bits): grupos no subconjunto vêm de X
+    mascaras = np.arange(2 ** g)
+    tomados = ((mascaras[:, None] >> np.arange(g)) & 1).astype(bool)
+    colunas = np.stack([rotulos == nome for nome in nomes])
+    de_x = (tomados[:, :, None] & colunas[None]).any(axis=1)
+    hibridos = np.where(de_x[:, None, :], X[None], R[None])
+    valores = predict_rows(model, scaler, hibridos.reshape(-1, X.shape[1])).reshape(2 ** g, len(X))
+
+    fatorial = np.exp(np.vectorize(lgamma)(np.arange(g + 1) + 1))
+    resultado = {}
+    for k, nome in enumerate(nomes):
+        outros = [i for i in range(g) if i != k]
+        total = np.zeros(len(X))
+        for tamanho in range(g):
+            peso = fatorial[tamanho] * fatorial[g - tamanho - 1] / fatorial[g]
+            for subconjunto in combinations(outros, tamanho):
+                sem = sum(1 << i for i in subconjunto)
+                total += peso * (valores[sem | (1 << k)] - valores[sem])
+        resultado[nome] = total
+    return resultado
+
+
+def decompor_linhas(model, scaler, feature_names, X, R):
+    """
+    Atribuição de linhas soltas (linhas x features): {"por_feature", "grupos", "metodo", "previsto"};
+    previsto = (f(X), f(R)) quando o cálculo já previu as duas (senão None).
+    """
+    R = np.broadcast_to(R, X.shape)
+    por_feature, metodo, previsto = contribuicoes(model, scaler, X, R)
+    if por_feature is None:
+        return {"por_feature": None, "grupos": shapley_grupos(model, scaler, feature_names, X, R), "metodo": "grupos",
+                "previsto": None}
+    return {"por_feature": por_feature, "grupos": somar_grupos(feature_names, por_feature), "metodo": metodo,
+            "previsto": previsto}
+
+
+def _fechar(resultado, projecao, referencia, feature_names):
+    """
+    Acrescenta as curvas e a faixa da trava (o que sobra entre a diferença das curvas e a soma dos fatores).
+    """
+    resultado.pop("previsto", None)
+    sobra = (projecao - referencia) - sum(resultado["grupos"].values())
+    if np.max(np.abs(sobra)) > TOLERANCIA_TRAVA:
+        resultado["grupos"][TRAVA] = sobra
+    resultado.update({"colunas": list(feature_names), "projecao": projecao, "referencia": referencia,
+                      "meses": np.arange(1, len(projecao) + 1)})
+    return resultado
+
+
+# --- 4. Projeções ---
+def atribuir_niveis(model, scaler, feature_names, inputs_iniciais, selic_trend, ipca_trend, dolar_trend,
+                    months=18, is_decimal=False, referencia="estavel"):
+    """
+    Atribuição mês a mês de uma projeção do app.py (modelo em nível), contra o Cenário Estável.
+    Devolve {"grupos": {fator: (meses,)}, "por_feature": (meses x features) ou None, "projecao",
+    "referencia" (curva de referência), "colunas", "meses", "metodo"}.
+    """
+    if referencia not in REFERENCIAS:
+        raise ValueError(f"Referência '{referencia}' inválida: use {REFERENCIAS}.")
+    with medir("atribuicao"):
+        caminhos, n = caminhos_nivel(feature_names, inputs_iniciais, [selic_trend, 0.0], [ipca_trend, 0.0],
+                                     [dolar_trend, 0.0], months, is_decimal)
+        X = feature_tensor(feature_names, inputs_iniciais, caminhos, n, months)
+        cenario = X[0]
+        R = X[1] if referencia == "estavel" else np.broadcast_to(X[1, :1], cenario.shape)
+        resultado = decompor_linhas(model, scaler, feature_names, cenario, R)
+        # A enumeração dos híbridos já previu cenário e referência: sem segundo predict
+        previsto = resultado["previsto"] or np.split(predict_rows(model, scaler, np.concatenate([cenario, R])), 2)
+        projecao, base = np.maximum(0.0, previsto[0]), np.maximum(0.0, previsto[1])
+        return _fechar(resultado, projecao, base, feature_names)
+
+
+def atribuir_deltas(model, scaler, feature_names, initial_input, start_inad, selic_trend, months=18):
+    """
+    Atribuição mês a mês de uma projeção do app_2.py (modelo de variação), contra o Cenário Estável:
+    as contribuições de cada delta se acumulam como o nível. Mesmo formato de atribuir_niveis.
+    """
+    with medir("atribuicao"):
+        caminhos, n = caminhos_delta(feature_names, initial_input, [selic_trend, 0.0], months)
+        X = feature_tensor(feature_names, initial_input, caminhos, n, months)
+        resultado = decompor_linhas(model, scaler, feature_names, X[0], X[1])
+        deltas = np.stack(resultado["previsto"]) if resultado["previsto"] else \
+            predict_rows(model, scaler, X.reshape(-1, X.shape[-1])).reshape(n, months)
+        projecao, base = acumular(deltas, start_inad)
+        if resultado["por_feature"] is not None:
+            resultado["por_feature"] = np.cumsum(resultado["por_feature"], axis=0)
+        resultado["grupos"] = {nome: np.cumsum(valores) for nome, valores in resultado["grupos"].items()}
+        return _fechar(resultado, projecao, base, feature_names)
+
+
+# --- 5. Gráficos ---
+def desenhar(ax, resultado, titulo=None):
+    """
+    Barras empilhadas por fator (positivos para cima, negativos para baixo) e a diferença total em linha (matplotlib).
+    """
+    meses = resultado["meses"]
+    acima, abaixo = np.zeros(len(meses)), np.zeros(len(meses))
+    for nome, valores in resultado["grupos"].items():
+        positivos, negativos = np.maximum(valores, 0.0), np.minimum(valores, 0.0)
+        ax.bar(meses, positivos, bottom=acima, color=CORES.get(nome, "#333333"), label=nome, width=0.8)
+        ax.bar(meses, negativos, bottom=abaixo, color=CORES.get(nome, "#333333"), width=0.8)
+        acima += positivos
+        abaixo += negativos
+    ax.plot(meses, resultado["projecao"] - resultado["referencia"], color="black", marker="o", linewidth=2, label="Diferença total")
+    ax.axhline(0.0, color="gray", linewidth=0.8)
+    ax.set_title(titulo or "Contribuição por Fator", fontsize=14)
+    ax.set_xlabel("Meses à Frente")
+    ax.set_ylabel("Contribuição (pp)")
+    ax.legend(fontsize=8, ncol=3)
+    ax.grid(True, axis="y", linestyle="--", alpha=0.3)
+
+
+def figura_plotly(resultado, titulo=None):
+    """
+    A mesma decomposição em barras empilhadas do Plotly (barmode 'relative': negativos para baixo).
+    """
+    import plotly.graph_objects as go
+
+    meses = resultado["meses"].tolist()
+    fig = go.Figure()
+    for nome, valores in resultado["grupos"].items():
+        fig.add_trace(go.Bar(x=meses, y=np.asarray(valores).tolist(), name=nome, marker_color=CORES.get(nome, "#333333")))
+    fig.add_trace(go.Scatter(
+        x=meses, y=(resultado["projecao"] - resultado["referencia"]).tolist(), mode="lines+markers",
+        name="Diferença total", line=dict(color="black", width=3)
+    ))
+    fig.update_layout(
+        title=titulo or "Contribuição por Fator", barmode="relative", xaxis_title="Meses à Frente",
+        yaxis_title="Contribuição (pp)", hovermode="x unified", height=400, template="plotly_white"
+    )
+    return fig
+
+
+# --- 6. Linha de Comando ---
+def main(argv=None):
+    import pandas as pd
+
+    from src.grade_cenarios import inputs_segmento
+    from src.registro import carregar
+
+    parser = argparse.ArgumentParser(description="Contribuição de cada fator, mês a mês, contra o Cenário Estável.")
+    parser.add_argument("--segmento", default="PF", help="Chave do registro: PF (nível) ou PF_Ridge, PF_RandomForest, ... (variação)")
+    parser.add_argument("--models", default="models")
+    parser.add_argument("--selic", type=float, default=0.0, help="Tendência da Selic (pp/mês)")
+    parser.add_argument("--ipca", type=float, default=0.0, help="Tendência do IPCA (pp/mês; só nível)")
+    parser.add_argument("--dolar", type=float, default=0.0, help="Tendência do Dólar (R$/mês; só nível)")
+    parser.add_argument("--referencia", default="estavel", choices=REFERENCIAS)
+    parser.add_argument("--meses", type=int, default=18)
+    args = parser.parse_args(argv)
+
+    ativo = carregar(args.segmento, args.models)
+    if "_" in args.segmento.replace("Rural_", ""):
+        start_inad = float(ativo.last_vals.get("target_lag_1", 3.0))
+        resultado = atribuir_deltas(ativo.model, ativo.scaler, ativo.cols, ativo.last_vals, start_inad, args.selic, args.meses)
+    else:
+        inputs_iniciais, is_decimal = inputs_segmento(ativo.last_vals)
+        resultado = atribuir_niveis(ativo.model, ativo.scaler, ativo.cols, inputs_iniciais, args.selic, args.ipca,
+                                    args.dolar, args.meses, is_decimal, args.referencia)
+
+    tabela = pd.DataFrame(resultado["grupos"], index=pd.Index(resultado["meses"], name="mes_a_frente"))
+    tabela["soma"] = tabela.sum(axis=1)
+    tabela["diferenca"] = resultado["projecao"] - resultado["referencia"]
+    tabela["projecao"] = resultado["projecao"]
+    print(f"{args.segmento}: método {resultado['metodo']}, referência {args.referencia}")
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(tabela.round(4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Atualização incremental da base de modelagem (no lugar da regeneração manual pelos notebooks 01–03).
+
+A base fica em Parquet, em partes só de acréscimo, com um índice mês -> parte:
+    data/processed/modelagem/
+        index.json          {"colunas": [...], "meses": {"2025-12-01": "parte_0003.parquet", ...}, "partes": [...]}
+        parte_0000.parquet  carga inicial (df_modelagem_v3.csv)
+        parte_0001.parquet  meses novos ou revisados de cada atualização
+
+Uma atualização lê só a janela das defasagens (12 meses antes do primeiro mês afetado) e a cauda,
+recalcula lags, 'mes' e 'periodo_safra' apenas para a cauda e grava uma parte nova. Em seguida,
+sempre com troca atômica de arquivo:
+- renova os last_values_*.csv dos segmentos (ponto de partida dos apps);
+- registra a versão nova no registro de modelos, se a pasta foi migrada;
+- mantém o df_modelagem_v3.csv (lido pelos notebooks e pelo Monte Carlo) em dia.
+
+Fontes: CSVs locais com a coluna 'data' e qualquer subconjunto das colunas da base, no lugar
+dos exports do SGS/BCB, IBGE e INMET. Arquivos posteriores na linha de comando têm prioridade.
+Colunas sem valor num mês novo repetem o último valor conhecido (ffill, como no notebook 03).
+
+Uso:
+    python -m src.atualizacao importar
+    python -m src.atualizacao anexar data/raw/novos/sgs.csv data/raw/novos/ibge.csv
+    python -m src.atualizacao compactar
+"""
+import argparse
+import io
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.defasagens import CSV_MODELAGEM
+from src.registro import INDICE, arquivo_segmento, escrever_atomico, ler_indice as ler_registro, registrar_soltos
+from src.simulacao import MESES_SAFRA
+
+PASTA_DADOS = "data/processed/modelagem"
+# Mesmas variáveis e defasagens do notebook 03
+VARS_LAG = ["selic", "ipca", "tx_desocupacao_p14m_pct", "rendimento_medio_mensal_reais", "dolar_ptax"]
+LAGS = (3, 6, 12)
+JANELA = max(LAGS)
+
+
+# --- 1. Índice e Partes ---
+def ler_indice(pasta=PASTA_DADOS):
+    caminho = Path(pasta) / INDICE
+    if not caminho.exists():
+        raise FileNotFoundError(f"Base '{pasta}' não encontrada. Rode 'python -m src.atualizacao importar' antes.")
+    return json.loads(caminho.read_text(encoding="utf-8"))
+
+
+def _gravar_parte(pasta, indice, df):
+    """
+    Grava as linhas de df numa parte nova e aponta os meses dela no índice (troca atômica do índice).
+    """
+    pasta = Path(pasta)
+    # Numeração sempre crescente (depois de compactar, a lista de partes encolhe)
+    numero = max((int(parte[len("parte_"):-len(".parquet")]) for parte in indice["partes"]), default=-1) + 1
+    nome = f"parte_{numero:04d}.parquet"
+    buffer = io.BytesIO()
+    df.reset_index().to_parquet(buffer, index=False)
+    escrever_atomico(pasta / nome, buffer.getvalue())
+
+    indice["partes"].append(nome)
+    for mes in df.index:
+        indice["meses"][_mes(mes)] = nome
+    indice["meses"] = dict(sorted(indice["meses"].items()))
+    escrever_atomico(pasta / INDICE, json.dumps(indice, indent=2).encode("utf-8"))
+    return nome
+
+
+def _mes(valor):
+    return pd.Timestamp(valor).to_period("M").to_timestamp().strftime("%Y-%m-%d")
+
+
+def ler_meses(pasta=PASTA_DADOS, meses=None, indice=None):
+    """
+    Linhas vigentes dos meses pedidos (todos, se meses=None). Só abre as partes que têm esses meses.
+    """
+    indice = indice or ler_indice(pasta)
+    meses = list(indice["meses"]) if meses is None else [_mes(m) for m in meses]
+
+    por_parte = {}
+    for mes in meses:
+        if mes in indice["meses"]:
+            por_parte.setdefault(indice["meses"][mes], []).append(pd.Timestamp(mes))
+
+    blocos = [
+        pd.read_parquet(Path(pasta) / parte, filters=[("data", "in", datas)])
+        for parte, datas in por_parte.items()
+    ]
+    if not blocos:
+        return pd.DataFrame(columns=indice["colunas"]).rename_axis("data")
+    return pd.concat(blocos).set_index("data").sort_index()[indice["colunas"]]
+
+
+def importar(csv_path=CSV_MODELAGEM, pasta=PASTA_DADOS):
+    """
+    Carga inicial: o CSV inteiro vira a parte 0.
+    """
+    df = pd.read_csv(csv_path, index_col="data", parse_dates=True)
+    Path(pasta).mkdir(parents=True, exist_ok=True)
+    indice = {"colunas": list(df.columns), "meses": {}, "partes": []}
+    _gravar_parte(pasta, indice, df)
+    return indice
+
+
+# --- 2. Fontes e Recálculo ---
+def ler_fontes(caminhos):
+    """
+    Junta os CSVs de fonte por mês (média dos valores do mês, como o resample do notebook 03).
+    """
+    combinado = None
+    for caminho in caminhos:
+        df = pd.read_csv(caminho, parse_dates=["data"])
+        df["data"] = df["data"].dt.to_period("M").dt.to_timestamp()
+        numericas = df.select_dtypes("number").columns
+        outras = [c for c in df.columns if c not in numericas and c != "data"]
+        agregado = df.groupby("data").agg({**{c: "mean" for c in numericas}, **{c: "last" for c in outras}})
+        combinado = agregado if combinado is None else agregado.combine_first(combinado)
+    if combinado is None:
+        raise ValueError("Nenhuma fonte informada.")
+    return combinado.sort_index()
+
+
+def recalcular(df, inicio):
+    """
+    Lags, mês e flag de safra das linhas a partir de 'inicio'. As linhas anteriores servem só de janela.
+    """
+    cauda = df.index >= inicio
+    for col in VARS_LAG:
+        if col not in df.columns:
+            continue
+        for lag in LAGS:
+            nome = f"{col}_lag_{lag}"
+            if nome in df.columns:
+                deslocado = df[col].shift(lag)
+                # Sem histórico suficiente na janela (começo da série), mantém o valor que já existia
+                df.loc[cauda, nome] = deslocado[cauda].fillna(df.loc[cauda, nome])
+    if "mes" in df.columns:
+        df.loc[cauda, "mes"] = df.index[cauda].month
+    if "periodo_safra" in df.columns:
+        df.loc[cauda, "periodo_safra"] = np.isin(df.index[cauda].month, MESES_SAFRA).astype(int)
+    return df
+
+
+def anexar(fontes, pasta=PASTA_DADOS):
+    """
+    Anexa (ou revisa) os meses das fontes. Devolve as linhas gravadas (a cauda recalculada).
+    """
+    indice = ler_indice(pasta)
+    novos = ler_fontes(fontes)
+    desconhecidas = [c for c in novos.columns if c not in indice["colunas"]]
+    if desconhecidas:
+        raise ValueError(f"Colunas fora da base: {desconhecidas}")
+
+    existentes = pd.DatetimeIndex(pd.to_datetime(list(indice["meses"])))
+    inicio = novos.index.min()
+    fim = max(novos.index.max(), existentes.max())
+
+    # Janela das defasagens + cauda já gravada (meses revisados e os que dependem deles)
+    janela_inicio = inicio - pd.DateOffset(months=JANELA)
+    df = ler_meses(pasta, existentes[existentes >= janela_inicio], indice)
+    tipos = df.dtypes
+
+    # Meses contínuos (mês a mês) para o shift dos lags não pular buracos
+    df = df.reindex(pd.date_range(min(df.index.min(), inicio), fim, freq="MS"))
+    df.update(novos)
+    df = df.ffill()
+    df = recalcular(df, inicio)
+    df = df.astype({col: tipo for col, tipo in tipos.items() if tipo.kind in "iu"})
+    df.index.name = "data"
+
+    cauda = df[df.index >= inicio]
+    _gravar_parte(pasta, indice, cauda)
+    return cauda
+
+
+def compactar(pasta=PASTA_DADOS):
+    """
+    Reescreve as linhas vigentes numa parte só e apaga as partes que ficaram sem uso.
+    """
+    indice = ler_indice(pasta)
+    df = ler_meses(pasta, indice=indice)
+    antigas = list(indice["partes"])
+    indice["meses"] = {}
+    nova = _gravar_parte(pasta, indice, df)
+    indice["partes"] = [nova]
+    escrever_atomico(Path(pasta) / INDICE, json.dumps(indice, indent=2).encode("utf-8"))
+    for parte in antigas:
+        if parte != nova:
+            (Path(pasta) / parte).unlink(missing_ok=True)
+    return nova
+
+
+# --- 3. Saídas dos Apps ---
+def atualizar_last_values(ultima, base_path="models"):
+    """
+    Renova last_values_{segmento}.csv com a linha mais recente, nas colunas de cada segmento
+    (mesmo formato do X.iloc[-1].to_csv() do notebook 08). Se a pasta foi migrada para o registro,
+    registra a versão nova do segmento. Devolve os segmentos alterados.
+    """
+    base_path = Path(base_path)
+    registro = ler_registro(base_path)
+    alterados = []
+    for path_last in sorted(base_path.glob("last_values_*.csv")):
+        segmento = path_last.stem[len("last_values_"):]
+        path_cols = arquivo_segmento(base_path, "columns", segmento, "csv")
+        if path_cols is None:
+            continue
+        cols = pd.read_csv(path_cols, nrows=0).columns
+        linhas = [f",{_mes(ultima.name)}"] + [f"{col},{float(ultima[col])!r}" for col in cols if col in ultima.index]
+        conteudo = ("\n".join(linhas) + "\n").encode("utf-8")
+        if path_last.read_bytes() == conteudo:
+            continue
+        escrever_atomico(path_last, conteudo)
+        alterados.append(segmento)
+
+    # Bundles do registro que usam esses last_values (o próprio segmento e as variantes por algoritmo)
+    renovados = {base_path / f"last_values_{segmento}.csv" for segmento in alterados}
+    for chave in registro:
+        if arquivo_segmento(base_path, "last_values", chave, "csv") in renovados:
+            registrar_soltos(chave, base_path)
+    return alterados
+
+
+def exportar_csv(cauda, csv_path=CSV_MODELAGEM, pasta=PASTA_DADOS):
+    """
+    Mantém o CSV legado em dia: só acrescenta linhas quando a cauda é toda de meses novos;
+    numa revisão de meses antigos, reescreve o arquivo a partir da base (troca atômica).
+    """
+    csv_path = Path(csv_path)
+    with open(csv_path, "rb") as f:
+        f.seek(max(0, csv_path.stat().st_size - 4096))
+        ultima_data = f.read().decode("utf-8").strip().splitlines()[-1].split(",", 1)[0]
+
+    if cauda.index.min() > pd.Timestamp(ultima_data):
+        with open(csv_path, "a", encoding="utf-8", newline="") as f:
+            cauda.to_csv(f, header=False, date_format="%Y-%m-%d")
+        return "acrescentado"
+
+    df = ler_meses(pasta)
+    escrever_atomico(csv_path, df.to_csv(date_format="%Y-%m-%d").encode("utf-8"))
+    return "reescrito"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Atualização incremental da base de modelagem.")
+    parser.add_argument("--dados", default=PASTA_DADOS, help="Pasta da base em Parquet")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_importar = sub.add_parser("importar", help="Carga inicial a partir do CSV")
+    p_importar.add_argument("--csv", default=CSV_MODELAGEM)
+
+    p_anexar = sub.add_parser("anexar", help="Anexa/revisa meses a partir de CSVs de fonte")
+    p_anexar.add_argument("fontes", nargs="+")
+    p_anexar.add_argument("--models", default="models")
+    p_anexar.add_argument("--csv", default=CSV_MODELAGEM, help="CSV legado mantido em dia ('' desliga)")
+
+    sub.add_parser("compactar", help="Junta as partes numa só")
+    args = parser.parse_args(argv)
+
+    if args.comando == "importar":
+        indice = importar(args.csv, args.dados)
+        print(f"{len(indice['meses'])} meses importados em {args.dados}")
+
+    elif args.comando == "anexar":
+        cauda = anexar(args.fontes, args.dados)
+        print(f"{len(cauda)} meses gravados ({_mes(cauda.index.min())} a {_mes(cauda.index.max())})")
+        ultima = ler_meses(args.dados, [max(ler_indice(args.dados)["meses"])]).iloc[-1]
+        alterados = atualizar_last_values(ultima, args.models)
+        print(f"last_values renovados: {', '.join(alterados) or 'nenhum'}")
+        if args.csv:
+            print(f"{args.csv}: {exportar_csv(cauda, args.csv, args.dados)}")
+
+    elif args.comando == "compactar":
+        print(f"Base compactada em {compactar(args.dados)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Backtest com origem móvel das projeções de 18 meses.
+
+Cada mês histórico do df_modelagem_v3.csv vira uma origem: a partir dele, a projeção anda 18 passos
+com as trajetórias macro que de fato aconteceram (as features observadas em t+1..t+18) e é comparada
+com a inadimplência realizada. Mesma conta dos apps:
+- nivel (app.py / predict_scenario): previsão direta do nível, com piso em 0;
+- delta (app_2.py / run_simulation): deltas acumulados a partir do nível observado na origem.
+A persistência (nível da origem repetido) entra como referência ingênua.
+
+Tudo é vetorizado nas origens: o tensor (origens x 18 x features) sai de uma janela deslizante
+sobre a matriz de features, cada modelo faz um único predict e a acumulação anda só nos 18 meses.
+Origens perto do fim da base têm menos horizontes; os passos sem dado realizado ficam como NaN.
+
+Atenção: os modelos do models/ são treinados na base inteira, então o erro aqui é dentro da amostra
+(mede a dinâmica recursiva da projeção, não a capacidade de generalizar).
+
+Uso:
+    python -m src.backtest
+    python -m src.backtest --models models --segmentos PF PJ --saida backtest.csv
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.registro import ErroArtefato, carregar
+from src.simulacao import acumular, predict_rows
+from src.treinamento import CSV_MODELAGEM, TARGETS
+
+ALGORITMOS = ("Ridge", "RandomForest", "XGBoost")
+MESES = 18
+
+
+# --- 1. Janelas Realizadas ---
+def janelas(matriz, months=MESES):
+    """
+    (linhas x colunas) -> (origens x months x colunas): a janela da origem t traz as linhas t+1..t+months.
+    As origens do fim recebem NaN nos passos além da base. View sem cópia sobre a matriz preenchida.
+    """
+    matriz = np.asarray(matriz, dtype=float)
+    if matriz.ndim == 1:
+        return janelas(matriz[:, None], months)[..., 0]
+    preenchida = np.vstack([matriz[1:], np.full((months, matriz.shape[1]), np.nan)])
+    return sliding_window_view(preenchida, months, axis=0)[:len(matriz)].transpose(0, 2, 1)
+
+
+def tensor_realizado(df, feature_names, months=MESES):
+    """
+    Features observadas nas janelas de cada origem, na ordem do modelo (colunas fora da base viram 0,
+    como no feature_tensor).
+    """
+    matriz = df.reindex(columns=list(feature_names), fill_value=0).to_numpy(dtype=float)
+    return janelas(matriz, months)
+
+
+# --- 2. Projeções por Origem ---
+def _prever(ativo, X):
+    # Um único predict para todas as origens; linhas com NaN (além da base) ficam fora e voltam como NaN
+    flat = X.reshape(-1, X.shape[-1])
+    validas = ~np.isnan(flat).any(axis=1)
+    saida = np.full(len(flat), np.nan)
+    saida[validas] = predict_rows(ativo.model, ativo.scaler, flat[validas])
+    return saida.reshape(X.shape[:-1])
+
+
+def projetar_origens(ativo, df, familia, inicio, months=MESES):
+    """
+    Projeção de 18 meses a partir de cada origem. Devolve (origens x months).
+    - inicio: nível observado em cada origem (ponto de partida dos modelos de delta)
+    """
+    previsto = _prever(ativo, tensor_realizado(df, ativo.cols, months))
+    if familia == "nivel":
+        return np.maximum(0.0, previsto)
+    return acumular(previsto, inicio)
+
+
+def metricas(previsto, realizado):
+    """
+    Erro por horizonte (colunas 1..months), ignorando os pares sem dado realizado.
+    """
+    erro = previsto - realizado
+    n = np.sum(~np.isnan(erro), axis=0)
+    with np.errstate(invalid="ignore"):
+        return pd.DataFrame({
+            "horizonte": np.arange(1, erro.shape[1] + 1),
+            "n": n,
+            "rmse": np.sqrt(np.nanmean(erro ** 2, axis=0)),
+            "mae": np.nanmean(np.abs(erro), axis=0),
+            "vies": np.nanmean(erro, axis=0),
+        })
+
+
+def backtest(csv_path=CSV_MODELAGEM, base_path="models", segmentos=None, algoritmos=ALGORITMOS, months=MESES):
+    """
+    Roda todas as origens para cada segmento/modelo disponível em base_path.
+    Devolve um DataFrame longo: segmento, modelo, horizonte, n, rmse, mae, vies.
+    """
+    df = pd.read_csv(csv_path, index_col="data", parse_dates=True)
+    blocos = []
+    for segmento in segmentos or TARGETS:
+        target_col = TARGETS[segmento]
+        if target_col not in df.columns:
+            continue
+        nivel = df[target_col].to_numpy(dtype=float)
+        realizado = janelas(nivel, months)
+        # Origens precisam do nível observado (ponto de partida) e de pelo menos um mês realizado
+        origens = ~np.isnan(nivel) & ~np.isnan(realizado[:, 0])
+
+        modelos = [("Persistencia", None, None)]
+        modelos += [("Nivel", "nivel", segmento)] + [(algo, "delta", f"{segmento}_{algo}") for algo in algoritmos]
+        for nome, familia, chave in modelos:
+            if familia is None:
+                previsto = np.repeat(nivel[:, None], months, axis=1)
+            else:
+                try:
+                    ativo = carregar(chave, base_path)
+                except (FileNotFoundError, ErroArtefato):
+                    continue
+                previsto = projetar_origens(ativo, df, familia, nivel, months)
+            tabela = metricas(previsto[origens], realizado[origens])
+            tabela.insert(0, "modelo", nome)
+            tabela.insert(0, "segmento", segmento)
+            blocos.append(tabela)
+    return pd.concat(blocos, ignore_index=True)
+
+
+# --- 3. Linha de Comando ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest com origem móvel das projeções de 18 meses.")
+    parser.add_argument("--csv", default=CSV_MODELAGEM, help="Base de modelagem")
+    parser.add_argument("--models", default="models", help="Pasta dos artefatos")
+    parser.add_argument("--segmentos", nargs="+", default=list(TARGETS), choices=list(TARGETS))
+    parser.add_argument("--meses", type=int, default=MESES, help="Horizonte da projeção")
+    parser.add_argument("--saida", default=None, help="Grava a tabela completa em CSV")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    tabela = backtest(args.csv, args.models, args.segmentos, months=args.meses)
+    duracao = time.perf_counter() - inicio
+
+    horizontes = [h for h in (1, 3, 6, 12, 18) if h <= args.meses]
+    resumo = tabela[tabela["horizonte"].isin(horizontes)].pivot_table(
+        index=["segmento", "modelo"], columns="horizonte", values="rmse", sort=False
+    )
+    resumo.columns = [f"h{h}" for h in resumo.columns]
+    print("RMSE (p.p.) por horizonte, todas as origens:")
+    print(resumo.round(3).to_string())
+    n_modelos = tabela.groupby(["segmento", "modelo"]).ngroups
+    print(f"\n{n_modelos} modelos × {int(tabela.loc[tabela['horizonte'] == 1, 'n'].max())} origens × {args.meses} meses em {duracao:.2f}s")
+
+    if args.saida:
+        tabela.to_csv(args.saida, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Cache de ativos compartilhado por todos os apps do mesmo processo.
+
+O Streamlit reexecuta o script a cada interação, mas os módulos importados continuam vivos:
+o cache fica no módulo e vale para app.py, app_1.py e app_2.py (e para todas as sessões).
+Cada entrada guarda a assinatura (mtime) dos arquivos de origem; se o modelo for retreinado,
+a próxima leitura percebe a mudança e recarrega, sem reiniciar o servidor. Numa pasta migrada, um
+retreino que grava só os arquivos soltos (notebooks) não confere com o carimbo do índice: a carga lê
+os arquivos soltos até a próxima migração (registro.desatualizado). A carga passa pelo
+src.hospedagem: os nós das árvores ficam em memória compartilhada entre os processos do servidor.
+
+O mesmo LRU (com TTL) guarda as projeções já calculadas, chaveadas pelos valores de entrada
+quantizados: posições repetidas dos sliders e o "Cenário Estável" viram uma consulta ao dicionário.
+A chave leva também a versão da base histórica (mtime): os lags dos primeiros meses vêm dela.
+- SIMULADOR_CACHE_PROJECOES: capacidade do cache de projeções (padrão 4096 trajetórias)
+- SIMULADOR_CACHE_TTL: validade de cada projeção em segundos (padrão 3600; 0 desliga o TTL)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from src.instrumentacao import medir, rotulos
+from src.defasagens import versao_historico
+from src.hospedagem import anexar
+from src.registro import PASTA_REGISTRO, INDICE, arquivo_segmento
+from src.simulacao import project_deltas, project_deltas_modelos, project_levels
+
+CAPACIDADE_PADRAO = 32
+# Casas decimais usadas para quantizar entradas: absorve o ruído de float dos sliders (0.15000000000000002)
+CASAS_PROJECAO = 9
+
+
+class CacheLRU:
+    """
+    LRU limitado e thread-safe. Cada grupo (ex: pasta + segmento + algoritmo) guarda uma única versão.
+    - ttl: segundos até uma entrada vencer (None = nunca vence)
+    """
+
+    def __init__(self, capacidade=CAPACIDADE_PADRAO, ttl=None):
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidacoes = 0
+        self.expiracoes = 0
+        self.descartes = 0
+
+    def obter(self, grupo, versao, carregar_valor):
+        """
+        Devolve o valor em cache se a versão bate; senão chama carregar_valor() e guarda.
+        A carga roda fora do lock para não travar outros grupos.
+        """
+        agora = time.monotonic()
+        with self._lock:
+            item = self._itens.get(grupo)
+            vencido = item is not None and self.ttl is not None and agora - item[2] > self.ttl
+            if item is not None and item[0] == versao and not vencido:
+                self._itens.move_to_end(grupo)
+                self.hits += 1
+                return item[1]
+            self.misses += 1
+            if vencido:
+                self.expiracoes += 1
+            elif item is not None:
+                self.invalidacoes += 1
+
+        valor = carregar_valor()
+
+        with self._lock:
+            self._itens[grupo] = (versao, valor, agora)
+            self._itens.move_to_end(grupo)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+                self.descartes += 1
+        return valor
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "itens": len(self._itens), "capacidade": self.capacidade, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses, "invalidacoes": self.invalidacoes,
+                "expiracoes": self.expiracoes, "descartes": self.descartes,
+            }
+
+
+ATIVOS = CacheLRU()
+PROJECOES = CacheLRU(
+    capacidade=int(os.environ.get("SIMULADOR_CACHE_PROJECOES", 4096)),
+    ttl=float(os.environ.get("SIMULADOR_CACHE_TTL", 3600)) or None,
+)
+
+
+def assinatura(chave, base_path="models"):
+    """
+    mtime de cada arquivo que carregar() pode ler para a chave (índice do registro e artefatos soltos).
+    """
+    base_path = Path(base_path)
+    caminhos = [base_path / PASTA_REGISTRO / INDICE, base_path / f"model_{chave}.pkl"]
+    caminhos += [arquivo_segmento(base_path, prefixo, chave, ext) for prefixo, ext in
+                 (("scaler", "pkl"), ("columns", "csv"), ("last_values", "csv"), ("meta", "pkl"))]
+
+    resultado = []
+    for caminho in caminhos:
+        try:
+            resultado.append(os.stat(caminho).st_mtime_ns if caminho is not None else None)
+        except FileNotFoundError:
+            resultado.append(None)
+    return tuple(resultado)
+
+
+def carregar_ativo(chave, base_path="models"):
+    """
+    anexar() (registro + nós compartilhados) com cache de processo: mesmo Ativo enquanto os arquivos não mudarem.
+    O Ativo é compartilhado entre sessões; quem precisar alterar last_vals deve copiar antes.
+    """
+    grupo = (str(Path(base_path).resolve()), chave)
+    with rotulos(chave), medir("carga"):
+        return ATIVOS.obter(grupo, assinatura(chave, base_path), lambda: anexar(chave, base_path))
+
+
+# --- Cache de Projeções ---
+def versao_ativo(ativo):
+    """
+    Identifica o conteúdo do modelo: checksum do bundle ou hash dos arquivos soltos.
+    """
+    return ativo.checksum or ativo.origem or id(ativo)
+
+
+def _quantizar(valor):
+    return round(float(valor), CASAS_PROJECAO)
+
+
+def _inicio(valores):
+    """
+    Valores iniciais quantizados, em ordem fixa: servem de chave e de entrada da projeção.
+    """
+    return tuple(sorted((col, _quantizar(v)) for col, v in valores.items()))
+
+
+def _congelar(preds):
+    # O array é compartilhado entre sessões: só leitura
+    preds = np.asarray(preds[0])
+    preds.flags.writeable = False
+    return preds
+
+
+def projetar_niveis(ativo, inputs_iniciais, selic_trend, ipca_trend, dolar_trend, months=18, is_decimal=False, horizonte=None):
+    """
+    project_levels() de um cenário, memorizado. Devolve um array de 'months' posições (somente leitura).
+    """
+    inicio = _inicio(inputs_iniciais)
+    trends = (_quantizar(selic_trend), _quantizar(ipca_trend), _quantizar(dolar_trend))
+    chave = ("niveis", ativo.chave, versao_ativo(ativo), versao_historico(), inicio, trends, months, bool(is_decimal), horizonte)
+
+    def calcular():
+        return _congelar(project_levels(ativo.model, ativo.scaler, ativo.cols, dict(inicio), *trends,
+                                        months=months, is_decimal=is_decimal, horizonte=horizonte))
+
+    return PROJECOES.obter(chave, None, calcular)
+
+
+def projetar_deltas(ativo, initial_input, start_inad, selic_trend, months=18):
+    """
+    project_deltas() de um cenário, memorizado. Devolve um array de 'months' posições (somente leitura).
+    """
+    inicio = _inicio(initial_input)
+    start_inad, selic_trend = _quantizar(start_inad), _quantizar(selic_trend)
+    chave = ("deltas", ativo.chave, versao_ativo(ativo), versao_historico(), inicio, start_inad, selic_trend, months)
+
+    def calcular():
+        return _congelar(project_deltas(ativo.model, ativo.scaler, ativo.cols, dict(inicio), start_inad,
+                                        selic_trend, months=months))
+
+    return PROJECOES.obter(chave, None, calcular)
+
+
+def projetar_arena(ativos, initial_input, start_inad, selic_trend, months=18):
+    """
+    Base e cenário de vários algoritmos do mesmo segmento, memorizados juntos.
+    Algoritmos com as mesmas colunas dividem o tensor de features (project_deltas_modelos).
+    Devolve um array (algoritmos x 2 x meses), somente leitura: [:, 0] base, [:, 1] cenário.
+    """
+    inicio = _inicio(initial_input)
+    start_inad, selic_trend = _quantizar(start_inad), _quantizar(selic_trend)
+    chave = ("arena", tuple((a.chave, versao_ativo(a)) for a in ativos), versao_historico(), inicio, start_inad, selic_trend, months)
+
+    def calcular():
+        grupos = {}
+        for k, ativo in enumerate(ativos):
+            grupos.setdefault(tuple(ativo.cols), []).append(k)
+        preds = np.empty((len(ativos), 2, months))
+        for cols, indices in grupos.items():
+            preds[indices] = project_deltas_modelos(
+                [(ativos[k].model, ativos[k].scaler) for k in indices], list(cols), dict(inicio),
+                start_inad, [0.0, selic_trend], months
+            )
+        preds.flags.writeable = False
+        return preds
+
+    return PROJECOES.obter(chave, None, calcular)
+
+
+def _congelar_atribuicao(resultado):
+    # Mesmo cuidado do _congelar: os arrays do resultado são compartilhados entre sessões
+    for valor in [*resultado.values(), *resultado["grupos"].values()]:
+        if isinstance(valor, np.ndarray):
+            valor.flags.writeable = False
+    return resultado
+
+
+def atribuicao_niveis(ativo, inputs_iniciais, selic_trend, ipca_trend, dolar_trend, months=18, is_decimal=False, referencia="estavel"):
+    """
+    atribuir_niveis() de um cenário, memorizado. Devolve o dicionário do src.atribuicao (arrays somente leitura).
+    """
+    from src.atribuicao import atribuir_niveis
+
+    inicio = _inicio(inputs_iniciais)
+    trends = (_quantizar(selic_trend), _quantizar(ipca_trend), _quantizar(dolar_trend))
+    chave = ("atribuicao_niveis", ativo.chave, versao_ativo(ativo), versao_historico(), inicio, trends, months, bool(is_decimal), referencia)
+
+    def calcular():
+        return _congelar_atribuicao(atribuir_niveis(ativo.model, ativo.scaler, ativo.cols, dict(inicio), *trends,
+                                                    months=months, is_decimal=is_decimal, referencia=referencia))
+
+    return PROJECOES.obter(chave, None, calcular)
+
+
+def atribuicao_deltas(ativo, initial_input, start_inad, selic_trend, months=18):
+    """
+    atribuir_deltas() de um cenário, memorizado. Devolve o dicionário do src.atribuicao (arrays somente leitura).
+    """
+    from src.atribuicao import atribuir_deltas
+
+    inicio = _inicio(initial_input)
+    start_inad, selic_trend = _quantizar(start_inad), _quantizar(selic_trend)
+    chave = ("atribuicao_deltas", ativo.chave, versao_ativo(ativo), versao_historico(), inicio, start_inad, selic_trend, months)
+
+    def calcular():
+        return _congelar_atribuicao(atribuir_deltas(ativo.model, ativo.scaler, ativo.cols, dict(inicio), start_inad,
+                                                    selic_trend, months=months))
+
+    return PROJECOES.obter(chave, None, calcular)
@@ -0,0 +1,400 @@
+"""
+Carteira: aplica as curvas projetadas de cada segmento a uma carteira de contratos (CSV ou Parquet,
+dezenas de milhões de linhas) e estima, por cenário e mês, o saldo exposto, o saldo inadimplente
+esperado e a perda esperada.
+
+Cada contrato é mapeado para PF, PJ, Rural_PF ou Rural_PJ (coluna de segmento pronta, ou tipo de
+pessoa + indicador rural). No mês m de um cenário c:
+    exposto      = saldo, enquanto prazo >= m (prazo = meses restantes do contrato)
+    inadimplente = exposto x fator x taxa do segmento(c, m) / 100
+    perda        = inadimplente x LGD
+A taxa é a inadimplência projetada do segmento: o modelo em nível do app.py ou um dos de variação do
+app_2.py (--modelo; só a Selic os move, então na saída deles ipca_trend, dolar_trend e horizon ficam
+vazios). Tudo é linear no contrato e a taxa só depende de (segmento, cenário, mês), então
+a leitura da carteira vira somas ponderadas por (grupo, segmento, prazo): um bincount por bloco, sem
+olhar os cenários. O cruzamento com a tabela cenário x mês acontece uma vez no fim, sobre os totais.
+
+A memória fica constante no tamanho do arquivo: cada processo do pool lê um bloco por vez (faixas de
+bytes do CSV alinhadas no fim de linha, ou row groups do Parquet mapeado em memória) e devolve só os
+acumuladores. A saída (uma linha por cenário, grupo, segmento e mês) é escrita em blocos de cenários.
+
+Colunas (nomes configuráveis): saldo (obrigatória); segmento, ou pessoa + rural; e, se existirem no
+arquivo, lgd, prazo e fator (multiplicador do risco do contrato sobre a taxa do segmento).
+Com --por, os totais saem também por uma coluna da carteira (produto, UF, ...).
+
+Uso:
+    python -m src.carteira carteira.parquet --selic -0.5 0.5 5 --saida perdas.parquet
+    python -m src.carteira carteira.csv --pessoa tipo_pessoa --rural rural --por produto --modelo Ridge --workers 4
+"""
+import argparse
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from src.artefatos import SEGMENTOS
+from src.grade_cenarios import _eixo, ler_lista, montar_grade
+from src.relatorio import ALGORITMOS, SO_NIVEL, _Tabela, carregar_modelos, projetar_bloco
+
+MESES = 18
+MODELOS = ("Nivel",) + ALGORITMOS
+LGD_PADRAO = 0.45
+# Faixa de bytes do CSV por tarefa e linhas por lote do Parquet: o teto de memória de cada processo
+BLOCO_BYTES = 32 * 2**20
+LINHAS_LOTE = 500_000
+# Cenários por bloco de escrita da saída
+BLOCO_SAIDA = 64
+# Somas por (grupo, segmento, prazo): saldo, saldo x fator, saldo x fator x LGD
+SOMAS = ("exposto", "ponderado", "perda")
+PESSOA_FISICA = {"PF", "F", "FISICA", "FÍSICA", "PESSOA FISICA", "PESSOA FÍSICA"}
+PESSOA_JURIDICA = {"PJ", "J", "JURIDICA", "JURÍDICA", "PESSOA JURIDICA", "PESSOA JURÍDICA"}
+
+
+# --- 1. Segmentos ---
+def _rotulo_segmento(valor):
+    texto = str(valor).strip().upper().replace(" ", "_").replace("-", "_")
+    rotulos = {seg.upper(): i for i, seg in enumerate(SEGMENTOS)}
+    return rotulos.get(texto, -1)
+
+
+def _pessoa_juridica(valor):
+    """
+    PJ / J / JURIDICA / PESSOA JURIDICA -> 1; PF / F / FISICA / PESSOA FISICA -> 0 (com ou sem acento);
+    o resto -> -1 (descartado). Só tokens exatos: "NAO INFORMADO" não vira PF.
+    """
+    texto = " ".join(str(valor).strip().upper().replace("_", " ").replace("-", " ").split())
+    if texto in PESSOA_JURIDICA:
+        return 1
+    if texto in PESSOA_FISICA:
+        return 0
+    return -1
+
+
+def _rural(valor):
+    return int(str(valor).strip().upper() in ("1", "1.0", "S", "SIM", "TRUE", "Y", "YES", "RURAL"))
+
+
+def _mapear(serie, rotular, vazio=-1):
+    """
+    Aplica 'rotular' só aos valores distintos da coluna (poucos) e espalha pelos códigos do factorize.
+    """
+    codigos, distintos = pd.factorize(serie)
+    tabela = np.array([rotular(valor) for valor in distintos] + [vazio], dtype=np.int8)
+    return tabela[codigos]
+
+
+def mapear_segmentos(df, colunas):
+    """
+    Índice em SEGMENTOS de cada contrato (int8; -1 = não mapeado).
+    """
+    if not colunas["pessoa"]:
+        return _mapear(df[colunas["segmento"]], _rotulo_segmento)
+    pj = _mapear(df[colunas["pessoa"]], _pessoa_juridica)
+    rural = _mapear(df[colunas["rural"]], _rural, 0) if colunas["rural"] else 0
+    # SEGMENTOS = PF, PJ, Rural_PF, Rural_PJ
+    return np.where(pj >= 0, pj + 2 * rural, -1).astype(np.int8)
+
+
+# --- 2. Acumuladores ---
+class Acumulador:
+    """
+    Somas (grupos x 3 x segmentos x prazo 0..months) de uma parte da carteira. Somas de partes
+    diferentes se juntam por rótulo de grupo; o tamanho não depende do número de contratos.
+    """
+
+    def __init__(self, months=MESES):
+        self.months = months
+        self.grupos = {}
+        self.somas = np.zeros((0, len(SOMAS), len(SEGMENTOS), months + 1))
+        self.linhas = 0
+        self.descartadas = 0
+        self.saldo_descartado = 0.0
+
+    def _indices(self, rotulos):
+        novos = [rotulo for rotulo in rotulos if rotulo not in self.grupos]
+        for rotulo in novos:
+            self.grupos[rotulo] = len(self.grupos)
+        if novos:
+            self.somas = np.concatenate([self.somas, np.zeros((len(novos),) + self.somas.shape[1:])])
+        return np.array([self.grupos[rotulo] for rotulo in rotulos], dtype=np.intp)
+
+    def somar(self, df, colunas, lgd_padrao=LGD_PADRAO):
+        """
+        Soma um lote da carteira (DataFrame com as colunas da configuração).
+        """
+        segmento = mapear_segmentos(df, colunas)
+        saldo = pd.to_numeric(df[colunas["saldo"]], errors="coerce").to_numpy(dtype=float)
+        ok = (segmento >= 0) & np.isfinite(saldo)
+        self.linhas += len(df)
+        self.descartadas += int((~ok).sum())
+        self.saldo_descartado += float(np.nansum(saldo[~ok]))
+
+        def numerica(nome, padrao):
+            if not colunas[nome]:
+                return padrao
+            valores = pd.to_numeric(df[colunas[nome]], errors="coerce").to_numpy(dtype=float)
+            return np.where(np.isfinite(valores), valores, padrao)
+
+        fator = numerica("fator", 1.0)
+        lgd = numerica("lgd", lgd_padrao)
+        prazo = np.clip(numerica("prazo", self.months), 0, self.months).astype(np.intp)
+        if colunas["por"]:
+            codigos, distintos = pd.factorize(df[colunas["por"]].astype(str))
+            grupo = self._indices(list(distintos))[codigos]
+        else:
+            grupo = np.broadcast_to(self._indices(["Total"]), (len(df),))
+
+        blocos = len(SEGMENTOS) * (self.months + 1)
+        chave = ((grupo * len(SEGMENTOS) + segmento) * (self.months + 1) + prazo)[ok]
+        tamanho = len(self.grupos) * blocos
+        ponderado = saldo * fator
+        for k, pesos in enumerate((saldo, ponderado, ponderado * lgd)):
+            soma = np.bincount(chave, weights=np.broadcast_to(pesos, saldo.shape)[ok], minlength=tamanho)
+            self.somas[:, k] += soma.reshape(len(self.grupos), len(SEGMENTOS), self.months + 1)
+
+    def juntar(self, outro):
+        indices = self._indices(list(outro.grupos))
+        self.somas[indices] += outro.somas
+        self.linhas += outro.linhas
+        self.descartadas += outro.descartadas
+        self.saldo_descartado += outro.saldo_descartado
+
+    def curvas(self):
+        """
+        (grupos x 3 x segmentos x meses): no mês m, a soma dos contratos com prazo >= m.
+        """
+        return np.cumsum(self.somas[..., ::-1], axis=-1)[..., ::-1][..., 1:]
+
+
+# --- 3. Leitura em Blocos ---
+def _cabecalho_csv(caminho):
+    with open(caminho, "rb") as f:
+        linha = f.readline()
+    return pd.read_csv(io.BytesIO(linha), nrows=0).columns.tolist(), len(linha)
+
+
+def tarefas(caminho, bloco_bytes=BLOCO_BYTES):
+    """
+    Pedaços independentes da carteira: faixas de bytes do CSV ou row groups do Parquet.
+    """
+    caminho = str(caminho)
+    if caminho.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        n = pq.ParquetFile(caminho).num_row_groups
+        return [("parquet", caminho, i, None) for i in range(n)]
+    _, inicio = _cabecalho_csv(caminho)
+    tamanho = os.path.getsize(caminho)
+    return [("csv", caminho, a, min(a + bloco_bytes, tamanho)) for a in range(inicio, tamanho, bloco_bytes)]
+
+
+def ler_faixa_csv(caminho, inicio, fim, usecols):
+    """
+    Linhas que começam em [inicio, fim): a faixa anterior termina a linha que atravessa 'inicio'.
+    """
+    nomes, cabecalho = _cabecalho_csv(caminho)
+    with open(caminho, "rb") as f:
+        if inicio > cabecalho:
+            f.seek(inicio - 1)
+            f.readline()
+        else:
+            f.seek(inicio)
+        posicao = f.tell()
+        if posicao >= fim:
+            return pd.DataFrame(columns=usecols)
+        dados = f.read(fim - posicao)
+        if not dados.endswith(b"\n"):
+            dados += f.readline()
+    return pd.read_csv(io.BytesIO(dados), header=None, names=nomes, usecols=usecols)
+
+
+def lotes(tarefa, usecols, linhas_lote=LINHAS_LOTE):
+    tipo, caminho, a, b = tarefa
+    if tipo == "csv":
+        yield ler_faixa_csv(caminho, a, b, usecols)
+        return
+    import pyarrow.parquet as pq
+
+    arquivo = pq.ParquetFile(caminho, memory_map=True)
+    for lote in arquivo.iter_batches(batch_size=linhas_lote, row_groups=[a], columns=usecols):
+        yield lote.to_pandas()
+
+
+def acumular_tarefa(tarefa, colunas, months=MESES, lgd_padrao=LGD_PADRAO):
+    """
+    Roda num processo do pool: lê um pedaço da carteira e devolve só o Acumulador.
+    """
+    usecols = sorted({nome for chave, nome in colunas.items() if nome})
+    acumulador = Acumulador(months)
+    for df in lotes(tarefa, usecols):
+        acumulador.somar(df, colunas, lgd_padrao)
+    return acumulador
+
+
+def resolver_colunas(caminho, saldo="saldo", segmento="segmento", pessoa=None, rural=None,
+                     lgd="lgd", prazo="prazo", fator="fator", por=None):
+    """
+    Nomes das colunas usadas. lgd, prazo e fator só entram se existirem no arquivo.
+    """
+    if str(caminho).lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        existentes = set(pq.ParquetFile(caminho).schema_arrow.names)
+    else:
+        existentes = set(_cabecalho_csv(caminho)[0])
+    colunas = {"saldo": saldo, "segmento": None if pessoa else segmento, "pessoa": pessoa, "rural": rural,
+               "lgd": lgd if lgd in existentes else None, "prazo": prazo if prazo in existentes else None,
+               "fator": fator if fator in existentes else None, "por": por}
+    faltando = [nome for chave, nome in colunas.items() if nome and nome not in existentes]
+    if faltando:
+        raise ValueError(f"Colunas fora da carteira: {faltando}")
+    return colunas
+
+
+# --- 4. Projeções e Saída ---
+def tabela_projecoes(cenarios, base_path="models", modelo="Nivel", months=MESES):
+    """
+    Taxa projetada (%) por segmento, cenário e mês: array (segmentos x cenários x meses).
+    """
+    algoritmos = () if modelo == "Nivel" else (modelo,)
+    modelos = carregar_modelos(base_path, SEGMENTOS, algoritmos)
+    faltando = [seg for seg in SEGMENTOS if modelo not in modelos.get(seg, {})]
+    if faltando:
+        raise FileNotFoundError(f"Modelo '{modelo}' não encontrado em '{base_path}' para {faltando}.")
+    projecoes = projetar_bloco({seg: {modelo: modelos[seg][modelo]} for seg in SEGMENTOS}, cenarios, months)
+    return np.stack([projecoes[(seg, modelo)][0] for seg in SEGMENTOS])
+
+
+def escrever(acumulador, taxas, cenarios, saida, bloco=BLOCO_SAIDA, modelo="Nivel"):
+    """
+    Linhas (cenário, grupo, segmento, mês) em blocos de cenários. Segmentos sem saldo na carteira ficam de fora.
+    Com um modelo de variação, as tendências que ele não usa (SO_NIVEL) saem vazias.
+    Devolve a perda total por cenário em cada mês (cenários x meses).
+    """
+    if modelo != "Nivel":
+        cenarios = {**cenarios, **{col: np.full(len(cenarios["selic_trend"]), np.nan) for col in SO_NIVEL}}
+    curvas = acumulador.curvas()
+    grupos = list(acumulador.grupos)
+    n_cenarios, months = taxas.shape[1], taxas.shape[2]
+    presentes = np.flatnonzero(curvas[:, 0].sum(axis=(0, 2)) > 0)
+    curvas = curvas[:, :, presentes]
+    taxas = taxas[presentes]
+    tabela = _Tabela(saida)
+    perdas = np.empty((n_cenarios, months))
+    try:
+        for inicio in range(0, n_cenarios, bloco):
+            fatia = slice(inicio, min(inicio + bloco, n_cenarios))
+            # (cenários x grupos x segmentos x meses)
+            taxa = taxas[:, fatia].transpose(1, 0, 2)[:, None] / 100
+            inadimplente = curvas[None, :, 1] * taxa
+            perda = curvas[None, :, 2] * taxa
+            perdas[fatia] = perda.sum(axis=(1, 2))
+            forma = inadimplente.shape
+            tabela.anexar(pd.DataFrame({
+                "cenario": np.repeat(np.arange(fatia.start, fatia.stop) + 1, np.prod(forma[1:])),
+                **{col: np.repeat(cenarios[col][fatia], np.prod(forma[1:]))
+                   for col in ("selic_trend", "ipca_trend", "dolar_trend", "horizon")},
+                "grupo": np.tile(np.repeat(grupos, forma[2] * months), forma[0]),
+                "segmento": np.tile(np.repeat(np.array(SEGMENTOS)[presentes], months), forma[0] * forma[1]),
+                "mes": np.tile(np.arange(1, months + 1), np.prod(forma[:3])),
+                "taxa_projetada": np.broadcast_to(taxa * 100, forma).ravel(),
+                "saldo_exposto": np.broadcast_to(curvas[None, :, 0], forma).ravel(),
+                "saldo_inadimplente": inadimplente.ravel(),
+                "perda_esperada": perda.ravel(),
+            }))
+    finally:
+        tabela.fechar()
+    return perdas, tabela.linhas
+
+
+# --- 5. Orquestração ---
+def pontuar(carteira, cenarios, saida, base_path="models", modelo="Nivel", colunas=None, workers=None,
+            months=MESES, lgd_padrao=LGD_PADRAO, bloco_bytes=BLOCO_BYTES, log=print):
+    """
+    Lê a carteira no pool, cruza com as projeções e grava a saída. Devolve os totais e os tempos.
+    """
+    colunas = colunas or resolver_colunas(carteira)
+    inicio = time.perf_counter()
+    taxas = tabela_projecoes(cenarios, base_path, modelo, months)
+    tempos = {"projecao": time.perf_counter() - inicio}
+
+    t = time.perf_counter()
+    pedacos = tarefas(carteira, bloco_bytes)
+    workers = min(workers or os.cpu_count() or 1, max(len(pedacos), 1))
+    total = Acumulador(months)
+    if workers == 1:
+        parciais = (acumular_tarefa(tarefa, colunas, months, lgd_padrao) for tarefa in pedacos)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        # Um pedaço por vez para cada processo; os resultados são só os acumuladores
+        parciais = executor.map(acumular_tarefa, pedacos, repeat(colunas), repeat(months), repeat(lgd_padrao))
+    try:
+        passo = max(len(pedacos) // 10, 1)
+        for k, parcial in enumerate(parciais, 1):
+            total.juntar(parcial)
+            if k % passo == 0 or k == len(pedacos):
+                log(f"  {k}/{len(pedacos)} blocos | {total.linhas:,} contratos")
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    tempos["leitura"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    perdas, linhas = escrever(total, taxas, cenarios, saida, modelo=modelo)
+    tempos["saida"] = time.perf_counter() - t
+    return {"contratos": total.linhas, "descartados": total.descartadas, "saldo_descartado": total.saldo_descartado,
+            "grupos": len(total.grupos), "linhas": linhas, "perdas": perdas, "blocos": len(pedacos),
+            "workers": workers, **tempos}
+
+
+# --- 6. Linha de Comando ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perda esperada de uma carteira de contratos sob cada cenário.")
+    parser.add_argument("carteira", help="Arquivo .csv ou .parquet com um contrato por linha")
+    parser.add_argument("--selic", nargs=3, default=["0", "0", "1"], metavar=("INI", "FIM", "N"), help="Tendência da Selic (pp/mês)")
+    parser.add_argument("--ipca", nargs=3, default=["0", "0", "1"], metavar=("INI", "FIM", "N"), help="Tendência do IPCA (pp/mês)")
+    parser.add_argument("--dolar", nargs=3, default=["0", "0", "1"], metavar=("INI", "FIM", "N"), help="Tendência do Dólar (R$/mês)")
+    parser.add_argument("--horizon", nargs="+", type=int, default=[MESES], help="Meses em que a tendência vale")
+    parser.add_argument("--lista", help="CSV com a lista de cenários (substitui a grade)")
+    parser.add_argument("--models", default="models", help="Pasta dos artefatos")
+    parser.add_argument("--modelo", default="Nivel", choices=MODELOS, help="Nivel (app.py) ou um algoritmo de variação (app_2.py)")
+    parser.add_argument("--saldo", default="saldo", help="Coluna do saldo")
+    parser.add_argument("--segmento", default="segmento", help="Coluna com PF/PJ/Rural_PF/Rural_PJ")
+    parser.add_argument("--pessoa", help="Coluna do tipo de pessoa (PF/PJ), no lugar de --segmento")
+    parser.add_argument("--rural", help="Coluna do indicador rural (1/S/sim), junto com --pessoa")
+    parser.add_argument("--por", help="Coluna de agrupamento da saída")
+    parser.add_argument("--lgd-padrao", type=float, default=LGD_PADRAO, help="LGD dos contratos sem a coluna lgd")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--bloco-mb", type=int, default=BLOCO_BYTES // 2**20, help="Faixa do CSV por tarefa (MB)")
+    parser.add_argument("--saida", default="perdas.parquet", help="Tabela: .parquet ou .csv")
+    args = parser.parse_args(argv)
+
+    if args.lista:
+        cenarios = ler_lista(args.lista, MESES)
+    else:
+        cenarios = montar_grade(_eixo(args.selic), _eixo(args.ipca), _eixo(args.dolar), args.horizon)
+    colunas = resolver_colunas(args.carteira, args.saldo, args.segmento, args.pessoa, args.rural, por=args.por)
+    print("Colunas: " + ", ".join(f"{chave}={nome}" for chave, nome in colunas.items() if nome))
+    if args.modelo != "Nivel":
+        print(f"Modelo {args.modelo}: só a tendência da Selic altera as taxas (IPCA, Dólar e horizonte ficam vazios na saída)")
+
+    inicio = time.perf_counter()
+    r = pontuar(args.carteira, cenarios, args.saida, args.models, args.modelo, colunas, args.workers,
+                lgd_padrao=args.lgd_padrao, bloco_bytes=args.bloco_mb * 2**20)
+    total = time.perf_counter() - inicio
+
+    print(f"{r['contratos']:,} contratos em {r['leitura']:.1f}s ({r['contratos'] / max(r['leitura'], 1e-9):,.0f}/s, "
+          f"{r['workers']} processos) | {len(cenarios['selic_trend'])} cenários | {r['linhas']:,} linhas em {args.saida} | {total:.1f}s")
+    if r["descartados"]:
+        print(f"  {r['descartados']:,} contratos sem segmento ou saldo ficaram de fora (saldo {r['saldo_descartado']:,.2f})")
+    final = r["perdas"][:, -1]
+    print(f"  Perda esperada no mês {r['perdas'].shape[1]}: mín {final.min():,.2f} | mediana {np.median(final):,.2f} | máx {final.max():,.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+Compilação de modelos para inferência rápida.
+
+Para os modelos lineares (Ridge + StandardScaler), scaler.transform seguido de model.predict é só um
+produto escalar: ((x - mean) / scale) @ coef + intercept = x @ (coef / scale) + (intercept - mean @ (coef / scale)).
+Dobramos o scaler nos coeficientes uma única vez na carga e a projeção vira um matmul NumPy.
+
+Ensembles de árvores (RandomForest/ExtraTrees do sklearn, XGBoost gbtree com objetivo de regressão) viram
+arrays planos de nós: feature, limiar, filhos e valor da folha, com todas as árvores concatenadas. O
+predict percorre todas as árvores de um bloco de linhas ao mesmo tempo, um nível por passo, sem o custo
+fixo do predict nativo (validação, threads do joblib, DMatrix) que domina as chamadas de uma linha do
+app_2.py. As comparações são feitas em float32, como no sklearn e no xgboost, então os caminhos nas
+árvores são os mesmos. Em lotes grandes o laço em C do predict nativo volta a ganhar (o percurso em NumPy
+faz várias passadas por nível): acima de LINHAS_NATIVO_* linhas a chamada vai para o modelo nativo. O que não for suportado (multi-alvo, splits categóricos, dart, ...) segue pelo
+predict nativo; SIMULADOR_ARVORES=nativo desliga a compilação das árvores.
+
+Conferência de paridade e tempo contra todos os modelos da pasta:
+    python -m src.compilacao --models models
+    python -m src.compilacao --models models --linhas 100000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Estimadores cujo predict é exatamente X @ coef_.T + intercept_
+LINEARES = {
+    "Ridge", "RidgeCV", "LinearRegression", "Lasso", "LassoCV",
+    "ElasticNet", "ElasticNetCV", "Lars", "LassoLars", "BayesianRidge", "ARDRegression", "HuberRegressor",
+}
+# Ensembles do sklearn cujo predict é a média das árvores
+FLORESTAS = {"RandomForestRegressor", "ExtraTreesRegressor", "DecisionTreeRegressor", "ExtraTreeRegressor"}
+# Objetivos do XGBoost em que a previsão é a própria margem (base_score + soma das folhas)
+XGB_IDENTIDADE = {"reg:squarederror", "reg:linear", "reg:absoluteerror", "reg:pseudohubererror"}
+# "compilado" (padrão) ou "nativo"
+ARVORES = os.environ.get("SIMULADOR_ARVORES", "compilado").lower()
+# Linhas x árvores por passo do percurso: os índices intermediários cabem no cache
+ELEMENTOS_BLOCO = 1 << 16
+# A partir de quantas linhas o predict nativo é mais rápido (medido com n_jobs=1, 100 árvores)
+LINHAS_NATIVO_FLORESTA = 4096
+LINHAS_NATIVO_XGBOOST = 128
+
+
+class ModeloLinear:
+    """
+    Modelo linear com o scaler já embutido: predict recebe as features na escala original.
+    """
+    inclui_scaler = True
+
+    def __init__(self, pesos, bias, n_features_in_=None):
+        self.pesos = np.ascontiguousarray(pesos, dtype=float)
+        self.bias = float(bias)
+        self.n_features_in_ = n_features_in_ or len(self.pesos)
+
+    def predict(self, X):
+        return np.asarray(X, dtype=float) @ self.pesos + self.bias
+
+    def __repr__(self):
+        return f"ModeloLinear(n_features={self.n_features_in_})"
+
+
+class ScalerPadrao:
+    """
+    Equivalente leve do StandardScaler (só o transform), reconstruído a partir de mean/scale.
+    """
+    with_mean = True
+    with_std = True
+
+    def __init__(self, mean, scale):
+        self.mean_ = np.asarray(mean, dtype=float)
+        self.scale_ = np.asarray(scale, dtype=float)
+        self.n_features_in_ = len(self.mean_)
+
+    @classmethod
+    def de_sklearn(cls, scaler):
+        n = scaler.n_features_in_
+        mean = scaler.mean_ if scaler.with_mean and getattr(scaler, "mean_", None) is not None else np.zeros(n)
+        scale = scaler.scale_ if scaler.with_std and getattr(scaler, "scale_", None) is not None else np.ones(n)
+        return cls(mean, scale)
+
+    def transform(self, X):
+        X = np.array(X, dtype=float)
+        X -= self.mean_
+        X /= self.scale_
+        return X
+
+    def __repr__(self):
+        return f"ScalerPadrao(n_features={self.n_features_in_})"
+
+
+def compilar_linear(model, scaler):
+    """
+    Dobra o StandardScaler nos coeficientes. Devolve None se o par não for (linear, StandardScaler).
+    """
+    if type(model).__name__ not in LINEARES or type(scaler).__name__ not in ("StandardScaler", "ScalerPadrao"):
+        return None
+
+    coef = np.asarray(model.coef_, dtype=float)
+    if coef.ndim != 1:
+        # Modelos multi-alvo ficam no caminho normal
+        if coef.shape[0] != 1:
+            return None
+        coef = coef[0]
+
+    intercept = float(np.ravel(getattr(model, "intercept_", 0.0))[0])
+    mean = scaler.mean_ if getattr(scaler, "mean_", None) is not None and scaler.with_mean else np.zeros_like(coef)
+    scale = scaler.scale_ if getattr(scaler, "scale_", None) is not None and scaler.with_std else np.ones_like(coef)
+
+    pesos = coef / scale
+    bias = intercept - float(mean @ pesos)
+    return ModeloLinear(pesos, bias, getattr(model, "n_features_in_", len(coef)))
+
+
+class ModeloArvores:
+    """
+    Ensemble de árvores em arrays planos (nós de todas as árvores concatenados). Recebe X já escalado:
+    o scaler segue separado, como no modelo nativo, que fica em 'nativo' (é ele que vai para o bundle).
+    - filhos: (2 x nós) achatado, esquerdo em 2i e direito em 2i + 1; folhas apontam para si mesmas,
+      então o laço roda 'profundidade' vezes sem máscara de folha
+    - estrito: x < limiar vai para a esquerda (XGBoost); senão x <= limiar (sklearn)
+    - faltante_esquerda: por nó, para onde vai o NaN (None = sempre para a direita)
+    - linhas_nativo: lotes maiores que isso vão para nativo.predict (None = sempre o percurso compilado)
+    Previsão = escala x soma das folhas + base (média das árvores na floresta, base_score no XGBoost).
+    """
+    inclui_scaler = False
+
+    def __init__(self, feature, limiar, esquerda, direita, valor, raizes, escala=1.0, base=0.0,
+                 estrito=False, faltante_esquerda=None, n_features_in_=None, nativo=None, linhas_nativo=None):
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.limiar = np.ascontiguousarray(limiar, dtype=float)
+        self.filhos = np.ascontiguousarray(np.stack([esquerda, direita], axis=1).ravel(), dtype=np.intp)
+        self.valor = np.ascontiguousarray(valor, dtype=float)
+        self.raizes = np.ascontiguousarray(raizes, dtype=np.intp)
+        self.escala = float(escala)
+        self.base = float(base)
+        self.estrito = bool(estrito)
+        self.faltante_esquerda = None if faltante_esquerda is None or not np.any(faltante_esquerda) else np.asarray(faltante_esquerda, dtype=bool)
+        self.n_features_in_ = n_features_in_ or int(self.feature.max(initial=0)) + 1
+        self.nativo = nativo
+        self.linhas_nativo = linhas_nativo if nativo is not None else None
+        self.profundidade = _profundidade(self.filhos, self.raizes)
+
+    @classmethod
+    def de_arrays(cls, arrays, escala, base, estrito, n_features_in_, profundidade, nativo=None, linhas_nativo=None):
+        """
+        Modelo sobre arrays já no formato interno (feature, limiar, filhos achatado, valor, raizes e,
+        opcional, faltante_esquerda), sem cópia nem percurso: é assim que o src.hospedagem monta os nós
+        mapeados em memória compartilhada. Os arrays podem ser somente leitura.
+        """
+        modelo = cls.__new__(cls)
+        for nome in ("feature", "limiar", "filhos", "valor", "raizes"):
+            setattr(modelo, nome, arrays[nome])
+        modelo.faltante_esquerda = arrays.get("faltante_esquerda")
+        modelo.escala, modelo.base, modelo.estrito = float(escala), float(base), bool(estrito)
+        modelo.n_features_in_ = int(n_features_in_)
+        modelo.nativo = nativo
+        modelo.linhas_nativo = linhas_nativo if nativo is not None else None
+        modelo.profundidade = int(profundidade)
+        return modelo
+
+    def _bloco(self, X):
+        plano = X.ravel()
+        deslocamento = (np.arange(len(X), dtype=np.intp) * X.shape[1])[:, None]
+        no = np.broadcast_to(self.raizes, (len(X), len(self.raizes)))
+        for _ in range(self.profundidade):
+            x = plano[deslocamento + self.feature[no]]
+            vai = x < self.limiar[no] if self.estrito else x <= self.limiar[no]
+            if self.faltante_esquerda is not None:
+                vai |= np.isnan(x) & self.faltante_esquerda[no]
+            no = self.filhos[2 * no + ~vai]
+        return self.valor[no].sum(axis=1)
+
+    def predict(self, X):
+        X = np.asarray(X)
+        if self.linhas_nativo is not None and X.ndim == 2 and len(X) > self.linhas_nativo:
+            return np.asarray(self.nativo.predict(X), dtype=float)
+        return self.percorrer(X)
+
+    def percorrer(self, X):
+        """
+        Previsão pelo percurso compilado, qualquer que seja o tamanho do lote.
+        """
+        # sklearn e xgboost comparam em float32: mesmo arredondamento, mesmos caminhos nas árvores
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        saida = np.empty(len(X))
+        passo = max(1, ELEMENTOS_BLOCO // len(self.raizes))
+        for inicio in range(0, len(X), passo):
+            saida[inicio:inicio + passo] = self._bloco(X[inicio:inicio + passo])
+        return saida * self.escala + self.base
+
+    def __repr__(self):
+        return f"ModeloArvores(arvores={len(self.raizes)}, nos={len(self.limiar)}, profundidade={self.profundidade})"
+
+
+def _profundidade(filhos, raizes):
+    nivel, profundidade = raizes, 0
+    while True:
+        internos = nivel[filhos[2 * nivel] != nivel]
+        if not len(internos):
+            return profundidade
+        nivel = np.concatenate([filhos[2 * internos], filhos[2 * internos + 1]])
+        profundidade += 1
+
+
+def _concatenar(arvores, **kwargs):
+    """
+    arvores: [(feature, limiar, esquerda, direita, valor, faltante_esquerda)] com índices locais e -1 nas folhas.
+    """
+    tamanhos = np.array([len(arvore[1]) for arvore in arvores])
+    raizes = np.concatenate([[0], np.cumsum(tamanhos)[:-1]])
+    feature, limiar, esquerda, direita, valor, faltante = (np.concatenate(coluna) for coluna in zip(*arvores))
+    # Índices globais: cada nó soma o início da sua árvore; folhas apontam para si mesmas
+    nos = np.arange(len(limiar))
+    deslocamento = np.repeat(raizes, tamanhos)
+    folha = np.asarray(esquerda) < 0
+    return ModeloArvores(
+        np.where(folha, 0, feature), np.where(folha, np.inf, limiar),
+        np.where(folha, nos, esquerda + deslocamento), np.where(folha, nos, direita + deslocamento),
+        np.where(folha, valor, 0.0), raizes, faltante_esquerda=np.asarray(faltante, dtype=bool) & ~folha, **kwargs)
+
+
+def compilar_floresta(model):
+    """
+    RandomForest/ExtraTrees (ou uma árvore só) do sklearn, com um alvo. Devolve None se não for o caso.
+    """
+    if type(model).__name__ not in FLORESTAS:
+        return None
+    estimadores = getattr(model, "estimators_", [model])
+    arvores = []
+    for estimador in estimadores:
+        arvore = estimador.tree_
+        if arvore.n_outputs != 1:
+            return None
+        faltante = getattr(arvore, "missing_go_to_left", np.zeros(arvore.node_count, dtype=bool))
+        arvores.append((arvore.feature, arvore.threshold, arvore.children_left, arvore.children_right,
+                        arvore.value[:, 0, 0], faltante))
+    return _concatenar(arvores, escala=1.0 / len(arvores), n_features_in_=model.n_features_in_,
+                       nativo=model, linhas_nativo=LINHAS_NATIVO_FLORESTA)
+
+
+def compilar_xgboost(model):
+    """
+    XGBRegressor (gbtree, um alvo, objetivo de margem identidade), lido do JSON do próprio booster.
+    Respeita o best_iteration do early stopping, como o predict do XGBRegressor.
+    """
+    if type(model).__name__ != "XGBRegressor":
+        return None
+    booster = model.get_booster()
+    aprendiz = json.loads(booster.save_raw("json"))["learner"]
+    parametros = aprendiz["learner_model_param"]
+    gbtree = aprendiz["gradient_booster"]
+    if (aprendiz["objective"]["name"] not in XGB_IDENTIDADE or gbtree["name"] != "gbtree"
+            or int(parametros.get("num_target", 1)) != 1 or int(parametros.get("num_class", 0)) > 1):
+        return None
+
+    trees = gbtree["model"]["trees"]
+    melhor = booster.attr("best_iteration")
+    if melhor is not None:
+        indptr = gbtree["model"].get("iteration_indptr")
+        por_iteracao = int(gbtree["model"]["gbtree_model_param"]["num_parallel_tree"])
+        trees = trees[:indptr[int(melhor) + 1] if indptr else (int(melhor) + 1) * por_iteracao]
+
+    arvores = []
+    for tree in trees:
+        if any(tree["split_type"]) or int(tree["tree_param"].get("size_leaf_vector", 1)) > 1:
+            return None
+        # Nas folhas, split_conditions guarda o valor da folha
+        condicoes = np.asarray(tree["split_conditions"], dtype=np.float32).astype(float)
+        arvores.append((np.asarray(tree["split_indices"]), condicoes, np.asarray(tree["left_children"]),
+                        np.asarray(tree["right_children"]), condicoes, np.asarray(tree["default_left"])))
+    base = float(str(parametros["base_score"]).strip("[]"))
+    return _concatenar(arvores, base=base, estrito=True, n_features_in_=int(parametros["num_feature"]),
+                       nativo=model, linhas_nativo=LINHAS_NATIVO_XGBOOST)
+
+
+def compilar_arvores(model):
+    """
+    Versão em arrays planos de um ensemble de árvores, ou None (formato não suportado: fica o predict nativo).
+    """
+    try:
+        return compilar_floresta(model) or compilar_xgboost(model)
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+def compilar(model, scaler):
+    """
+    Usado pelos loaders: devolve a versão compilada quando possível, senão o próprio modelo.
+    """
+    compilado = compilar_linear(model, scaler)
+    if compilado is None and ARVORES != "nativo":
+        compilado = compilar_arvores(model)
+    return compilado if compilado is not None else model
+
+
+# --- Conferência de Paridade ---
+def _pares(base_path):
+    """
+    Encontra os pares (modelo, scaler) da pasta: model_{segmento}[_{algoritmo}].pkl -> scaler_{segmento}.pkl
+    """
+    base_path = Path(base_path)
+    for path_model in sorted(base_path.glob("model_*.pkl")):
+        nome = path_model.stem[len("model_"):]
+        for segmento in (nome, nome.rsplit("_", 1)[0]):
+            path_scaler = base_path / f"scaler_{segmento}.pkl"
+            if path_scaler.exists():
+                yield path_model, path_scaler
+                break
+
+
+def _tempo(funcao, X, minimo=0.2):
+    """
+    Segundos por chamada (repete até somar 'minimo' segundos).
+    """
+    funcao(X)
+    chamadas, inicio = 0, time.perf_counter()
+    while time.perf_counter() - inicio < minimo:
+        funcao(X)
+        chamadas += 1
+    return (time.perf_counter() - inicio) / chamadas
+
+
+def conferir_paridade(base_path="models", n_linhas=1000, tol=1e-9, tol_arvores=1e-5, seed=0, cronometrar=True):
+    """
+    Compara o caminho compilado com scaler.transform + model.predict em linhas sintéticas
+    (média ± 3 desvios do scaler). Nas árvores, entram também linhas exatamente sobre os limiares, e a
+    tolerância é maior: o XGBoost soma as folhas em float32. Devolve [(arquivo, tipo, erro máximo, ok, tempos)];
+    erro None = caminho nativo; tempos = {caso: (nativo_s, compilado_s)} das árvores, com 1 linha e n_linhas.
+    """
+    import joblib
+
+    from src.simulacao import transform
+
+    rng = np.random.default_rng(seed)
+    resultado = []
+    for path_model, path_scaler in _pares(base_path):
+        model = joblib.load(path_model)
+        scaler = joblib.load(path_scaler)
+        linear = compilar_linear(model, scaler)
+        compilado = linear if linear is not None else compilar_arvores(model)
+        if compilado is None:
+            resultado.append((path_model.name, type(model).__name__, None, True, None))
+            continue
+
+        X = scaler.mean_ + scaler.scale_ * rng.uniform(-3, 3, size=(n_linhas, scaler.n_features_in_))
+        if linear is not None:
+            esperado = model.predict(transform(scaler, X))
+            erro = float(np.max(np.abs(compilado.predict(X) - esperado)))
+            ok = erro <= tol * max(1.0, float(np.max(np.abs(esperado))))
+            resultado.append((path_model.name, type(model).__name__, erro, ok, None))
+            continue
+
+        Xs = transform(scaler, X)
+        # Empates: cada feature exatamente sobre um limiar do próprio modelo
+        limiares = compilado.limiar[np.isfinite(compilado.limiar)]
+        Xs[:len(limiares)] = rng.choice(limiares, size=Xs[:len(limiares)].shape)
+        esperado = model.predict(Xs)
+        erro = float(np.max(np.abs(compilado.percorrer(Xs) - esperado)))
+        ok = erro <= tol_arvores * max(1.0, float(np.max(np.abs(esperado))))
+        tempos = None
+        if cronometrar:
+            tempos = {"1 linha": (_tempo(model.predict, Xs[:1]), _tempo(compilado.predict, Xs[:1])),
+                      f"{n_linhas} linhas": (_tempo(model.predict, Xs), _tempo(compilado.percorrer, Xs))}
+        resultado.append((path_model.name, type(model).__name__, erro, ok, tempos))
+    return resultado
+
+
+def _formatar(segundos):
+    return f"{segundos * 1e3:.2f} ms" if segundos >= 1e-3 else f"{segundos * 1e6:.0f} µs"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Confere a paridade (e o tempo) dos caminhos compilados com o predict nativo.")
+    parser.add_argument("--models", default="models", help="Pasta dos artefatos")
+    parser.add_argument("--linhas", type=int, default=1000, help="Linhas sintéticas por modelo")
+    parser.add_argument("--sem-tempo", action="store_true", help="Só a paridade")
+    args = parser.parse_args(argv)
+
+    resultado = conferir_paridade(args.models, args.linhas, cronometrar=not args.sem_tempo)
+    for arquivo, tipo, erro, ok, tempos in resultado:
+        if erro is None:
+            print(f"{'NATIVO':<7} {arquivo:<40} {tipo:<22} (sem compilação, usa o predict nativo)")
+            continue
+        print(f"{'OK' if ok else 'FALHOU':<7} {arquivo:<40} {tipo:<22} erro máx {erro:.2e}")
+        for caso, (nativo, compilado) in (tempos or {}).items():
+            print(f"{'':<8}{caso:<14} nativo {_formatar(nativo):>10} | compilado {_formatar(compilado):>10} | {nativo / compilado:6.1f}x")
+    if not resultado or not all(ok for _, _, _, ok, _ in resultado):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Estado da simulação com defasagens: cada variável simulada guarda os últimos meses num buffer
+circular do NumPy, e toda feature '<variável>_lag_<k>' é lida desse histórico.
+
+Antes, os apps gravavam o valor simulado do mês direto em selic_lag_6 (e o app_1.py copiava o mesmo
+valor para _lag_3 e _lag_6), e a estrutura de defasagens com que os modelos foram treinados se perdia.
+Agora o caminho simulado é o da variável corrente: no mês t, a feature de lag k lê o valor de t - k,
+que nos primeiros k meses ainda é o observado (últimos meses do df_modelagem_v3.csv).
+
+- buffer: (variáveis x cenários x profundidade), profundidade = maior lag pedido + 1
+- avancar(): grava o mês de todos os cenários de uma vez; O(1) por passo, sem dict nem DataFrame
+- ler(): preenche as colunas pedidas com um único fancy indexing (índices calculados uma vez no plano)
+- trajetoria(): caminhos já conhecidos (as tendências dos apps) entram todos de uma vez
+
+Variável sem histórico na base (ex: inad_anterior): o passado dela é o primeiro valor simulado, repetido.
+O histórico é memorizado pelo mtime da base: depois de um 'python -m src.atualizacao anexar', o
+servidor no ar lê a cauda nova (e o src.cache, que usa versao_historico() nas chaves, não devolve
+curvas calculadas com a antiga).
+
+Uso:
+    python -m src.defasagens --segmento PF --selic 0.5
+    python -m src.defasagens --segmento Rural_PJ --dolar 0.1 --meses 12
+"""
+import argparse
+import csv
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+
+# Base de modelagem: a mesma constante para treino, atualização, Monte Carlo e simulação
+CSV_MODELAGEM = "data/processed/df_modelagem_v3.csv"
+# Meses guardados da base: cobre os lags de 3, 6 e 12 das colunas _full com folga
+MESES_HISTORICO = 24
+_LAG = re.compile(r"^(?P<serie>.+)_lag_(?P<k>\d+)$")
+# Textos que o pandas lê como faltante
+FALTANTES = {"", "na", "nan", "null", "none", "n/a", "#n/a"}
+
+
+# --- 1. Colunas e Histórico ---
+@lru_cache(maxsize=4096)
+def decompor(coluna):
+    """
+    'selic_lag_6' -> ('selic', 6); colunas sem sufixo são a própria variável: 'selic' -> ('selic', 0).
+    """
+    m = _LAG.match(coluna)
+    return (m["serie"], int(m["k"])) if m else (coluna, 0)
+
+
+def versao_historico(caminho=CSV_MODELAGEM):
+    """
+    mtime da base (None sem o arquivo): versão do histórico nas chaves dos caches.
+    """
+    try:
+        return os.stat(caminho).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def ler_historico(caminho=CSV_MODELAGEM, meses=MESES_HISTORICO):
+    """
+    Últimos 'meses' de cada variável numérica da base (do mais antigo ao mais recente), uma vez por
+    versão do arquivo. Sem a base, devolve {} e as variáveis começam sem passado.
+    """
+    return _ler_historico(caminho, meses, versao_historico(caminho))
+
+
+def _numero(texto):
+    return np.nan if texto.strip().lower() in FALTANTES else float(texto)
+
+
+@lru_cache(maxsize=8)
+def _ler_historico(caminho, meses, versao):
+    # Módulo csv, sem pandas: a primeira projeção dos apps com a pasta migrada não importa pandas
+    try:
+        with open(caminho, newline="", encoding="utf-8") as f:
+            leitor = csv.DictReader(f)
+            # Datas ISO (AAAA-MM-DD): a ordem do texto é a cronológica
+            linhas = sorted(leitor, key=lambda linha: linha["data"])
+            colunas = leitor.fieldnames
+    except FileNotFoundError:
+        return {}
+
+    historico = {}
+    for col in colunas:
+        if col == "data" or decompor(col)[1] != 0:
+            continue
+        # Como o select_dtypes("number"): só colunas numéricas na base inteira
+        try:
+            valores = [_numero(linha[col]) for linha in linhas]
+        except ValueError:
+            continue
+        historico[col] = np.array(valores[-meses:], dtype=float)
+    return historico
+
+
+# --- 2. Estado ---
+class PlanoLeitura:
+    """
+    Índices pré-calculados de uma lista de colunas: posição na saída, variável no buffer e lag.
+    """
+
+    def __init__(self, posicoes, series, lags):
+        self.posicoes = np.asarray(posicoes, dtype=np.intp)
+        self.series = np.asarray(series, dtype=np.intp)
+        self.lags = np.asarray(lags, dtype=np.intp)
+
+
+class EstadoDefasagens:
+    """
+    Buffer circular (variáveis x cenários x profundidade). 'pos' é a próxima posição a gravar; o mês
+    corrente está em pos - 1 e o lag k em pos - 1 - k (módulo a profundidade).
+    O passado observado é o mesmo em todos os cenários: o buffer começa com uma linha só (que o NumPy
+    espalha na leitura) e só vira uma por cenário na primeira escrita de valores por cenário.
+    """
+
+    def __init__(self, series, profundidade=MESES_HISTORICO, historico=None):
+        self.series = list(series)
+        self._indice = {serie: i for i, serie in enumerate(self.series)}
+        self.profundidade = profundidade
+        self.buffer = np.zeros((len(self.series), 1, profundidade))
+        self.pos = 0
+        self._semeada = np.zeros(len(self.series), dtype=bool)
+        self._planos = {}
+        for serie, valores in (historico or {}).items():
+            if serie in self._indice:
+                self.semear(serie, valores)
+
+    @classmethod
+    def para_colunas(cls, colunas, series, historico=None):
+        """
+        Estado com a profundidade mínima para ler as colunas (das variáveis em 'series') pedidas.
+        """
+        lags = [k for serie, k in map(decompor, colunas) if serie in series]
+        return cls(series, max(lags, default=0) + 1, historico)
+
+    @property
+    def n_cenarios(self):
+        return self.buffer.shape[1]
+
+    def _expandir(self, n):
+        if n > self.buffer.shape[1]:
+            self.buffer = np.repeat(self.buffer, n, axis=1)
+
+    def semear(self, serie, valores):
+        """
+        Passado observado de uma variável: (meses,) igual para todos os cenários ou (cenários x meses).
+        Só os últimos 'profundidade' meses ficam; com menos meses, o mais antigo se repete para trás.
+        """
+        valores = np.asarray(valores, dtype=float)[..., -self.profundidade:]
+        falta = self.profundidade - valores.shape[-1]
+        if falta > 0:
+            valores = np.concatenate([np.repeat(valores[..., :1], falta, axis=-1), valores], axis=-1)
+        if valores.ndim == 2:
+            self._expandir(len(valores))
+        # O mais recente vai para pos - 1: gira o passado para alinhar com o ponteiro
+        self.buffer[self._indice[serie]] = np.roll(valores, self.pos, axis=-1) if self.pos else valores
+        self._semeada[self._indice[serie]] = True
+
+    def avancar(self, valores):
+        """
+        Um mês à frente.
+        - valores: {variável: escalar ou array (cenários,)}; as ausentes repetem o mês anterior.
+        """
+        self._expandir(max((np.size(valor) for valor in valores.values()), default=1))
+        anterior = (self.pos - 1) % self.profundidade
+        self.buffer[:, :, self.pos] = self.buffer[:, :, anterior]
+        for serie, valor in valores.items():
+            i = self._indice.get(serie)
+            if i is None:
+                continue
+            if not self._semeada[i]:
+                # Sem histórico: o passado é o primeiro valor simulado
+                self.buffer[i] = np.asarray(valor, dtype=float).reshape(-1, 1)
+                self._semeada[i] = True
+            else:
+                self.buffer[i, :, self.pos] = valor
+        self.pos = (self.pos + 1) % self.profundidade
+
+    def plano(self, colunas):
+        """
+        PlanoLeitura das colunas que vêm do estado (as demais ficam de fora, com o valor que já tiverem).
+        Memorizado por lista de colunas.
+        """
+        chave = tuple(colunas)
+        if chave in self._planos:
+            return self._planos[chave]
+        posicoes, series, lags = [], [], []
+        for j, coluna in enumerate(colunas):
+            serie, k = decompor(coluna)
+            if serie not in self._indice:
+                continue
+            if k >= self.profundidade:
+                raise ValueError(f"'{coluna}' pede {k} meses de defasagem; o estado guarda {self.profundidade}.")
+            posicoes.append(j)
+            series.append(self._indice[serie])
+            lags.append(k)
+        self._planos[chave] = PlanoLeitura(posicoes, series, lags)
+        return self._planos[chave]
+
+    def ler(self, plano, saida):
+        """
+        Escreve as colunas do plano em 'saida' (cenários x colunas), com os valores do mês corrente.
+        """
+        fatias = (self.pos - 1 - plano.lags) % self.profundidade
+        saida[:, plano.posicoes] = self.buffer[plano.series, :, fatias].T
+        return saida
+
+    def trajetoria(self, colunas, caminhos, X, continuar=True):
+        """
+        Os meses de caminhos {variável: array (cenários x meses) ou (meses,)} de uma vez, direto no
+        tensor X (cenários x meses x colunas). Equivale a avancar() + ler() mês a mês: cada coluna de
+        lag k lê os k meses finais do passado e, depois, o caminho k meses atrás (duas fatias, sem
+        cópia da linha do tempo).
+        - continuar: o buffer termina no último mês, como no passo a passo. Com False o estado não muda
+          (projeção que termina aqui): nada é copiado e o mesmo estado serve a várias chamadas.
+        """
+        plano = self.plano(colunas)
+        months = X.shape[1]
+        L = self.profundidade
+        caminhos = {serie: np.asarray(caminho, dtype=float).reshape(-1, months) for serie, caminho in caminhos.items()}
+        # Passado em ordem cronológica: o mês corrente na última posição
+        passado = np.roll(self.buffer, -self.pos, axis=-1) if self.pos else self.buffer
+
+        for j, i, k in zip(plano.posicoes, plano.series, plano.lags):
+            atraso = min(k, months)
+            caminho = caminhos.get(self.series[i])
+            if atraso:
+                # Sem histórico, o passado é o primeiro valor simulado
+                X[:, :atraso, j] = passado[i, :, L - k:L - k + atraso] if self._semeada[i] else caminho[:, :1]
+            X[:, atraso:, j] = passado[i, :, -1:] if caminho is None else caminho[:, :months - atraso]
+
+        if continuar:
+            self._continuar(passado, caminhos, months)
+        return X
+
+    def _continuar(self, passado, caminhos, months):
+        """
+        Buffer no fim de trajetoria(): os últimos L meses da linha do tempo de cada variável.
+        """
+        L = self.profundidade
+        linhas = max([passado.shape[1]] + [len(caminho) for caminho in caminhos.values()])
+        resto = max(L - months, 0)
+        novo = np.empty((len(self.series), linhas, L))
+        novo[..., :resto] = passado[..., L - resto:]
+        novo[..., resto:] = passado[..., -1:]
+        for serie, caminho in caminhos.items():
+            i = self._indice[serie]
+            if not self._semeada[i]:
+                novo[i, :, :resto] = caminho[:, :1]
+                self._semeada[i] = True
+            novo[i, :, resto:] = caminho[:, months - (L - resto):]
+        self.buffer, self.pos = novo, 0
+
+
+def estado_inicial(colunas, series, caminho=CSV_MODELAGEM):
+    """
+    EstadoDefasagens semeado com a base, memorizado por (colunas, variáveis, versão da base).
+    Compartilhado: só serve para leituras (trajetoria com continuar=False); quem for avançar o estado cria o seu.
+    """
+    return _estado_inicial(colunas, series, caminho, versao_historico(caminho))
+
+
+@lru_cache(maxsize=256)
+def _estado_inicial(colunas, series, caminho, versao):
+    return EstadoDefasagens.para_colunas(colunas, series, _ler_historico(caminho, MESES_HISTORICO, versao))
+
+
+# --- 3. Diagnóstico ---
+def main(argv=None):
+    import pandas as pd
+
+    from src.grade_cenarios import inputs_segmento
+    from src.registro import carregar
+    from src.simulacao import caminhos_nivel, feature_tensor, predict_tensor
+
+    parser = argparse.ArgumentParser(description="Features defasadas de um cenário do app.py, mês a mês.")
+    parser.add_argument("--segmento", default="PF")
+    parser.add_argument("--models", default="models")
+    parser.add_argument("--selic", type=float, default=0.0, help="Tendência da Selic (pp/mês)")
+    parser.add_argument("--ipca", type=float, default=0.0, help="Tendência do IPCA (pp/mês)")
+    parser.add_argument("--dolar", type=float, default=0.0, help="Tendência do Dólar (R$/mês)")
+    parser.add_argument("--meses", type=int, default=18)
+    args = parser.parse_args(argv)
+
+    ativo = carregar(args.segmento, args.models)
+    inputs_iniciais, is_decimal = inputs_segmento(ativo.last_vals)
+    caminhos, n = caminhos_nivel(ativo.cols, inputs_iniciais, args.selic, args.ipca, args.dolar, args.meses, is_decimal)
+    X = feature_tensor(ativo.cols, inputs_iniciais, caminhos, n, args.meses)[0]
+
+    tabela = pd.DataFrame(X, columns=ativo.cols, index=pd.RangeIndex(1, args.meses + 1, name="mes_a_frente"))
+    tabela["previsao"] = np.maximum(0.0, predict_tensor(ativo.model, ativo.scaler, X[None])[0])
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(tabela.round(4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+Estresse Reverso: qual a tendência macro mínima que leva a inadimplência de um segmento acima de um limite?
+
+A pergunta é a inversa do app.py. Por exemplo: "quanto a Selic precisa subir por mês para a PF passar
+de 6% até o mês 12?". A resposta é a tendência (Selic, IPCA, Dólar) de menor severidade cuja projeção
+cruza o limite em algum mês até o mês pedido.
+
+Severidade: norma da tendência medida em desvios-padrão da variação mensal histórica de cada variável
+(passeio aleatório do src.monte_carlo). Só as variáveis escolhidas se movem; as outras ficam em 0.
+
+Métodos:
+- forma fechada (modelos lineares compilados): o nível no mês m é a_m + g_m · t. Com as defasagens,
+  g_m só começa a crescer quando o lag de cada variável alcança a trajetória simulada, então g_m sai
+  da própria montagem das features (tendência unitária em cada variável). O mínimo é a projeção do
+  limite na direção de g_m, no mês mais barato. O resultado é conferido na projeção
+  (pisos de Selic/IPCA/Dólar); se não confere, cai na busca;
+- busca (qualquer modelo): raios em várias direções, com todos os passos numa chamada só do
+  project_levels. Depois, bissecção em grade (K pontos por rodada) no intervalo do primeiro rompimento
+  e refino angular da direção em volta do melhor raio (passo cai pela metade até TOL_ANGULO). É um
+  mínimo local: nos lineares, chega à severidade da forma fechada; nas árvores, aproxima o mínimo.
+
+Uso:
+    python -m src.estresse_reverso resolver --segmento PF --limite 6 --mes 12
+    python -m src.estresse_reverso resolver --segmento Rural_PJ --limite 8 --variaveis selic ipca dolar
+    python -m src.estresse_reverso fronteira --acrescimos 0.25 0.5 1 2 --meses 6 12 18 --saida fronteira.csv
+"""
+import argparse
+import csv
+import time
+
+import numpy as np
+
+from src.artefatos import SEGMENTOS
+from src.compilacao import ModeloLinear
+from src.defasagens import CSV_MODELAGEM
+from src.grade_cenarios import carregar_segmentos, inputs_segmento
+from src.monte_carlo import processo_historico
+from src.simulacao import caminhos_nivel, feature_tensor, project_levels
+
+VARIAVEIS = ("selic", "ipca", "dolar")
+# |tendência| máxima de cada variável na busca, nas unidades da tela (4x o alcance dos sliders)
+LIMITES_TREND = (2.0, 0.8, 2.0)
+N_DIRECOES = 64
+N_PASSOS = 24
+REFINOS = 3
+# Refino da direção em volta do melhor raio: passo angular inicial e final (radianos)
+ANGULO_INICIAL = 0.25
+TOL_ANGULO = 1e-3
+ACRESCIMOS = (0.25, 0.5, 1.0, 2.0)
+MESES = (6, 12, 18)
+
+
+# --- 1. Blocos ---
+def escalas(is_decimal=False, caminho=CSV_MODELAGEM):
+    """
+    Desvio-padrão da variação mensal histórica de Selic, IPCA e Dólar, nas unidades da tela
+    (mesma tradução do processo_manual, no sentido inverso).
+    """
+    vols = np.sqrt(np.diag(processo_historico("passeio", caminho).cov))
+    if is_decimal:
+        vols[:2] *= 100
+    return vols
+
+
+def _mascara(variaveis):
+    return np.array([v in variaveis for v in VARIAVEIS], dtype=float)
+
+
+def _picos(model, scaler, cols, inputs_iniciais, trends, mes, is_decimal):
+    """
+    Maior nível projetado até o mês pedido, por cenário, e a projeção inteira (cenários x meses).
+    - trends: array (cenários x 3)
+    """
+    niveis = project_levels(model, scaler, cols, inputs_iniciais, trends[:, 0], trends[:, 1], trends[:, 2],
+                            months=mes, is_decimal=is_decimal)
+    return niveis.max(axis=1), niveis
+
+
+def _resultado(trend, sigma, niveis, limite, metodo, inicio):
+    rompe = np.flatnonzero(niveis >= limite)
+    return {
+        # + 0.0 tira o sinal do zero negativo (variáveis paradas)
+        "selic_trend": float(trend[0]) + 0.0, "ipca_trend": float(trend[1]) + 0.0, "dolar_trend": float(trend[2]) + 0.0,
+        "severidade": float(np.linalg.norm(trend / sigma)),
+        "mes_ruptura": int(rompe[0]) + 1 if len(rompe) else None,
+        "pico": float(niveis.max()),
+        "metodo": metodo,
+        "ms": (time.perf_counter() - inicio) * 1000,
+    }
+
+
+# --- 2. Forma Fechada (modelos lineares) ---
+def forma_fechada(model, cols, inputs_iniciais, limite, mes, is_decimal, mascara, sigma):
+    """
+    Tendência de severidade mínima para o modelo linear, ignorando os pisos. None se nenhuma direção
+    permitida mexe no nível (pesos nulos nas variáveis escolhidas).
+    """
+    # Cenário estável e uma tendência unitária por variável: sem pisos no caminho (tendências positivas),
+    # a diferença é a derivada exata do nível linear em cada mês
+    unitarias = np.vstack([np.zeros(3), np.eye(3)])
+    caminhos, n = caminhos_nivel(cols, inputs_iniciais, *unitarias.T, months=mes, is_decimal=is_decimal)
+    niveis = np.asarray(model.predict(feature_tensor(cols, inputs_iniciais, caminhos, n, mes).reshape(-1, len(cols))))
+    niveis = niveis.reshape(n, mes)
+    a = niveis[0]
+    gs = (niveis[1:] - a).T * mascara * sigma
+    normas = np.linalg.norm(gs, axis=1)
+
+    c = limite - a
+    if (c <= 0).any():
+        return np.zeros(3)
+    if not normas.any():
+        return None
+    # Mês mais barato: menor severidade c_m / |g_m| entre os meses em que alguma variável mexe no nível
+    severidades = np.where(normas > 0, c / np.where(normas > 0, normas, 1.0), np.inf)
+    m = int(np.argmin(severidades))
+    return sigma * (c[m] * gs[m] / normas[m] ** 2)
+
+
+# --- 3. Busca (qualquer modelo) ---
+def direcoes(mascara, n=N_DIRECOES, seed=0):
+    """
+    Direções unitárias no espaço padronizado (t / sigma), só nas variáveis escolhidas:
+    os eixos (nos dois sentidos) mais direções aleatórias fixas.
+    """
+    eixos = np.vstack([np.diag(mascara), -np.diag(mascara)])
+    eixos = eixos[np.abs(eixos).sum(axis=1) > 0]
+    if mascara.sum() == 1:
+        return eixos
+    aleatorias = np.random.default_rng(seed).standard_normal((n, 3)) * mascara
+    d = np.vstack([eixos, aleatorias])
+    return d / np.linalg.norm(d, axis=1, keepdims=True)
+
+
+def _ruptura(model, scaler, cols, inputs_iniciais, limite, mes, is_decimal, escala, alto, baixo=None,
+             passos=N_PASSOS, refinos=REFINOS):
+    """
+    Primeiro raio s em (baixo, alto] em que a tendência s * escala rompe o limite, por direção (linha de
+    'escala'): uma grade de 'passos' pontos e mais 'refinos' rodadas de bissecção em grade no intervalo
+    do primeiro rompimento. np.inf nas direções em que nem 'alto' rompe.
+    """
+    fracoes = np.arange(1, passos + 1) / passos
+    alto = np.asarray(alto, dtype=float).copy()
+    baixo = np.zeros(len(escala)) if baixo is None else np.asarray(baixo, dtype=float).copy()
+    vivas = np.flatnonzero(np.isfinite(alto))
+    for rodada in range(refinos + 1):
+        if not len(vivas):
+            break
+        s = baixo[vivas, None] + (alto - baixo)[vivas, None] * fracoes
+        picos, _ = _picos(model, scaler, cols, inputs_iniciais,
+                          (s[:, :, None] * escala[vivas][:, None, :]).reshape(-1, 3), mes, is_decimal)
+        rompe = picos.reshape(s.shape) >= limite
+        if rodada == 0:
+            # Direções que não rompem nem no fim do intervalo ficam de fora
+            alto[vivas[~rompe.any(axis=1)]] = np.inf
+            s, rompe, vivas = s[rompe.any(axis=1)], rompe[rompe.any(axis=1)], vivas[rompe.any(axis=1)]
+        else:
+            # O último ponto (alto) rompeu na rodada anterior; o primeiro rompimento existe sempre
+            rompe[:, -1] = True
+        primeiro = rompe.argmax(axis=1)
+        linhas = np.arange(len(s))
+        baixo[vivas] = np.where(primeiro > 0, s[linhas, np.maximum(primeiro - 1, 0)], baixo[vivas])
+        alto[vivas] = s[linhas, primeiro]
+    return alto
+
+
+def _s_max(escala):
+    # Maior raio dentro de LIMITES_TREND, por direção
+    with np.errstate(divide="ignore"):
+        return np.min(np.where(escala != 0, np.asarray(LIMITES_TREND) / np.abs(escala), np.inf), axis=1)
+
+
+def buscar(model, scaler, cols, inputs_iniciais, limite, mes, is_decimal, mascara, sigma,
+           n_direcoes=N_DIRECOES, passos=N_PASSOS, refinos=REFINOS, angulo=ANGULO_INICIAL, tol_angulo=TOL_ANGULO):
+    """
+    Varre os raios t = s * sigma * d, s em (0, s_max(d)], numa única projeção vetorizada.
+    Nas direções que rompem mais cedo, refina o intervalo [último s sem rompimento, primeiro s com]
+    com 'passos' pontos por rodada. Depois refina a própria direção em volta do melhor raio: gira
+    'angulo' radianos para os dois lados de cada eixo do plano tangente e fica com quem rompe mais
+    cedo; sem melhora, o ângulo cai pela metade, até 'tol_angulo'.
+    Devolve a tendência ou None se nenhum raio rompe dentro dos limites.
+    """
+    args = (model, scaler, cols, inputs_iniciais, limite, mes, is_decimal)
+    d = direcoes(mascara, n_direcoes)
+    escala = sigma * d
+    s_max = _s_max(escala)
+
+    # Primeiro rompimento de cada raio na grade; as 4 direções mais baratas seguem para o refino
+    s_rompe = _ruptura(*args, escala, s_max, passos=passos, refinos=0)
+    if not np.isfinite(s_rompe).any():
+        return None
+    melhores = np.argsort(s_rompe)[:4]
+    melhores = melhores[np.isfinite(s_rompe[melhores])]
+    alto = s_rompe[melhores]
+    baixo = np.maximum(alto - s_max[melhores] / passos, 0.0)
+    alto = _ruptura(*args, escala[melhores], alto, baixo, passos, refinos)
+    i = int(np.argmin(alto))
+    melhor, s_melhor = d[melhores[i]], alto[i]
+
+    # Refino da direção: só há plano tangente com duas ou mais variáveis livres
+    while mascara.sum() > 1 and angulo >= tol_angulo:
+        # Base do plano tangente a 'melhor' dentro das variáveis escolhidas
+        valores, vetores = np.linalg.eigh(np.diag(mascara) - np.outer(melhor, melhor))
+        tangentes = vetores[:, valores > 0.5].T
+        candidatas = np.vstack([np.cos(angulo) * melhor + np.sin(angulo) * tangentes,
+                                np.cos(angulo) * melhor - np.sin(angulo) * tangentes])
+        escala_c = sigma * candidatas
+        # Só interessa quem rompe antes do melhor raio atual
+        s_c = _ruptura(*args, escala_c, np.minimum(s_melhor, _s_max(escala_c)), passos=passos, refinos=refinos)
+        k = int(np.argmin(s_c))
+        if s_c[k] < s_melhor * (1 - 1e-6):
+            melhor, s_melhor = candidatas[k], s_c[k]
+        else:
+            angulo /= 2
+    return s_melhor * sigma * melhor
+
+
+# --- 4. Solver ---
+def resolver(model, scaler, cols, inputs_iniciais, limite, mes=12, variaveis=("selic",), is_decimal=False, sigma=None):
+    """
+    Tendência (selic, ipca, dólar) de menor severidade que leva o nível a >= limite em algum mês até 'mes'.
+    Devolve um dict com as tendências, a severidade, o mês da ruptura, o pico, o método e o tempo (ms).
+    Severidade 0: o cenário estável já rompe. None: nenhum cenário dentro de LIMITES_TREND rompe.
+    """
+    inicio = time.perf_counter()
+    cols = list(cols)
+    mascara = _mascara(variaveis)
+    sigma = escalas(is_decimal) if sigma is None else np.asarray(sigma, dtype=float)
+
+    if isinstance(model, ModeloLinear):
+        trend = forma_fechada(model, cols, inputs_iniciais, limite, mes, is_decimal, mascara, sigma)
+        if trend is not None:
+            # Confere na projeção de verdade (pisos); uma folga de 1e-9 absorve o arredondamento
+            _, niveis = _picos(model, scaler, cols, inputs_iniciais, (trend * (1 + 1e-9))[None], mes, is_decimal)
+            if niveis.max() >= limite - 1e-9 and np.all(np.abs(trend) <= LIMITES_TREND):
+                return _resultado(trend, sigma, niveis[0], limite - 1e-9, "forma fechada", inicio)
+
+    _, niveis = _picos(model, scaler, cols, inputs_iniciais, np.zeros((1, 3)), mes, is_decimal)
+    if niveis.max() >= limite:
+        return _resultado(np.zeros(3), sigma, niveis[0], limite, "cenário estável", inicio)
+
+    trend = buscar(model, scaler, cols, inputs_iniciais, limite, mes, is_decimal, mascara, sigma)
+    if trend is None:
+        return None
+    _, niveis = _picos(model, scaler, cols, inputs_iniciais, trend[None], mes, is_decimal)
+    return _resultado(trend, sigma, niveis[0], limite, "busca", inicio)
+
+
+def fronteira(ativos, acrescimos=ACRESCIMOS, meses=MESES, variaveis=("selic",), limites=None, **iniciais):
+    """
+    Tabela da fronteira de ruptura: para cada segmento, mês e limite, o cenário mínimo que rompe.
+    Sem 'limites' absolutos, o limite é o nível do cenário estável no mês + cada acréscimo (p.p.).
+    Devolve uma lista de dicts (uma linha por combinação).
+    """
+    linhas = []
+    for segmento, (model, scaler, cols, last_vals) in ativos.items():
+        inputs_iniciais, is_decimal = inputs_segmento(last_vals, **iniciais)
+        sigma = escalas(is_decimal)
+        for mes in meses:
+            base = project_levels(model, scaler, cols, inputs_iniciais, 0.0, 0.0, 0.0, months=mes, is_decimal=is_decimal)[0]
+            alvos = [(float(limite), float(limite) - base.max()) for limite in limites] if limites else \
+                [(base.max() + acrescimo, float(acrescimo)) for acrescimo in acrescimos]
+            for limite, acrescimo in alvos:
+                resultado = resolver(model, scaler, cols, inputs_iniciais, limite, mes, variaveis, is_decimal, sigma)
+                linhas.append(dict(
+                    {"segmento": segmento, "mes": mes, "limite": limite, "acrescimo": acrescimo},
+                    **(resultado or {"metodo": "sem ruptura"})
+                ))
+    return linhas
+
+
+# --- 5. Linha de Comando ---
+def _descrever(resultado):
+    if resultado is None:
+        return "nenhum cenário dentro dos limites de tendência rompe o limite"
+    return (
+        f"Selic {resultado['selic_trend']:+.3f} pp/mês | IPCA {resultado['ipca_trend']:+.3f} pp/mês | "
+        f"Dólar {resultado['dolar_trend']:+.3f} R$/mês -> severidade {resultado['severidade']:.2f} dp, "
+        f"ruptura no mês {resultado['mes_ruptura']} ({resultado['metodo']}, {resultado['ms']:.1f} ms)"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estresse reverso: tendência mínima que rompe um limite de inadimplência.")
+    comum = argparse.ArgumentParser(add_help=False)
+    comum.add_argument("--models", default="models", help="Pasta dos artefatos")
+    comum.add_argument("--variaveis", nargs="+", default=["selic"], choices=VARIAVEIS, help="Variáveis que podem se mover")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_resolver = sub.add_parser("resolver", parents=[comum], help="Um segmento e um limite")
+    p_resolver.add_argument("--segmento", default="PF", choices=SEGMENTOS)
+    p_resolver.add_argument("--limite", type=float, required=True, help="Inadimplência (%%) a ser atingida")
+    p_resolver.add_argument("--mes", type=int, default=12, help="Até qual mês da projeção")
+
+    p_fronteira = sub.add_parser("fronteira", parents=[comum], help="Tabela de fronteira para todos os segmentos")
+    p_fronteira.add_argument("--segmentos", nargs="+", default=SEGMENTOS, choices=SEGMENTOS)
+    p_fronteira.add_argument("--acrescimos", nargs="+", type=float, default=list(ACRESCIMOS), help="p.p. acima do cenário estável")
+    p_fronteira.add_argument("--limites", nargs="+", type=float, help="Limites absolutos (%%), no lugar dos acréscimos")
+    p_fronteira.add_argument("--meses", nargs="+", type=int, default=list(MESES))
+    p_fronteira.add_argument("--saida", help="CSV com a fronteira")
+    args = parser.parse_args(argv)
+
+    if args.comando == "resolver":
+        model, scaler, cols, last_vals = carregar_segmentos([args.segmento], args.models)[args.segmento]
+        inputs_iniciais, is_decimal = inputs_segmento(last_vals)
+        resultado = resolver(model, scaler, cols, inputs_iniciais, args.limite, args.mes, args.variaveis, is_decimal)
+        print(f"{args.segmento} >= {args.limite:.2f}% até o mês {args.mes}: {_descrever(resultado)}")
+        return
+
+    ativos = carregar_segmentos(args.segmentos, args.models)
+    inicio = time.perf_counter()
+    linhas = fronteira(ativos, args.acrescimos, args.meses, args.variaveis, args.limites)
+    duracao = time.perf_counter() - inicio
+
+    print(f"{'segmento':<9} {'mês':>3} {'limite':>7}  {'selic':>7} {'ipca':>7} {'dólar':>7} {'sev.':>6}  método")
+    for linha in linhas:
+        if "severidade" not in linha:
+            print(f"{linha['segmento']:<9} {linha['mes']:>3} {linha['limite']:>7.2f}  {'—':>7} {'—':>7} {'—':>7} {'—':>6}  {linha['metodo']}")
+            continue
+        print(f"{linha['segmento']:<9} {linha['mes']:>3} {linha['limite']:>7.2f}  {linha['selic_trend']:>+7.3f} "
+              f"{linha['ipca_trend']:>+7.3f} {linha['dolar_trend']:>+7.3f} {linha['severidade']:>6.2f}  {linha['metodo']}")
+    print(f"\n{len(linhas)} cenários de ruptura em {duracao:.2f}s")
+
+    if args.saida:
+        campos = ["segmento", "mes", "limite", "acrescimo", "selic_trend", "ipca_trend", "dolar_trend",
+                  "severidade", "mes_ruptura", "pico", "metodo", "ms"]
+        with open(args.saida, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=campos, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(linhas)
+        print(f"Fronteira salva em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
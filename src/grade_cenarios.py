@@ -0,0 +1,124 @@
+"""
+Grade de Cenários: roda milhares de combinações de tendência (Selic, IPCA, Dólar, horizonte)
+para todos os segmentos sem passar pela interface.
+
+Uso:
+    python -m src.grade_cenarios --selic -0.5 0.5 41 --ipca -0.2 0.2 41 --dolar -0.5 0.5 21
+    python -m src.grade_cenarios --lista cenarios.csv --saida projecoes.npz
+"""
+import argparse
+import csv
+import time
+
+import numpy as np
+
+from src.artefatos import SEGMENTOS, load_assets
+from src.simulacao import detectar_escala, project_levels
+
+COLUNAS_CENARIO = ["selic_trend", "ipca_trend", "dolar_trend", "horizon"]
+
+
+def montar_grade(selic_trends, ipca_trends, dolar_trends, horizons=(18,)):
+    """
+    Produto cartesiano das tendências. Devolve {coluna: array (cenários,)}.
+    """
+    malha = np.meshgrid(selic_trends, ipca_trends, dolar_trends, horizons, indexing="ij")
+    return {col: eixo.ravel().astype(float) for col, eixo in zip(COLUNAS_CENARIO, malha)}
+
+
+def ler_lista(caminho, months=18):
+    """
+    Lê uma lista de cenários (CSV com selic_trend, ipca_trend, dolar_trend e, opcionalmente, horizon).
+    """
+    with open(caminho, newline="", encoding="utf-8") as f:
+        linhas = list(csv.DictReader(f))
+    cenarios = {col: np.array([float(linha[col]) for linha in linhas]) for col in COLUNAS_CENARIO[:3]}
+    cenarios["horizon"] = np.array([float(linha.get("horizon") or months) for linha in linhas])
+    return cenarios
+
+
+def inputs_segmento(last_vals, selic_inicial=None, ipca_inicial=None, dolar_inicial=None):
+    """
+    Ponto de partida igual ao da tela do app.py: Selic/IPCA em %, demais no último valor observado.
+    """
+    is_decimal, display_selic, display_ipca = detectar_escala(last_vals)
+
+    inputs_iniciais = last_vals.copy()
+    inputs_iniciais['selic_lag_6'] = display_selic if selic_inicial is None else selic_inicial
+    inputs_iniciais['ipca_lag_6'] = display_ipca if ipca_inicial is None else ipca_inicial
+    if dolar_inicial is not None and 'dolar_ptax_lag_6' in inputs_iniciais:
+        inputs_iniciais['dolar_ptax_lag_6'] = dolar_inicial
+
+    return inputs_iniciais, is_decimal
+
+
+def carregar_segmentos(segmentos=SEGMENTOS, base_path="models"):
+    ativos = {}
+    for segmento in segmentos:
+        ativos[segmento] = load_assets(segmento, base_path)
+        if ativos[segmento][0] is None:
+            raise FileNotFoundError(f"Modelo para {segmento} não encontrado em '{base_path}'.")
+    return ativos
+
+
+def projetar_grade(cenarios, ativos, months=18, **iniciais):
+    """
+    Projeta todos os cenários para cada segmento carregado.
+    Um único scaler.transform/model.predict por segmento sobre o tensor (cenários x meses x features).
+    Devolve {segmento: array (cenários x meses)}.
+    """
+    resultados = {}
+    for segmento, (model, scaler, cols, last_vals) in ativos.items():
+        inputs_iniciais, is_decimal = inputs_segmento(last_vals, **iniciais)
+        resultados[segmento] = project_levels(
+            model, scaler, cols, inputs_iniciais,
+            cenarios["selic_trend"], cenarios["ipca_trend"], cenarios["dolar_trend"],
+            months=months, is_decimal=is_decimal, horizonte=cenarios["horizon"]
+        )
+    return resultados
+
+
+def _eixo(valores):
+    inicio, fim, n = valores
+    return np.linspace(float(inicio), float(fim), int(n))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Projeção em lote de uma grade de cenários macro.")
+    parser.add_argument("--selic", nargs=3, default=["0", "0", "1"], metavar=("INI", "FIM", "N"), help="Tendência da Selic (pp/mês)")
+    parser.add_argument("--ipca", nargs=3, default=["0", "0", "1"], metavar=("INI", "FIM", "N"), help="Tendência do IPCA (pp/mês)")
+    parser.add_argument("--dolar", nargs=3, default=["0", "0", "1"], metavar=("INI", "FIM", "N"), help="Tendência do Dólar (R$/mês)")
+    parser.add_argument("--horizon", nargs="+", type=int, default=[18], help="Meses em que a tendência vale")
+    parser.add_argument("--lista", help="CSV com a lista de cenários (substitui a grade)")
+    parser.add_argument("--segmentos", nargs="+", default=SEGMENTOS, choices=SEGMENTOS)
+    parser.add_argument("--months", type=int, default=18)
+    parser.add_argument("--models", default="models", help="Pasta dos artefatos")
+    parser.add_argument("--saida", help="Arquivo .npz com os cenários e as projeções por segmento")
+    args = parser.parse_args(argv)
+
+    if args.lista:
+        cenarios = ler_lista(args.lista, args.months)
+    else:
+        cenarios = montar_grade(_eixo(args.selic), _eixo(args.ipca), _eixo(args.dolar), args.horizon)
+
+    inicio = time.perf_counter()
+    ativos = carregar_segmentos(args.segmentos, args.models)
+    carga = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    resultados = projetar_grade(cenarios, ativos, args.months)
+    duracao = time.perf_counter() - inicio
+
+    n = len(cenarios["selic_trend"])
+    print(f"{n} cenários x {args.months} meses x {len(resultados)} segmentos em {duracao:.3f}s (carga dos modelos: {carga:.3f}s)")
+    for segmento, proj in resultados.items():
+        final = proj[:, -1]
+        print(f"  {segmento:<9} mês {args.months}: min {final.min():.2f}% | mediana {np.median(final):.2f}% | max {final.max():.2f}%")
+
+    if args.saida:
+        np.savez_compressed(args.saida, **cenarios, **resultados)
+        print(f"Projeções salvas em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
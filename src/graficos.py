@@ -0,0 +1,129 @@
+"""
+Camada de gráficos dos apps: figuras memorizadas pelos valores projetados e payloads enxutos.
+
+- Matplotlib (app.py): cada thread do pool reaproveita uma única Figure (limpa a cada uso) e o que
+  sai daqui são os bytes do PNG, já renderizados na largura final da tela. Nenhuma Figure escapa
+  para o script, então nada fica vivo entre reruns; a mesma posição dos sliders vira uma consulta.
+- Plotly (app_1.py, app_2.py): a go.Figure montada é guardada pela mesma chave. Antes de guardar,
+  as séries são compactadas: float32 (o Plotly manda arrays numpy como binário base64) e, acima de
+  MAX_PONTOS, dizimadas mantendo o primeiro e o último ponto.
+
+A chave é o hash dos valores desenhados (e dos textos do gráfico): duas sessões com a mesma projeção
+dividem a figura. As entradas são compartilhadas entre sessões, então são somente leitura.
+- SIMULADOR_CACHE_GRAFICOS: capacidade do cache de figuras (padrão 512)
+
+Uso:
+    python -m benchmarks.soak_graficos --reruns 2000
+"""
+import hashlib
+import io
+import os
+import threading
+
+import numpy as np
+
+from src.cache import CacheLRU
+
+# Acima disso uma série é dizimada (leques e lotes de cenários; as projeções de 18 meses passam intactas)
+MAX_PONTOS = 500
+# Largura máxima que o st.image envia sem redimensionar (2 x 730 px). O st.pyplot salva em 200 dpi
+# (2000 px numa figura de 10"), e o Streamlit reabre, reduz e recodifica esse PNG a cada rerun
+LARGURA_MAX_PX = 1460
+
+GRAFICOS = CacheLRU(capacidade=int(os.environ.get("SIMULADOR_CACHE_GRAFICOS", 512)))
+_LOCAL = threading.local()
+
+
+# --- 1. Chave ---
+def chave_grafico(*partes):
+    """
+    Hash dos valores que definem o gráfico: arrays/listas pelos bytes em float64, o resto pelo repr.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for parte in partes:
+        if isinstance(parte, dict):
+            h.update(repr(sorted(parte)).encode())
+            parte = [parte[k] for k in sorted(parte)]
+        if isinstance(parte, (list, tuple, np.ndarray)):
+            try:
+                h.update(np.ascontiguousarray(parte, dtype=float).tobytes())
+                continue
+            except (TypeError, ValueError):
+                pass
+        h.update(repr(parte).encode())
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+# --- 2. Matplotlib ---
+def _figura(figsize):
+    """
+    Figure reaproveitada da thread corrente (uma por tamanho), limpa para o próximo desenho.
+    """
+    from matplotlib.figure import Figure
+
+    figuras = getattr(_LOCAL, "figuras", None)
+    if figuras is None:
+        figuras = _LOCAL.figuras = {}
+    fig = figuras.get(figsize)
+    if fig is None:
+        fig = figuras[figsize] = Figure(figsize=figsize)
+    fig.clear()
+    return fig
+
+
+def png(chave, desenhar, figsize=(10, 5)):
+    """
+    Bytes do PNG do gráfico, memorizados por 'chave'. No miss, desenhar(fig) recebe a Figure da
+    thread; depois do savefig ela é limpa, então nenhum artista sobrevive ao desenho.
+    """
+    def renderizar():
+        fig = _figura(figsize)
+        try:
+            desenhar(fig)
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format="png", bbox_inches="tight", dpi=LARGURA_MAX_PX // figsize[0])
+        finally:
+            fig.clear()
+        return buffer.getvalue()
+
+    return GRAFICOS.obter(("png", chave), None, renderizar)
+
+
+# --- 3. Plotly ---
+def dizimar(n, max_pontos=MAX_PONTOS):
+    """
+    Índices de até max_pontos posições igualmente espaçadas, sempre com a primeira e a última.
+    """
+    if n <= max_pontos:
+        return slice(None)
+    return np.unique(np.linspace(0, n - 1, max_pontos).round().astype(int))
+
+
+def compactar(fig, max_pontos=MAX_PONTOS):
+    """
+    Eixos numéricos em float32 (binário no JSON do Plotly); séries acima de max_pontos são dizimadas.
+    """
+    for trace in fig.data:
+        eixos = {nome: np.asarray(getattr(trace, nome)) for nome in ("x", "y") if getattr(trace, nome, None) is not None}
+        if not eixos:
+            continue
+        n = max(len(valores) for valores in eixos.values())
+        indices = dizimar(n, max_pontos)
+        for nome, valores in eixos.items():
+            if len(valores) == n and n > max_pontos:
+                valores = valores[indices]
+            if valores.dtype.kind == "f":
+                valores = valores.astype(np.float32)
+            elif valores.dtype.kind not in "iu" and n <= max_pontos:
+                continue
+            setattr(trace, nome, valores)
+    return fig
+
+
+def plotly(chave, montar, max_pontos=MAX_PONTOS):
+    """
+    go.Figure memorizada por 'chave': montar() só roda no miss, e o resultado é compactado.
+    A figura é compartilhada entre sessões; o st.plotly_chart só lê (to_dict/to_json).
+    """
+    return GRAFICOS.obter(("plotly", chave), None, lambda: compactar(montar(), max_pontos))
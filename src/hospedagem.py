@@ -0,0 +1,254 @@
+"""
+Hospedagem de modelos em memória compartilhada entre os processos do Streamlit.
+
+Com vários servidores atrás de um balanceador, cada processo carregava a sua cópia de cada modelo:
+o bundle do registro já é mapeado (mmap), então pesos, bias, scaler e last_values dos lineares ficam no
+cache de páginas e são os mesmos bytes em todos os processos; mas os ensembles de árvores eram
+desserializados (pickle do sklearn/xgboost) e compilados em arrays privados, em cada processo.
+
+Aqui os nós compilados de cada bundle (feature, limiar, filhos, valor, raizes) são publicados uma única
+vez num arquivo de segmento e todo processo os anexa com mmap somente leitura, sem cópia:
+- o segmento fica em SIMULADOR_HOSPEDAGEM_PASTA (padrão: /dev/shm/simulador-risco-credito, em RAM;
+  fora do Linux, a pasta temporária) e tem o nome do checksum do bundle: conteúdo novo, arquivo novo;
+- o primeiro processo que precisa de um segmento o compila e grava (trava de arquivo + troca atômica);
+  os demais esperam a trava e só mapeiam;
+- o modelo nativo não é desserializado na carga: ele só entra (uma vez por processo) se um lote passar
+  de linhas_nativo, como no src.compilacao. Os apps nunca chegam lá, e sklearn/xgboost nem são importados.
+
+Troca de versão: o registro grava o bundle novo e troca o index.json com os.replace; o src.cache vê o
+mtime novo e chama anexar(), que mapeia o segmento do checksum novo e substitui o Ativo de uma vez.
+Quem ainda usa o Ativo antigo continua com o mapeamento antigo (válido mesmo depois que 'limpar'
+apaga o arquivo) até soltar a referência.
+
+SIMULADOR_HOSPEDAGEM=0 volta à carga privada (registro.carregar). Memória por processo, antes e depois:
+    python -m benchmarks.memoria_workers --models models --workers 4
+
+Uso:
+    python -m src.hospedagem publicar --models models
+    python -m src.hospedagem limpar --models models /srv/outros_modelos
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from src.compilacao import ARVORES, ModeloArvores, compilar
+from src.registro import (ALINHAMENTO, PASTA_REGISTRO, ErroArtefato, abrir_bundle, carregar, desatualizado,
+                          escrever_atomico, ler_indice)
+
+MAGIC_NOS = b"SRCNOS\x00\x00"
+FORMATO_NOS = 1
+ATIVA = os.environ.get("SIMULADOR_HOSPEDAGEM", "1").lower() not in ("0", "off", "nao", "não")
+
+
+def _pasta_padrao():
+    # /dev/shm é tmpfs no Linux: o segmento nunca vai para o disco
+    raiz = Path("/dev/shm") if Path("/dev/shm").is_dir() else Path(tempfile.gettempdir())
+    return raiz / "simulador-risco-credito"
+
+
+PASTA = Path(os.environ.get("SIMULADOR_HOSPEDAGEM_PASTA") or _pasta_padrao())
+
+
+# --- 1. Segmentos de Nós ---
+def arquivo_nos(checksum, pasta=PASTA):
+    """
+    Segmento do bundle: o nome leva o checksum do bundle e o formato do segmento.
+    """
+    return Path(pasta) / f"{checksum}.f{FORMATO_NOS}.nos"
+
+
+def publicar_nos(modelo, caminho):
+    """
+    Grava os arrays de um ModeloArvores no layout do segmento (troca atômica):
+        MAGIC (8 bytes) | tamanho do cabeçalho (uint32) | cabeçalho JSON | arrays alinhados em 64 bytes
+    """
+    arrays = {nome: getattr(modelo, nome) for nome in ("feature", "limiar", "filhos", "valor", "raizes")}
+    if modelo.faltante_esquerda is not None:
+        arrays["faltante_esquerda"] = modelo.faltante_esquerda
+
+    dados = bytearray()
+    layout = {}
+    for nome, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        dados.extend(b"\x00" * (-len(dados) % ALINHAMENTO))
+        layout[nome] = {"offset": len(dados), "shape": list(arr.shape), "dtype": arr.dtype.str}
+        dados.extend(arr.tobytes())
+
+    cabecalho = {
+        "formato": FORMATO_NOS,
+        "escalares": {
+            "escala": modelo.escala, "base": modelo.base, "estrito": modelo.estrito,
+            "n_features_in_": modelo.n_features_in_, "profundidade": modelo.profundidade,
+            "linhas_nativo": modelo.linhas_nativo,
+        },
+        "arrays": layout,
+    }
+    texto = json.dumps(cabecalho).encode("utf-8")
+    texto += b" " * (-(len(MAGIC_NOS) + 4 + len(texto)) % ALINHAMENTO)
+    escrever_atomico(caminho, MAGIC_NOS + struct.pack("<I", len(texto)) + texto + bytes(dados))
+
+
+def mapear_nos(caminho, nativo=None):
+    """
+    ModeloArvores sobre o segmento mapeado: os arrays são views somente leitura do mmap.
+    """
+    with open(caminho, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buf[:len(MAGIC_NOS)] != MAGIC_NOS:
+        raise ErroArtefato(f"{caminho} não é um segmento de nós.")
+    (tamanho,) = struct.unpack_from("<I", buf, len(MAGIC_NOS))
+    inicio = len(MAGIC_NOS) + 4
+    cabecalho = json.loads(bytes(buf[inicio:inicio + tamanho]))
+    if cabecalho["formato"] != FORMATO_NOS:
+        raise ErroArtefato(f"{caminho}: formato {cabecalho['formato']} (esperado {FORMATO_NOS}).")
+
+    base = inicio + tamanho
+    arrays = {}
+    for nome, info in cabecalho["arrays"].items():
+        dtype = np.dtype(info["dtype"])
+        arrays[nome] = np.frombuffer(buf, dtype=dtype, count=int(np.prod(info["shape"])),
+                                     offset=base + info["offset"]).reshape(info["shape"])
+    # Índices gravados em outra plataforma: o percurso indexa com intp
+    for nome in ("feature", "filhos", "raizes"):
+        if arrays[nome].dtype != np.intp:
+            arrays[nome] = arrays[nome].astype(np.intp)
+    escalares = cabecalho["escalares"]
+    return ModeloArvores.de_arrays(arrays, escalares["escala"], escalares["base"], escalares["estrito"],
+                                   escalares["n_features_in_"], escalares["profundidade"],
+                                   nativo=nativo, linhas_nativo=escalares["linhas_nativo"])
+
+
+@contextmanager
+def _trava(caminho):
+    """
+    Trava exclusiva entre processos (flock) enquanto um deles compila e publica o segmento.
+    Sem fcntl (Windows), a troca atômica basta: no pior caso dois processos compilam o mesmo conteúdo.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(Path(caminho).with_suffix(".trava"), "a+b") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class NativoPreguicoso:
+    """
+    O modelo nativo do bundle, desserializado só no primeiro predict (lotes acima de linhas_nativo).
+    """
+
+    def __init__(self, carregar_nativo):
+        self._carregar = carregar_nativo
+        self._modelo = None
+        self._lock = threading.Lock()
+
+    def resolver(self):
+        if self._modelo is None:
+            with self._lock:
+                if self._modelo is None:
+                    self._modelo = self._carregar()
+        return self._modelo
+
+    def predict(self, X):
+        return self.resolver().predict(X)
+
+
+# --- 2. Carga ---
+def _montar_arvores(cabecalho, blob, scaler, pasta=PASTA):
+    """
+    montar_modelo do abrir_bundle: anexa o segmento do checksum (publica na primeira vez).
+    Modelos que o src.compilacao não transforma em árvores seguem privados, como antes.
+    """
+    if ARVORES == "nativo":
+        return compilar(blob("model"), scaler)
+    nativo = NativoPreguicoso(partial(blob, "model"))
+    caminho = arquivo_nos(cabecalho["checksum"], pasta)
+    if not caminho.exists():
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        with _trava(caminho):
+            if not caminho.exists():
+                modelo = compilar(nativo.resolver(), scaler)
+                if not isinstance(modelo, ModeloArvores):
+                    return modelo
+                publicar_nos(modelo, caminho)
+    return mapear_nos(caminho, nativo)
+
+
+def anexar(chave, base_path="models", verificar=True, pasta=PASTA):
+    """
+    carregar() com os nós das árvores em memória compartilhada. Pastas não migradas para o registro,
+    bundles desatualizados (arquivos soltos retreinados depois do registro) e SIMULADOR_HOSPEDAGEM=0
+    seguem pelo registro.carregar, privados.
+    """
+    entrada = ler_indice(base_path).get(chave)
+    if not ATIVA or entrada is None or desatualizado(chave, entrada, base_path):
+        return carregar(chave, base_path, verificar)
+    return abrir_bundle(Path(base_path) / PASTA_REGISTRO / entrada["arquivo"], verificar,
+                        montar_modelo=partial(_montar_arvores, pasta=Path(pasta)))
+
+
+# --- 3. Publicação e Limpeza ---
+def publicar(base_path="models", pasta=PASTA):
+    """
+    Publica os segmentos de todos os bundles do índice (antes de subir os servidores: nenhum worker
+    paga a compilação). Devolve [(chave, caminho do segmento ou None se o modelo não é de árvores)].
+    """
+    resultado = []
+    for chave, entrada in sorted(ler_indice(base_path).items()):
+        ativo = anexar(chave, base_path, pasta=pasta)
+        caminho = arquivo_nos(entrada["checksum"], pasta)
+        resultado.append((chave, caminho if isinstance(ativo.model, ModeloArvores) and caminho.exists() else None))
+    return resultado
+
+
+def limpar(bases=("models",), pasta=PASTA):
+    """
+    Apaga os segmentos que nenhum índice das pastas 'bases' usa mais (versões substituídas).
+    Processos que ainda mapeiam um segmento apagado continuam com ele até soltar o Ativo.
+    """
+    usados = {arquivo_nos(entrada["checksum"], pasta).name for base in bases for entrada in ler_indice(base).values()}
+    removidos = []
+    for caminho in sorted(Path(pasta).glob("*.nos")):
+        if caminho.name not in usados:
+            caminho.unlink(missing_ok=True)
+            caminho.with_suffix(".trava").unlink(missing_ok=True)
+            removidos.append(caminho)
+    return removidos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nós das árvores em memória compartilhada entre processos.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_publicar = sub.add_parser("publicar", help="Publica os segmentos de todos os bundles da pasta")
+    p_publicar.add_argument("--models", default="models")
+    p_limpar = sub.add_parser("limpar", help="Apaga segmentos que nenhum índice usa")
+    p_limpar.add_argument("--models", nargs="+", default=["models"])
+    for p in (p_publicar, p_limpar):
+        p.add_argument("--pasta", default=str(PASTA))
+    args = parser.parse_args(argv)
+
+    if args.comando == "publicar":
+        for chave, caminho in publicar(args.models, args.pasta):
+            detalhe = f"{caminho.name} ({caminho.stat().st_size / 1024:,.0f} KB)" if caminho else "sem árvores (bundle mapeado)"
+            print(f"{chave:<24} {detalhe}")
+    else:
+        removidos = limpar(args.models, args.pasta)
+        print(f"{len(removidos)} segmento(s) removido(s) de {args.pasta}")
+
+
+if __name__ == "__main__":
+    main()
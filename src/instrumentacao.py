@@ -0,0 +1,347 @@
+"""
+Instrumentação dos caminhos quentes: onde o tempo de um rerun vai, por segmento e algoritmo.
+
+Etapas medidas:
+- carga: carregar_ativo (registro + cache de processo)
+- features: montagem do tensor/vetor de entrada (no lugar dos DataFrames)
+- transform: scaler.transform (modelos não compilados)
+- predict: model.predict
+- render: montagem da figura (matplotlib/plotly)
+- exibicao: st.pyplot / st.plotly_chart (serialização e envio ao navegador)
+
+Ligada por SIMULADOR_PERFIL=1 (ou ligar()). Desligada, medir() e rotulos() devolvem um contexto vazio
+compartilhado: o custo no caminho quente é uma chamada de função.
+
+Cada medida cai num histograma de buckets fixos (estilo Prometheus) por (etapa, segmento, algoritmo).
+Segmento e algoritmo vêm de um ContextVar: cada tarefa do pool abre rotulos(chave) no início, então as
+medidas de dentro do src.simulacao saem rotuladas sem mudar as assinaturas.
+
+Uso:
+    SIMULADOR_PERFIL=1 streamlit run app.py                 # painel "🩺 Diagnóstico" na barra lateral
+    python -m src.instrumentacao replay app.py
+    python -m src.instrumentacao replay app_2.py --pasta /tmp/modelos --roteiro roteiro.json --saida perfil.json
+    python -m src.instrumentacao replay app.py --prometheus perfil.prom
+"""
+import argparse
+import bisect
+import contextlib
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+# "Arena" rotula a passada conjunta dos três algoritmos no app_2.py
+ALGORITMOS = ("Ridge", "RandomForest", "XGBoost", "Arena")
+ETAPAS = ("carga", "features", "transform", "predict", "render", "exibicao")
+# Limites superiores dos buckets, em segundos (10 µs a 10 s)
+LIMITES = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICA = "simulador_etapa_segundos"
+
+_ATIVO = os.environ.get("SIMULADOR_PERFIL", "").lower() in ("1", "true", "sim")
+_VAZIO = contextlib.nullcontext()
+_ROTULOS = contextvars.ContextVar("rotulos_perfil", default=("", ""))
+_LOCK = threading.Lock()
+_DADOS = {}
+
+
+class Histograma:
+    """
+    Contagens por bucket, soma, mínimo e máximo. Os quantis são estimados dentro do bucket (como o Prometheus).
+    """
+
+    def __init__(self):
+        self.contagens = [0] * (len(LIMITES) + 1)
+        self.n = 0
+        self.soma = 0.0
+        self.minimo = math.inf
+        self.maximo = 0.0
+
+    def observar(self, segundos):
+        self.contagens[bisect.bisect_left(LIMITES, segundos)] += 1
+        self.n += 1
+        self.soma += segundos
+        self.minimo = min(self.minimo, segundos)
+        self.maximo = max(self.maximo, segundos)
+
+    def quantil(self, q):
+        if self.n == 0:
+            return 0.0
+        alvo, acumulado = q * self.n, 0
+        for i, contagem in enumerate(self.contagens):
+            if contagem and acumulado + contagem >= alvo:
+                inferior = LIMITES[i - 1] if i > 0 else 0.0
+                superior = LIMITES[i] if i < len(LIMITES) else self.maximo
+                estimado = inferior + (superior - inferior) * (alvo - acumulado) / contagem
+                return min(max(estimado, self.minimo), self.maximo)
+            acumulado += contagem
+        return self.maximo
+
+
+# --- 1. Medição ---
+def ativo():
+    return _ATIVO
+
+
+def ligar(estado=True):
+    global _ATIVO
+    _ATIVO = estado
+
+
+def dividir(chave):
+    """
+    'PF_Ridge' -> ('PF', 'Ridge'); 'PF' -> ('PF', '') (modelo de nível do app.py / app_1.py).
+    """
+    for algoritmo in ALGORITMOS:
+        if chave.endswith(f"_{algoritmo}"):
+            return chave[:-len(algoritmo) - 1], algoritmo
+    return chave, ""
+
+
+@contextlib.contextmanager
+def _rotulos(valores):
+    token = _ROTULOS.set(valores)
+    try:
+        yield
+    finally:
+        _ROTULOS.reset(token)
+
+
+def rotulos(chave):
+    """
+    Rotula as medidas de dentro do bloco com o segmento/algoritmo da chave (ex: 'PF_Ridge').
+    """
+    if not _ATIVO:
+        return _VAZIO
+    return _rotulos(dividir(chave))
+
+
+def fixar_rotulos(chave):
+    """
+    Rótulos para o resto da execução corrente (scripts lineares como o app_1.py, sem pool).
+    """
+    if _ATIVO:
+        _ROTULOS.set(dividir(chave))
+
+
+def rotulado(chave, funcao, *args, **kwargs):
+    """
+    Roda funcao(*args, **kwargs) dentro de rotulos(chave). Para o pool: pool().submit(rotulado, chave, funcao, ...).
+    """
+    with rotulos(chave):
+        return funcao(*args, **kwargs)
+
+
+class _Medida:
+    __slots__ = ("etapa", "inicio")
+
+    def __init__(self, etapa):
+        self.etapa = etapa
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+
+    def __exit__(self, *exc):
+        observar(self.etapa, time.perf_counter() - self.inicio)
+
+
+def medir(etapa):
+    """
+    with medir("predict"): ...  — registra a duração do bloco na etapa, com os rótulos correntes.
+    """
+    return _Medida(etapa) if _ATIVO else _VAZIO
+
+
+def observar(etapa, segundos):
+    chave = (etapa,) + _ROTULOS.get()
+    with _LOCK:
+        histograma = _DADOS.get(chave)
+        if histograma is None:
+            histograma = _DADOS[chave] = Histograma()
+        histograma.observar(segundos)
+
+
+def limpar():
+    with _LOCK:
+        _DADOS.clear()
+
+
+# --- 2. Resumo e Exportação ---
+def _copia():
+    with _LOCK:
+        return sorted(_DADOS.items(), key=lambda item: (ETAPAS.index(item[0][0]) if item[0][0] in ETAPAS else len(ETAPAS), item[0]))
+
+
+def resumo(agrupar=("etapa", "segmento", "algoritmo")):
+    """
+    Uma linha por grupo: n, total, média, p50, p95 e máximo em ms. agrupar=("etapa",) junta os segmentos.
+    """
+    grupos = {}
+    for (etapa, segmento, algoritmo), h in _copia():
+        rotulo = dict(etapa=etapa, segmento=segmento, algoritmo=algoritmo)
+        chave = tuple(rotulo[campo] for campo in agrupar)
+        if chave not in grupos:
+            grupos[chave] = Histograma()
+        g = grupos[chave]
+        g.contagens = [a + b for a, b in zip(g.contagens, h.contagens)]
+        g.n += h.n
+        g.soma += h.soma
+        g.minimo = min(g.minimo, h.minimo)
+        g.maximo = max(g.maximo, h.maximo)
+
+    return [
+        dict(zip(agrupar, chave), n=h.n, total_ms=round(h.soma * 1000, 3), media_ms=round(h.soma / h.n * 1000, 4),
+             p50_ms=round(h.quantil(0.5) * 1000, 4), p95_ms=round(h.quantil(0.95) * 1000, 4), max_ms=round(h.maximo * 1000, 4))
+        for chave, h in grupos.items()
+    ]
+
+
+def exportar_json():
+    return {
+        "limites_s": list(LIMITES),
+        "series": [
+            {"etapa": etapa, "segmento": segmento, "algoritmo": algoritmo, "n": h.n, "soma_s": h.soma,
+             "min_s": h.minimo, "max_s": h.maximo, "contagens": list(h.contagens)}
+            for (etapa, segmento, algoritmo), h in _copia()
+        ],
+    }
+
+
+def exportar_prometheus():
+    """
+    Formato de texto do Prometheus (histogram): _bucket acumulado por 'le', _sum e _count.
+    """
+    linhas = [f"# HELP {METRICA} Tempo por etapa do rerun dos simuladores.", f"# TYPE {METRICA} histogram"]
+    for (etapa, segmento, algoritmo), h in _copia():
+        rotulo = f'etapa="{etapa}",segmento="{segmento}",algoritmo="{algoritmo}"'
+        acumulado = 0
+        for limite, contagem in zip(LIMITES + ("+Inf",), h.contagens):
+            acumulado += contagem
+            linhas.append(f'{METRICA}_bucket{{{rotulo},le="{limite}"}} {acumulado}')
+        linhas.append(f"{METRICA}_sum{{{rotulo}}} {h.soma!r}")
+        linhas.append(f"{METRICA}_count{{{rotulo}}} {h.n}")
+    return "\n".join(linhas) + "\n"
+
+
+def painel(st):
+    """
+    Painel de diagnóstico na barra lateral (só com a instrumentação ligada). Recebe o módulo streamlit:
+    nada no src depende do Streamlit.
+    """
+    if not _ATIVO:
+        return
+    with st.sidebar.expander("🩺 Diagnóstico"):
+        linhas = resumo()
+        if not linhas:
+            st.caption("Nenhuma medida ainda.")
+            return
+        st.dataframe(resumo(("etapa",)), hide_index=True)
+        st.dataframe(linhas, hide_index=True)
+        st.download_button("JSON", json.dumps(exportar_json(), indent=2), "perfil.json", "application/json")
+        st.download_button("Prometheus", exportar_prometheus(), "perfil.prom", "text/plain")
+        if st.button("Zerar medidas"):
+            limpar()
+
+
+# --- 3. Replay Headless ---
+# Interações padrão de cada app: cada valor é um rerun (widgets por key ou pelo rótulo)
+ROTEIROS = {
+    "app.py": [
+        {"widget": "slider", "key": "ts_PF", "valores": [-0.5, -0.25, 0.0, 0.25, 0.5]},
+        {"widget": "slider", "key": "ti_PF", "valores": [-0.2, 0.0, 0.2]},
+        {"widget": "slider", "key": "td_PF", "valores": [-0.5, 0.0, 0.5]},
+        {"widget": "toggle", "key": "mc_PF", "valores": [True]},
+        {"widget": "slider", "key": "ts_PF", "valores": [0.1, 0.2]},
+    ],
+    "app_1.py": [
+        {"widget": "slider", "label": "Selic (%)", "valores": [5.0, 10.0, 15.0]},
+        {"widget": "slider", "label": "IPCA Mensal (%)", "valores": [0.0, 0.5, 1.0]},
+        {"widget": "selectbox", "label": "Selecione a Carteira:", "valores": ["PJ", "Rural_PF", "Rural_PJ", "PF"]},
+    ],
+    "app_2.py": [
+        {"widget": "slider", "key": "trend_PF", "valores": [-0.5, -0.25, 0.0, 0.25, 0.5]},
+        {"widget": "toggle", "label": "⚔️ Modo Arena (todos os algoritmos)", "valores": [True]},
+        {"widget": "slider", "key": "trend_PF", "valores": [0.1, 0.2]},
+    ],
+}
+
+
+def _widget(at, acao):
+    lista = getattr(at, acao["widget"])
+    if "key" in acao:
+        return next((w for w in lista if w.key == acao["key"]), None)
+    return next((w for w in lista if w.label == acao["label"]), None)
+
+
+def replay(app, roteiro=None, pasta=".", timeout=120):
+    """
+    Roda o app sem navegador (streamlit.testing) e aplica o roteiro. Devolve (reruns, ms por rerun, pulados).
+    """
+    from streamlit.testing.v1 import AppTest
+
+    app = str(Path(app).resolve())
+    roteiro = roteiro or ROTEIROS[Path(app).name]
+    ligar(True)
+    os.chdir(pasta)
+
+    duracoes, pulados = [], []
+    inicio = time.perf_counter()
+    at = AppTest.from_file(app, default_timeout=timeout).run()
+    duracoes.append(time.perf_counter() - inicio)
+    for acao in roteiro:
+        for valor in acao["valores"]:
+            widget = _widget(at, acao)
+            if widget is None:
+                pulados.append(acao.get("key") or acao["label"])
+                break
+            inicio = time.perf_counter()
+            getattr(widget, "select" if acao["widget"] == "selectbox" else "set_value")(valor)
+            at.run()
+            duracoes.append(time.perf_counter() - inicio)
+            if at.exception:
+                raise RuntimeError(f"{Path(app).name}: {at.exception[0].value}")
+    return len(duracoes), [d * 1000 for d in duracoes], pulados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perfil por etapa dos simuladores (replay headless).")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_replay = sub.add_parser("replay", help="Reexecuta um roteiro de interações e mostra o tempo por etapa")
+    p_replay.add_argument("app", help="app.py, app_1.py ou app_2.py")
+    p_replay.add_argument("--roteiro", help="JSON com a lista de ações (padrão: ROTEIROS do app)")
+    p_replay.add_argument("--pasta", default=".", help="Pasta de trabalho do app (onde está models/)")
+    p_replay.add_argument("--saida", help="Grava as medidas em JSON")
+    p_replay.add_argument("--prometheus", help="Grava as medidas no formato de texto do Prometheus")
+    args = parser.parse_args(argv)
+
+    roteiro = json.loads(Path(args.roteiro).read_text(encoding="utf-8")) if args.roteiro else None
+    saida = Path(args.saida).resolve() if args.saida else None
+    prometheus = Path(args.prometheus).resolve() if args.prometheus else None
+    reruns, duracoes, pulados = replay(args.app, roteiro, args.pasta)
+
+    duracoes.sort()
+    print(f"{args.app}: {reruns} reruns | mediana {duracoes[len(duracoes) // 2]:.1f} ms | máximo {duracoes[-1]:.1f} ms (o 1º inclui imports)")
+    if pulados:
+        print(f"Widgets não encontrados (ações puladas): {', '.join(pulados)}")
+
+    print(f"\n{'etapa':<10} {'n':>6} {'total ms':>10} {'média ms':>10} {'p95 ms':>9}")
+    for linha in resumo(("etapa",)):
+        print(f"{linha['etapa']:<10} {linha['n']:>6} {linha['total_ms']:>10.2f} {linha['media_ms']:>10.3f} {linha['p95_ms']:>9.3f}")
+    print(f"\n{'etapa':<10} {'segmento':<9} {'algoritmo':<13} {'n':>6} {'total ms':>10} {'média ms':>10}")
+    for linha in resumo():
+        print(f"{linha['etapa']:<10} {linha['segmento'] or '—':<9} {linha['algoritmo'] or '—':<13} "
+              f"{linha['n']:>6} {linha['total_ms']:>10.2f} {linha['media_ms']:>10.3f}")
+
+    if saida:
+        saida.write_text(json.dumps(exportar_json(), indent=2), encoding="utf-8")
+    if prometheus:
+        prometheus.write_text(exportar_prometheus(), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    # Os apps importam src.instrumentacao; rodando como __main__ o estado (medidas, ligar) ficaria num
+    # módulo duplicado, então o CLI usa o mesmo objeto de módulo que os apps
+    from src import instrumentacao
+    instrumentacao.main()
@@ -0,0 +1,247 @@
+"""
+Estresse Monte Carlo: milhares de trajetórias correlacionadas de Selic, IPCA e Dólar
+empurradas pelos modelos de nível de cada segmento.
+
+Cada trajetória = cenário central (mesmas tendências lineares do app.py) + desvio estocástico.
+O desvio vem de um processo estimado na base histórica (df_modelagem_v3.csv) ou de volatilidades
+informadas pelo usuário:
+- "ar1": desvio_t = phi * desvio_{t-1} + choque (volta ao cenário central)
+- "passeio": desvio_t = desvio_{t-1} + choque (passeio aleatório, sem deriva)
+Os choques mensais são normais correlacionados (Cholesky da covariância dos resíduos).
+
+As trajetórias são geradas e previstas em blocos: a memória fica limitada ao tensor de um bloco,
+e todos os segmentos recebem as mesmas trajetórias macro.
+
+Uso:
+    python -m src.monte_carlo --caminhos 10000 --modelo ar1
+    python -m src.monte_carlo --vols 0.5 0.2 0.15 --selic-trend 0.1 --saida estresse.csv
+"""
+import argparse
+import csv
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from src.artefatos import SEGMENTOS
+from src.defasagens import CSV_MODELAGEM, versao_historico
+from src.grade_cenarios import carregar_segmentos, inputs_segmento
+from src.simulacao import caminhos_nivel, feature_tensor, predict_tensor
+
+# Colunas da base histórica e as features de modelo que recebem a trajetória simulada
+VARIAVEIS = ("selic", "ipca", "dolar_ptax")
+COLUNAS_CAMINHO = ("selic_lag_6", "ipca_lag_6", "dolar_ptax_lag_6")
+MODELOS = ("ar1", "passeio")
+PERCENTIS = (5, 50, 95)
+NIVEL_ES = 0.95
+BLOCO = 2000
+
+
+class ProcessoMacro:
+    """
+    Desvios mensais correlacionados de Selic, IPCA e Dólar (nas unidades dos modelos).
+    - phi: persistência de cada variável (1 = passeio aleatório)
+    - cov: covariância 3x3 dos choques mensais
+    """
+
+    def __init__(self, phi, cov, modelo):
+        self.phi = np.asarray(phi, dtype=float)
+        self.cov = np.asarray(cov, dtype=float)
+        self.modelo = modelo
+        # Pequeno reforço na diagonal: covariâncias estimadas podem sair semidefinidas
+        self._chol = np.linalg.cholesky(self.cov + 1e-12 * np.eye(len(self.phi)))
+
+    def __repr__(self):
+        vols = np.sqrt(np.diag(self.cov))
+        return f"ProcessoMacro({self.modelo!r}, phi={np.round(self.phi, 3).tolist()}, vol={np.round(vols, 4).tolist()})"
+
+    def simular(self, n_caminhos, months=18, rng=None):
+        """
+        Desvios (caminhos x meses x variáveis) em relação ao cenário central.
+        """
+        rng = np.random.default_rng(rng)
+        choques = rng.standard_normal((n_caminhos, months, len(self.phi))) @ self._chol.T
+        if np.all(self.phi == 1.0):
+            return np.cumsum(choques, axis=1)
+
+        # AR(1): só o eixo dos meses é sequencial (18 passos), vetorizado nos caminhos
+        desvios = np.empty_like(choques)
+        atual = np.zeros((n_caminhos, len(self.phi)))
+        for i in range(months):
+            atual = self.phi * atual + choques[:, i]
+            desvios[:, i] = atual
+        return desvios
+
+
+def ler_series_macro(caminho=CSV_MODELAGEM):
+    """
+    Série mensal de Selic, IPCA e Dólar da base de modelagem, completa (a estimação usa todos os meses;
+    o src.defasagens.ler_historico guarda só os últimos). Devolve um array (meses x variáveis).
+    """
+    with open(caminho, newline="", encoding="utf-8") as f:
+        linhas = [linha for linha in csv.DictReader(f) if all(linha.get(v) for v in VARIAVEIS)]
+    return np.array([[float(linha[v]) for v in VARIAVEIS] for linha in linhas])
+
+
+def estimar(historico, modelo="ar1"):
+    """
+    Ajusta o processo na série histórica.
+    - "ar1": MQO de x_t contra (1, x_{t-1}) para cada variável; phi limitado a [0, 0.999]
+    - "passeio": covariância das variações mensais
+    """
+    if modelo == "passeio":
+        variacoes = np.diff(historico, axis=0)
+        return ProcessoMacro(np.ones(historico.shape[1]), np.cov(variacoes, rowvar=False), modelo)
+    if modelo != "ar1":
+        raise ValueError(f"Modelo '{modelo}' desconhecido. Use um de {MODELOS}.")
+
+    anterior, atual = historico[:-1], historico[1:]
+    phi = np.empty(historico.shape[1])
+    residuos = np.empty_like(atual)
+    for j in range(historico.shape[1]):
+        A = np.column_stack([np.ones(len(anterior)), anterior[:, j]])
+        (c, phi_j), *_ = np.linalg.lstsq(A, atual[:, j], rcond=None)
+        phi[j] = np.clip(phi_j, 0.0, 0.999)
+        residuos[:, j] = atual[:, j] - c - phi_j * anterior[:, j]
+    return ProcessoMacro(phi, np.cov(residuos, rowvar=False), modelo)
+
+
+def processo_historico(modelo="ar1", caminho=CSV_MODELAGEM):
+    """
+    estimar() sobre a base histórica, uma vez por versão do arquivo (mtime): o src.atualizacao
+    regrava a base com o processo no ar, e a próxima chamada reestima.
+    """
+    return _processo_historico(modelo, caminho, versao_historico(caminho))
+
+
+@lru_cache(maxsize=8)
+def _processo_historico(modelo, caminho, versao):
+    return estimar(ler_series_macro(caminho), modelo)
+
+
+def processo_manual(vols, correlacao=None, is_decimal=False):
+    """
+    Passeio aleatório com volatilidades mensais informadas pelo usuário, nas unidades da tela:
+    Selic e IPCA em pp/mês, Dólar em R$/mês. Sem correlação, os choques são independentes.
+    """
+    vols = np.asarray(vols, dtype=float).copy()
+    if is_decimal:
+        # Mesma tradução do caminhos_nivel: Selic e IPCA seguem em decimal para o modelo
+        vols[:2] /= 100
+    correlacao = np.eye(len(vols)) if correlacao is None else np.asarray(correlacao, dtype=float)
+    return ProcessoMacro(np.ones(len(vols)), correlacao * np.outer(vols, vols), "manual")
+
+
+def caminhos_estocasticos(feature_names, inputs_iniciais, desvios, selic_trend=0.0, ipca_trend=0.0, dolar_trend=0.0, months=18, is_decimal=False):
+    """
+    Cenário central (caminhos_nivel) + desvios simulados, com os mesmos pisos da versão determinística.
+    """
+    caminhos, _ = caminhos_nivel(feature_names, inputs_iniciais, selic_trend, ipca_trend, dolar_trend, months, is_decimal)
+    factor = 100 if is_decimal else 1
+    pisos = {'selic_lag_6': 0.0, 'ipca_lag_6': -1.0 / factor, 'dolar_ptax_lag_6': 2.0}
+
+    for j, col in enumerate(COLUNAS_CAMINHO):
+        if col in caminhos:
+            caminhos[col] = np.maximum(pisos[col], caminhos[col] + desvios[:, :, j])
+    return caminhos
+
+
+def projetar_caminhos(model, scaler, feature_names, inputs_iniciais, desvios, months=18, is_decimal=False, bloco=BLOCO, **trends):
+    """
+    Inadimplência prevista (caminhos x meses) para cada trajetória, em blocos de 'bloco' caminhos.
+    """
+    n = len(desvios)
+    preds = np.empty((n, months))
+    for inicio in range(0, n, bloco):
+        parte = desvios[inicio:inicio + bloco]
+        caminhos = caminhos_estocasticos(feature_names, inputs_iniciais, parte, months=months, is_decimal=is_decimal, **trends)
+        X = feature_tensor(feature_names, inputs_iniciais, caminhos, len(parte), months)
+        preds[inicio:inicio + bloco] = np.maximum(0.0, predict_tensor(model, scaler, X))
+    return preds
+
+
+def resumir(preds, percentis=PERCENTIS, nivel_es=NIVEL_ES):
+    """
+    Estatísticas mês a mês: percentis e expected shortfall (média dos piores 1 - nivel_es caminhos,
+    ou seja, da cauda de inadimplência alta).
+    """
+    resumo = {f"p{p}": v for p, v in zip(percentis, np.percentile(preds, percentis, axis=0))}
+    n = len(preds)
+    k = max(1, int(np.ceil(n * (1 - nivel_es))))
+    cauda = np.partition(preds, n - k, axis=0)[n - k:]
+    resumo[f"es{int(round(nivel_es * 100))}"] = cauda.mean(axis=0)
+    return resumo
+
+
+def estresse(ativos, processo, n_caminhos=10000, months=18, seed=0, bloco=BLOCO, iniciais=None, **trends):
+    """
+    Monte Carlo para vários segmentos com as mesmas trajetórias macro.
+    - ativos: {segmento: (model, scaler, cols, last_vals)}, como em grade_cenarios.carregar_segmentos
+    Os desvios também são sorteados em blocos. Devolve {segmento: array (caminhos x meses)}.
+    """
+    rng = np.random.default_rng(seed)
+    entradas = {seg: inputs_segmento(last_vals, **(iniciais or {})) for seg, (_, _, _, last_vals) in ativos.items()}
+    preds = {seg: np.empty((n_caminhos, months)) for seg in ativos}
+
+    for inicio in range(0, n_caminhos, bloco):
+        desvios = processo.simular(min(bloco, n_caminhos - inicio), months, rng)
+        for segmento, (model, scaler, cols, _) in ativos.items():
+            inputs_iniciais, is_decimal = entradas[segmento]
+            preds[segmento][inicio:inicio + len(desvios)] = projetar_caminhos(
+                model, scaler, cols, inputs_iniciais, desvios, months, is_decimal, bloco, **trends
+            )
+    return preds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estresse Monte Carlo de Selic, IPCA e Dólar para os segmentos.")
+    parser.add_argument("--caminhos", type=int, default=10000)
+    parser.add_argument("--modelo", default="ar1", choices=MODELOS, help="Processo estimado na base histórica")
+    parser.add_argument("--vols", nargs=3, type=float, metavar=("SELIC", "IPCA", "DOLAR"), help="Volatilidades mensais (substitui a estimação)")
+    parser.add_argument("--base", default=CSV_MODELAGEM, help="CSV histórico para a estimação")
+    parser.add_argument("--selic-trend", type=float, default=0.0)
+    parser.add_argument("--ipca-trend", type=float, default=0.0)
+    parser.add_argument("--dolar-trend", type=float, default=0.0)
+    parser.add_argument("--segmentos", nargs="+", default=SEGMENTOS, choices=SEGMENTOS)
+    parser.add_argument("--months", type=int, default=18)
+    parser.add_argument("--bloco", type=int, default=BLOCO, help="Caminhos por bloco (limita a memória)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--models", default="models", help="Pasta dos artefatos")
+    parser.add_argument("--saida", help="CSV com percentis e expected shortfall por segmento e mês")
+    args = parser.parse_args(argv)
+
+    ativos = carregar_segmentos(args.segmentos, args.models)
+    if args.vols:
+        # Unidades da tela; a escala (decimal ou %) segue a do primeiro segmento
+        is_decimal = inputs_segmento(next(iter(ativos.values()))[3])[1]
+        processo = processo_manual(args.vols, is_decimal=is_decimal)
+    else:
+        processo = processo_historico(args.modelo, args.base)
+    print(processo)
+
+    inicio = time.perf_counter()
+    preds = estresse(
+        ativos, processo, args.caminhos, args.months, args.seed, args.bloco,
+        selic_trend=args.selic_trend, ipca_trend=args.ipca_trend, dolar_trend=args.dolar_trend
+    )
+    duracao = time.perf_counter() - inicio
+    print(f"{args.caminhos} caminhos x {args.months} meses x {len(preds)} segmentos em {duracao:.3f}s")
+
+    resumos = {segmento: resumir(p) for segmento, p in preds.items()}
+    for segmento, resumo in resumos.items():
+        valores = " | ".join(f"{nome.upper()} {serie[-1]:.2f}%" for nome, serie in resumo.items())
+        print(f"  {segmento:<9} mês {args.months}: {valores}")
+
+    if args.saida:
+        with open(args.saida, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            nomes = list(next(iter(resumos.values())).keys())
+            writer.writerow(["segmento", "mes"] + nomes)
+            for segmento, resumo in resumos.items():
+                for i in range(args.months):
+                    writer.writerow([segmento, i + 1] + [f"{resumo[nome][i]:.6f}" for nome in nomes])
+        print(f"Resumo salvo em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Pool de threads compartilhado pelos apps para processar os segmentos em paralelo.
+
+Cada segmento (carga, simulação, montagem do gráfico) é independente dos outros; o NumPy e o
+sklearn liberam o GIL nas contas pesadas, então threads bastam e evitam serializar os modelos.
+O pool vive no módulo e é reaproveitado em todas as reexecuções do Streamlit.
+- SIMULADOR_WORKERS: número de threads (padrão 4, uma por segmento)
+
+As funções enviadas ao pool não devem chamar st.*: as mensagens para a tela ficam na thread do
+script, que lê os resultados (e as exceções) pelo Future.result().
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_POOL = None
+_LOCK = threading.Lock()
+
+
+def pool():
+    global _POOL
+    with _LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(
+                max_workers=int(os.environ.get("SIMULADOR_WORKERS", 4)),
+                thread_name_prefix="segmento",
+            )
+        return _POOL
+
+
+def submeter(funcao, itens, *args, **kwargs):
+    """
+    Agenda funcao(item, *args, **kwargs) para cada item. Devolve {item: Future}, na ordem dos itens.
+    """
+    executor = pool()
+    return {item: executor.submit(funcao, item, *args, **kwargs) for item in itens}
@@ -0,0 +1,443 @@
+"""
+Registro de Modelos: um único arquivo versionado por segmento/algoritmo.
+
+Cada bundle junta modelo, parâmetros do scaler, ordem das colunas, último vetor observado e
+metadados (app_1). É lido com uma única abertura do arquivo; os arrays numéricos são views
+mapeadas em memória (mmap) e o checksum SHA-256 do conteúdo é conferido na carga.
+
+Layout do arquivo:
+    MAGIC (8 bytes) | tamanho do cabeçalho (uint32) | cabeçalho JSON | dados alinhados em 64 bytes
+
+Modelos lineares + StandardScaler são gravados já compilados (pesos, bias): carregar não exige sklearn.
+Ensembles de árvores são gravados nativos (pickle) e compilados em arrays planos na abertura (src.compilacao).
+Nada aqui depende de pandas: colunas viram list e últimos valores viram dict {feature: float}.
+
+Uso:
+    python -m src.registro migrar --models models    # converte os .pkl/.csv da pasta
+    python -m src.registro listar --models models
+    python -m src.registro verificar --models models
+"""
+import argparse
+import csv
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from src.compilacao import ModeloLinear, ScalerPadrao, compilar
+
+MAGIC = b"SRCBNDL\x00"
+FORMATO = 1
+ALINHAMENTO = 64
+PASTA_REGISTRO = "registry"
+INDICE = "index.json"
+
+
+class ErroArtefato(ValueError):
+    """
+    Artefatos inconsistentes (ex: scaler e modelo com números de features diferentes) ou bundle corrompido.
+    """
+
+
+class Ativo:
+    """
+    Tudo o que um app precisa de um segmento/algoritmo.
+    """
+
+    def __init__(self, chave, model, scaler, cols, last_vals, meta=None, versao=None, checksum=None, origem=None, data_referencia=None):
+        self.chave = chave
+        self.model = model
+        self.scaler = scaler
+        self.cols = cols
+        self.last_vals = last_vals
+        self.data_referencia = data_referencia
+        self.meta = meta
+        self.versao = versao
+        self.checksum = checksum
+        # Hash dos arquivos de origem: identifica o conteúdo mesmo quando o pickle não é byte a byte estável
+        self.origem = origem
+
+    def __repr__(self):
+        return f"Ativo({self.chave!r}, versao={self.versao}, model={self.model!r})"
+
+
+# --- 1. Artefatos Antigos (.pkl / .csv) ---
+def arquivo_segmento(base_path, prefixo, chave, ext):
+    """
+    Procura {prefixo}_{chave}.{ext}; se não existir, tenta sem o sufixo do algoritmo
+    (ex: scaler_PF_Ridge.pkl -> scaler_PF.pkl), como o app_2 faz.
+    """
+    base_path = Path(base_path)
+    for nome in (chave, chave.rsplit("_", 1)[0]):
+        caminho = base_path / f"{prefixo}_{nome}.{ext}"
+        if caminho.exists():
+            return caminho
+    return None
+
+
+def ler_colunas(caminho):
+    # columns_*.csv: só o cabeçalho, com as features na ordem do modelo
+    with open(caminho, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f))
+
+
+def ler_last_values(caminho):
+    """
+    last_values_*.csv (feature,valor por linha; o cabeçalho traz a data de referência).
+    Devolve (dict {feature: float}, data de referência).
+    """
+    with open(caminho, newline="", encoding="utf-8") as f:
+        linhas = list(csv.reader(f))
+    cabecalho = linhas[0]
+    data_referencia = cabecalho[1] if len(cabecalho) > 1 else None
+    return {linha[0]: float(linha[1]) for linha in linhas[1:] if linha}, data_referencia
+
+
+def fontes(chave, base_path="models"):
+    """
+    Arquivos soltos que carregar_legado lê para a chave, os que existem: {nome: caminho}.
+    """
+    base_path = Path(base_path)
+    caminhos = {"model": base_path / f"model_{chave}.pkl"}
+    for prefixo, ext in (("scaler", "pkl"), ("columns", "csv"), ("last_values", "csv"), ("meta", "pkl")):
+        caminhos[prefixo] = arquivo_segmento(base_path, prefixo, chave, ext)
+    return {nome: caminho for nome, caminho in caminhos.items() if caminho is not None and caminho.exists()}
+
+
+def carimbo_fontes(chave, base_path="models"):
+    """
+    {nome do arquivo: mtime_ns} dos arquivos soltos da chave: guardado no índice a cada registro.
+    """
+    carimbo = {}
+    for caminho in fontes(chave, base_path).values():
+        try:
+            carimbo[caminho.name] = os.stat(caminho).st_mtime_ns
+        except FileNotFoundError:
+            pass
+    return carimbo
+
+
+def validar(chave, model, scaler, cols):
+    """
+    Garante que modelo, scaler e lista de colunas concordam no número de features.
+    """
+    n_model = getattr(model, "n_features_in_", None)
+    n_scaler = getattr(scaler, "n_features_in_", None)
+    if n_model and n_scaler and n_model != n_scaler:
+        raise ErroArtefato(f"{chave}: o Scaler tem {n_scaler} colunas, mas o Modelo quer {n_model}.")
+    if n_scaler and len(cols) != n_scaler:
+        raise ErroArtefato(f"{chave}: a lista de colunas tem {len(cols)} itens, mas o Scaler tem {n_scaler}.")
+
+
+def carregar_legado(chave, base_path="models"):
+    """
+    Monta o Ativo direto dos arquivos soltos (model_*.pkl, scaler_*.pkl, columns_*.csv, last_values_*.csv, meta_*.pkl).
+    """
+    import joblib
+
+    base_path = Path(base_path)
+    path_model = base_path / f"model_{chave}.pkl"
+    path_scaler = arquivo_segmento(base_path, "scaler", chave, "pkl")
+    path_cols = arquivo_segmento(base_path, "columns", chave, "csv")
+    if not path_model.exists() or path_scaler is None or path_cols is None:
+        raise FileNotFoundError(f"Artefatos de '{chave}' não encontrados em '{base_path}'.")
+
+    model = joblib.load(path_model)
+    scaler = joblib.load(path_scaler)
+    cols = ler_colunas(path_cols)
+    validar(chave, model, scaler, cols)
+
+    path_last = arquivo_segmento(base_path, "last_values", chave, "csv")
+    last_vals, data_referencia = ler_last_values(path_last) if path_last else (None, None)
+    path_meta = arquivo_segmento(base_path, "meta", chave, "pkl")
+    meta = joblib.load(path_meta) if path_meta else None
+
+    origem = hashlib.sha256()
+    for caminho in (path_model, path_scaler, path_cols, path_last, path_meta):
+        if caminho is not None:
+            origem.update(caminho.read_bytes())
+
+    return Ativo(chave, compilar(model, scaler), scaler, cols, last_vals, meta,
+                 origem=origem.hexdigest(), data_referencia=data_referencia)
+
+
+# --- 2. Escrita do Bundle ---
+def empacotar(ativo):
+    """
+    Serializa o Ativo no formato de bundle. Devolve (bytes, checksum).
+    """
+    arrays, blobs = {}, {}
+
+    if isinstance(ativo.model, ModeloLinear):
+        estimador = {"tipo": "linear", "n_features_in_": ativo.model.n_features_in_}
+        arrays["pesos"] = ativo.model.pesos
+        arrays["bias"] = np.array([ativo.model.bias])
+    else:
+        # Árvores compiladas: grava o modelo nativo, a compilação é refeita na abertura
+        nativo = getattr(ativo.model, "nativo", None) or ativo.model
+        # Ativo anexado pelo src.hospedagem: o nativo só é lido do bundle quando pedido
+        nativo = nativo.resolver() if hasattr(nativo, "resolver") else nativo
+        estimador = {"tipo": "pickle", "classe": type(nativo).__name__}
+        blobs["model"] = pickle.dumps(nativo, protocol=pickle.HIGHEST_PROTOCOL)
+
+    if type(ativo.scaler).__name__ in ("StandardScaler", "ScalerPadrao"):
+        padrao = ScalerPadrao.de_sklearn(ativo.scaler) if type(ativo.scaler).__name__ == "StandardScaler" else ativo.scaler
+        scaler_info = {"tipo": "padrao"}
+        arrays["scaler_mean"] = padrao.mean_
+        arrays["scaler_scale"] = padrao.scale_
+    else:
+        scaler_info = {"tipo": "pickle", "classe": type(ativo.scaler).__name__}
+        blobs["scaler"] = pickle.dumps(ativo.scaler, protocol=pickle.HIGHEST_PROTOCOL)
+
+    last_info = None
+    if ativo.last_vals is not None:
+        last_info = {"index": list(ativo.last_vals), "name": ativo.data_referencia}
+        arrays["last_values"] = np.array(list(ativo.last_vals.values()), dtype=float)
+    if ativo.meta is not None:
+        blobs["meta"] = pickle.dumps(ativo.meta, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # Seção de dados: cada array/blob começa em um offset alinhado
+    dados = bytearray()
+    layout_arrays, layout_blobs = {}, {}
+
+    def _alinhar():
+        dados.extend(b"\x00" * (-len(dados) % ALINHAMENTO))
+
+    for nome, arr in arrays.items():
+        arr = np.ascontiguousarray(arr, dtype="<f8")
+        _alinhar()
+        layout_arrays[nome] = {"offset": len(dados), "shape": list(arr.shape)}
+        dados.extend(arr.tobytes())
+    for nome, blob in blobs.items():
+        _alinhar()
+        layout_blobs[nome] = {"offset": len(dados), "length": len(blob)}
+        dados.extend(blob)
+
+    checksum = _checksum(ativo.cols, last_info, estimador, scaler_info, dados)
+    cabecalho = {
+        "formato": FORMATO,
+        "chave": ativo.chave,
+        "versao": ativo.versao,
+        "checksum": checksum,
+        "criado_em": datetime.now().isoformat(timespec="seconds"),
+        "colunas": list(ativo.cols),
+        "last_values": last_info,
+        "estimador": estimador,
+        "scaler": scaler_info,
+        "arrays": layout_arrays,
+        "blobs": layout_blobs,
+    }
+    texto = json.dumps(cabecalho, ensure_ascii=False).encode("utf-8")
+    inicio = len(MAGIC) + 4 + len(texto)
+    texto += b" " * (-inicio % ALINHAMENTO)
+
+    return MAGIC + struct.pack("<I", len(texto)) + texto + bytes(dados), checksum
+
+
+def _checksum(cols, last_info, estimador, scaler_info, dados):
+    # Cobre a seção de dados e os campos do cabeçalho que definem o modelo (não a versão nem a data)
+    definicao = json.dumps([list(cols), last_info, estimador, scaler_info], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(definicao.encode("utf-8") + bytes(dados)).hexdigest()
+
+
+def escrever_atomico(caminho, conteudo):
+    """
+    Grava num temporário da mesma pasta e troca com os.replace: quem lê nunca vê o arquivo pela metade.
+    """
+    caminho = Path(caminho)
+    fd, tmp = tempfile.mkstemp(dir=caminho.parent, prefix=f".{caminho.name}.")
+    with os.fdopen(fd, "wb") as f:
+        f.write(conteudo)
+    os.replace(tmp, caminho)
+
+
+def ler_indice(base_path="models"):
+    caminho = Path(base_path) / PASTA_REGISTRO / INDICE
+    if not caminho.exists():
+        return {}
+    return json.loads(caminho.read_text(encoding="utf-8"))
+
+
+def registrar(ativo, base_path="models", fontes=None):
+    """
+    Grava o bundle e atualiza o índice. A versão só sobe quando o conteúdo muda.
+    Bundles antigos ficam na pasta (rollback trocando o índice).
+    - fontes: carimbo_fontes() dos arquivos soltos de onde o Ativo saiu, tirado antes da leitura;
+      fica no índice para carregar() perceber um retreino feito depois da migração
+    """
+    pasta = Path(base_path) / PASTA_REGISTRO
+    pasta.mkdir(parents=True, exist_ok=True)
+    indice = ler_indice(base_path)
+    atual = indice.get(ativo.chave)
+
+    mesmo = atual and ativo.origem is not None and atual.get("origem") == ativo.origem
+    if not mesmo and atual:
+        mesmo = atual["checksum"] == empacotar(ativo)[1]
+    if mesmo:
+        # Mesmo conteúdo (arquivos só regravados): o bundle segue, com o carimbo novo
+        if fontes is not None and atual.get("fontes") != fontes:
+            atual["fontes"] = fontes
+            escrever_atomico(pasta / INDICE, json.dumps(indice, indent=2, ensure_ascii=False).encode("utf-8"))
+        return atual
+
+    ativo.versao = (atual["versao"] + 1) if atual else 1
+    conteudo, checksum = empacotar(ativo)
+    arquivo = f"{ativo.chave}.v{ativo.versao}.bundle"
+    escrever_atomico(pasta / arquivo, conteudo)
+
+    indice[ativo.chave] = {
+        "arquivo": arquivo, "versao": ativo.versao, "checksum": checksum,
+        "origem": ativo.origem, "bytes": len(conteudo), "fontes": fontes
+    }
+    escrever_atomico(pasta / INDICE, json.dumps(indice, indent=2, ensure_ascii=False).encode("utf-8"))
+    return indice[ativo.chave]
+
+
+# --- 3. Leitura do Bundle ---
+def registrar_soltos(chave, base_path="models"):
+    """
+    registrar() dos arquivos soltos da chave, com o carimbo deles no índice.
+    """
+    carimbo = carimbo_fontes(chave, base_path)
+    return registrar(carregar_legado(chave, base_path), base_path, carimbo)
+
+
+def desatualizado(chave, entrada, base_path="models"):
+    """
+    True se os arquivos soltos mudaram depois do registro (o notebook retreinou e gravou só os .pkl/.csv):
+    o carimbo do índice não confere ou, em índices sem carimbo, algum arquivo é mais novo que o bundle.
+    Pastas só com o registro (sem arquivos soltos) nunca ficam desatualizadas.
+    """
+    carimbo = carimbo_fontes(chave, base_path)
+    if not carimbo:
+        return False
+    if entrada.get("fontes") is not None:
+        return carimbo != entrada["fontes"]
+    try:
+        return max(carimbo.values()) > os.stat(Path(base_path) / PASTA_REGISTRO / entrada["arquivo"]).st_mtime_ns
+    except FileNotFoundError:
+        return True
+
+
+def abrir_bundle(caminho, verificar=True, montar_modelo=None):
+    """
+    Abre o bundle com um único mmap e reconstrói o Ativo.
+    - montar_modelo(cabecalho, blob, scaler): monta os modelos gravados em pickle no lugar do
+      compilar() (o src.hospedagem anexa os nós compartilhados); blob(nome) lê o pickle do bundle
+    """
+    with open(caminho, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if buf[:len(MAGIC)] != MAGIC:
+        raise ErroArtefato(f"{caminho} não é um bundle do registro.")
+    (tamanho,) = struct.unpack_from("<I", buf, len(MAGIC))
+    inicio = len(MAGIC) + 4
+    cabecalho = json.loads(bytes(buf[inicio:inicio + tamanho]))
+    if cabecalho["formato"] > FORMATO:
+        raise ErroArtefato(f"{caminho}: formato {cabecalho['formato']} não suportado (máximo {FORMATO}).")
+
+    base = inicio + tamanho
+    checksum = _checksum(cabecalho["colunas"], cabecalho["last_values"], cabecalho["estimador"], cabecalho["scaler"], buf[base:])
+    if verificar and checksum != cabecalho["checksum"]:
+        raise ErroArtefato(f"{caminho}: checksum não confere (arquivo corrompido?).")
+
+    def array(nome):
+        info = cabecalho["arrays"][nome]
+        count = int(np.prod(info["shape"]))
+        return np.frombuffer(buf, dtype="<f8", count=count, offset=base + info["offset"]).reshape(info["shape"])
+
+    def blob(nome):
+        info = cabecalho["blobs"].get(nome)
+        if info is None:
+            return None
+        return pickle.loads(buf[base + info["offset"]:base + info["offset"] + info["length"]])
+
+    if cabecalho["scaler"]["tipo"] == "padrao":
+        scaler = ScalerPadrao(array("scaler_mean"), array("scaler_scale"))
+    else:
+        scaler = blob("scaler")
+
+    if cabecalho["estimador"]["tipo"] == "linear":
+        model = ModeloLinear(array("pesos"), array("bias")[0], cabecalho["estimador"]["n_features_in_"])
+    elif montar_modelo is not None:
+        model = montar_modelo(cabecalho, blob, scaler)
+    else:
+        model = compilar(blob("model"), scaler)
+
+    last_vals, data_referencia = None, None
+    if cabecalho["last_values"] is not None:
+        info = cabecalho["last_values"]
+        last_vals = dict(zip(info["index"], array("last_values").tolist()))
+        data_referencia = info["name"]
+
+    return Ativo(cabecalho["chave"], model, scaler, cabecalho["colunas"], last_vals,
+                 blob("meta"), cabecalho["versao"], cabecalho["checksum"], data_referencia=data_referencia)
+
+
+def carregar(chave, base_path="models", verificar=True):
+    """
+    Resolve um segmento/algoritmo (ex: 'PF', 'PF_Ridge'): usa o bundle registrado ou, se a pasta
+    ainda não foi migrada ou os arquivos soltos mudaram depois do registro, os arquivos soltos.
+    """
+    entrada = ler_indice(base_path).get(chave)
+    if entrada is None or desatualizado(chave, entrada, base_path):
+        return carregar_legado(chave, base_path)
+    return abrir_bundle(Path(base_path) / PASTA_REGISTRO / entrada["arquivo"], verificar)
+
+
+# --- 4. Linha de Comando ---
+def migrar(base_path="models"):
+    """
+    Converte todos os model_*.pkl da pasta em bundles. Devolve [(chave, entrada ou erro)].
+    """
+    resultado = []
+    for path_model in sorted(Path(base_path).glob("model_*.pkl")):
+        chave = path_model.stem[len("model_"):]
+        try:
+            resultado.append((chave, registrar_soltos(chave, base_path)))
+        except (FileNotFoundError, ErroArtefato) as e:
+            resultado.append((chave, e))
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Registro de modelos em bundles versionados.")
+    parser.add_argument("comando", choices=["migrar", "listar", "verificar"])
+    parser.add_argument("--models", default="models", help="Pasta dos artefatos")
+    args = parser.parse_args(argv)
+
+    falhas = 0
+    if args.comando == "migrar":
+        for chave, entrada in migrar(args.models):
+            if isinstance(entrada, Exception):
+                falhas += 1
+                print(f"ERRO   {chave:<24} {entrada}")
+            else:
+                print(f"OK     {chave:<24} v{entrada['versao']}  {entrada['bytes']} bytes  {entrada['checksum'][:12]}")
+    else:
+        for chave, entrada in ler_indice(args.models).items():
+            aviso = "  desatualizado: arquivos soltos mais novos (rode migrar)" if desatualizado(chave, entrada, args.models) else ""
+            if args.comando == "listar":
+                print(f"{chave:<24} v{entrada['versao']}  {entrada['arquivo']}  {entrada['checksum'][:12]}{aviso}")
+                continue
+            try:
+                abrir_bundle(Path(args.models) / PASTA_REGISTRO / entrada["arquivo"], verificar=True)
+                print(f"OK     {chave}{aviso}")
+            except ErroArtefato as e:
+                falhas += 1
+                print(f"ERRO   {chave:<24} {e}")
+
+    if falhas:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
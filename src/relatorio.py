@@ -0,0 +1,466 @@
+"""
+Relatórios em lote: um conjunto de cenários projetado em todos os segmentos e algoritmos, gravado
+numa tabela única (CSV ou Parquet) e num PDF com uma página por cenário.
+
+Para cada cenário e segmento:
+- Nivel: modelo do app.py, com o "Cenário Estável" como base; variacao = projeção - mês 1
+  (no mês 18 é a "Variação Projetada" da tela);
+- Ridge/RandomForest/XGBoost: modelos de variação do app_2.py, a partir do último nível observado;
+  variacao = projeção - ponto de partida (no mês 18 é a métrica "Projeção para o Mês 18").
+  Esses modelos só têm a Selic como choque (como no app_2.py): são projetados uma vez por tendência
+  distinta da Selic, e nas linhas deles ipca_trend, dolar_trend e horizon ficam vazios.
+A tabela é longa: cenario, tendências, segmento, modelo, mes, projecao, base, desvio_base, variacao.
+
+Os cenários andam em blocos: cada bloco é projetado de forma vetorizada, anexado à tabela (grupo
+de linhas no Parquet, acréscimo no CSV) e mandado a um pool de processos que desenha as páginas.
+O PDF (capa, uma página por cenário e o resumo no fim) recebe as páginas na ordem, com no máximo
+2 x workers blocos em voo: a memória fica limitada pelo tamanho do bloco, não pelo número de cenários.
+Com --workers 1 as páginas são vetoriais e desenhadas no próprio processo; no pool elas voltam como
+JPEG (--dpi), porque um PDF só pode ser escrito por um processo.
+
+Uso:
+    python -m src.relatorio --selic -0.5 0.5 21 --ipca -0.2 0.2 5 --dolar -0.5 0.5 5 --saida comite.parquet --pdf comite.pdf
+    python -m src.relatorio --lista cenarios.csv --saida comite.csv --pdf comite.pdf --workers 4
+"""
+import argparse
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.artefatos import SEGMENTOS
+from src.grade_cenarios import _eixo, inputs_segmento, ler_lista, montar_grade
+from src.registro import ErroArtefato, carregar
+from src.simulacao import project_deltas, project_levels
+
+ALGORITMOS = ("Ridge", "RandomForest", "XGBoost")
+# Tendências que os modelos de variação não usam (só a Selic entra no app_2.py)
+SO_NIVEL = ("ipca_trend", "dolar_trend", "horizon")
+MESES = 18
+BLOCO = 32
+# Uma cor por modelo: Nivel no azul do app.py, Ridge e XGBoost como no app_2.py
+CORES = {"Nivel": "#1f77b4", "RandomForest": "#2ca02c", "XGBoost": "#ff7f0e", "Ridge": "#9467bd"}
+NOMES = {"PF": "Pessoa Física", "PJ": "Pessoa Jurídica", "Rural_PF": "Rural Pessoa Física", "Rural_PJ": "Rural Pessoa Jurídica"}
+A4_PAISAGEM = (11.69, 8.27)
+
+
+# --- 1. Projeções ---
+def carregar_modelos(base_path="models", segmentos=SEGMENTOS, algoritmos=ALGORITMOS):
+    """
+    {segmento: {modelo: Ativo}} com o modelo em nível ('Nivel') e os de variação encontrados.
+    """
+    modelos = {}
+    for segmento in segmentos:
+        chaves = {"Nivel": segmento, **{algo: f"{segmento}_{algo}" for algo in algoritmos}}
+        for nome, chave in chaves.items():
+            try:
+                ativo = carregar(chave, base_path)
+            except (FileNotFoundError, ErroArtefato):
+                continue
+            modelos.setdefault(segmento, {})[nome] = ativo
+    return modelos
+
+
+def projetar_bloco(modelos, cenarios, months=MESES):
+    """
+    Projeta um bloco de cenários. Devolve {(segmento, modelo): (projeções (n x meses), base (meses,), inicio (n,))}.
+    """
+    n = len(cenarios["selic_trend"])
+    saida = {}
+    for segmento, ativos in modelos.items():
+        for nome, ativo in ativos.items():
+            if nome == "Nivel":
+                inputs_iniciais, is_decimal = inputs_segmento(ativo.last_vals)
+                preds = project_levels(
+                    ativo.model, ativo.scaler, ativo.cols, inputs_iniciais,
+                    np.append(cenarios["selic_trend"], 0.0), np.append(cenarios["ipca_trend"], 0.0),
+                    np.append(cenarios["dolar_trend"], 0.0), months=months, is_decimal=is_decimal,
+                    horizonte=np.append(cenarios["horizon"], months)
+                )
+                saida[(segmento, nome)] = (preds[:n], preds[n], preds[:n, 0])
+            else:
+                # Só a Selic muda a projeção: uma linha por tendência distinta, espalhada pelos cenários
+                start_inad = float(ativo.last_vals.get("target_lag_1", 3.0))
+                selic, posicao = np.unique(cenarios["selic_trend"], return_inverse=True)
+                preds = project_deltas(ativo.model, ativo.scaler, ativo.cols, ativo.last_vals, start_inad,
+                                       np.append(selic, 0.0), months)
+                saida[(segmento, nome)] = (preds[:-1][posicao], preds[-1], np.full(n, start_inad))
+    return saida
+
+
+def tabela_bloco(cenarios, projecoes, primeiro, months=MESES):
+    """
+    Linhas longas do bloco (cenário x segmento x modelo x mês).
+    """
+    n = len(cenarios["selic_trend"])
+    blocos = []
+    for (segmento, nome), (preds, base, inicio) in projecoes.items():
+        blocos.append(pd.DataFrame({
+            "cenario": np.repeat(np.arange(primeiro, primeiro + n), months),
+            "selic_trend": np.repeat(cenarios["selic_trend"], months),
+            # Modelos de variação: tendências que eles não usam ficam vazias
+            **{col: np.repeat(cenarios[col] if nome == "Nivel" else np.full(n, np.nan), months) for col in SO_NIVEL},
+            "segmento": segmento,
+            "modelo": nome,
+            "mes": np.tile(np.arange(1, months + 1), n),
+            "projecao": preds.ravel(),
+            "base": np.tile(base, n),
+            "desvio_base": (preds - base).ravel(),
+            "variacao": (preds - inicio[:, None]).ravel(),
+        }))
+    return pd.concat(blocos, ignore_index=True)
+
+
+# --- 2. Páginas ---
+def paginas_bloco(cenarios, projecoes, primeiro):
+    """
+    Dados de cada página do bloco (só números: é o que vai para os processos do pool).
+    """
+    paginas = []
+    for k in range(len(cenarios["selic_trend"])):
+        series = {}
+        for (segmento, nome), (preds, base, inicio) in projecoes.items():
+            series.setdefault(segmento, {})[nome] = (preds[k], base, float(inicio[k]))
+        paginas.append({
+            "cenario": primeiro + k,
+            **{col: float(cenarios[col][k]) for col in ("selic_trend", "ipca_trend", "dolar_trend", "horizon")},
+            "series": series,
+        })
+    return paginas
+
+
+class Folha:
+    """
+    Página de um cenário: 2 x 2 segmentos, cada um com o modelo em nível, os de variação e as bases
+    tracejadas. Montada uma vez e reaproveitada: a cada cenário só mudam os dados, os limites e os textos.
+    """
+
+    def __init__(self, estrutura):
+        from matplotlib.figure import Figure
+
+        self.fig = Figure(figsize=A4_PAISAGEM)
+        self.titulo = self.fig.suptitle("", fontsize=12)
+        eixos = self.fig.subplots(2, 2).ravel()
+        self.eixos = {}
+        for ax, (segmento, nomes) in zip(eixos, estrutura.items()):
+            linhas = {}
+            for nome in nomes:
+                cor = CORES.get(nome, "#333333")
+                linhas[nome] = (
+                    ax.plot([], [], color=cor, linewidth=2.5 if nome == "Nivel" else 1.5,
+                            marker="o" if nome == "Nivel" else None, markersize=3, label=nome)[0],
+                    ax.plot([], [], color=cor, linestyle="--", linewidth=1, alpha=0.5)[0],
+                )
+            ax.set_title(NOMES.get(segmento, segmento), fontsize=10)
+            ax.set_xlabel("Meses à Frente", fontsize=8)
+            ax.set_ylabel("Inadimplência (%)", fontsize=8)
+            ax.tick_params(labelsize=7)
+            ax.grid(True, linestyle="--", alpha=0.3)
+            ax.legend(fontsize=7, loc="upper left")
+            texto = ax.text(0.99, 0.02, "", transform=ax.transAxes, ha="right", va="bottom", fontsize=7,
+                            bbox=dict(facecolor="white", alpha=0.8, edgecolor="#cccccc"))
+            self.eixos[segmento] = (ax, linhas, texto)
+        for ax in eixos[len(estrutura):]:
+            ax.set_visible(False)
+        # Margens fixas: o tight_layout custaria mais que o desenho da página
+        self.fig.subplots_adjust(left=0.06, right=0.98, bottom=0.07, top=0.9, wspace=0.18, hspace=0.32)
+
+    def preencher(self, pagina):
+        self.titulo.set_text(
+            f"Cenário {pagina['cenario']} — Selic {pagina['selic_trend']:+.2f} pp/mês | IPCA {pagina['ipca_trend']:+.2f} pp/mês | "
+            f"Dólar {pagina['dolar_trend']:+.2f} R$/mês | tendência por {pagina['horizon']:.0f} meses"
+        )
+        for segmento, modelos in pagina["series"].items():
+            ax, linhas, texto = self.eixos[segmento]
+            resumo = []
+            for nome, (preds, base, inicio) in modelos.items():
+                meses = np.arange(1, len(preds) + 1)
+                linhas[nome][0].set_data(meses, preds)
+                linhas[nome][1].set_data(meses, base)
+                if nome == "Nivel":
+                    resumo.append(f"Variação Projetada: {preds[-1] - preds[0]:+.2f} pp")
+                else:
+                    resumo.append(f"{nome} mês {len(preds)}: {preds[-1]:.2f}% ({preds[-1] - inicio:+.2f} p.p.)")
+            texto.set_text("\n".join(resumo))
+            ax.relim()
+            ax.autoscale_view()
+        return self.fig
+
+
+def _estrutura(pagina):
+    return {segmento: list(modelos) for segmento, modelos in pagina["series"].items()}
+
+
+def _jpeg(fig, dpi):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="jpeg", dpi=dpi, pil_kwargs={"quality": 90})
+    return buffer.getvalue()
+
+
+def renderizar_paginas(paginas, dpi=120):
+    """
+    Roda nos processos do pool: cada página vira um JPEG, todas desenhadas na mesma Folha.
+    """
+    folha = Folha(_estrutura(paginas[0]))
+    return [_jpeg(folha.preencher(pagina), dpi) for pagina in paginas]
+
+
+class Documento:
+    """
+    PDF escrito em fluxo, com memória constante no número de páginas.
+    - vetorial: PdfPages do matplotlib, com as figuras desenhadas neste processo;
+    - raster: páginas JPEG (vindas do pool) gravadas direto como imagens DCT, cada página um objeto
+      escrito e esquecido; só os offsets ficam para a tabela xref do fim. O PdfPages não serve aqui
+      (guarda as imagens na memória até o close()) e o append do Pillow relê o arquivo inteiro a cada página.
+    """
+
+    def __init__(self, caminho, vetorial=True, dpi=120):
+        self.caminho = caminho
+        self.dpi = dpi
+        self.paginas = 0
+        self._pdf = None
+        self._arquivo = None
+        if vetorial:
+            from matplotlib.backends.backend_pdf import PdfPages
+
+            self._pdf = PdfPages(caminho)
+        else:
+            self._arquivo = open(caminho, "wb")
+            self._arquivo.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+            # 1 = catálogo e 2 = árvore de páginas, escritos no fechar()
+            self._offsets = [None, None]
+            self._filhos = []
+
+    def figura(self, fig):
+        if self._pdf is not None:
+            self._pdf.savefig(fig)
+            self.paginas += 1
+        else:
+            self.imagens([_jpeg(fig, self.dpi)])
+
+    def _objeto(self, corpo, stream=None):
+        self._offsets.append(self._arquivo.tell())
+        numero = len(self._offsets)
+        self._arquivo.write(b"%d 0 obj\n" % numero + corpo)
+        if stream is not None:
+            self._arquivo.write(b"\nstream\n" + stream + b"\nendstream")
+        self._arquivo.write(b"\nendobj\n")
+        return numero
+
+    def imagens(self, jpegs):
+        from PIL import Image
+
+        for jpeg in jpegs:
+            # Só o cabeçalho é lido: o JPEG vai para o PDF como está
+            largura, altura = Image.open(io.BytesIO(jpeg)).size
+            imagem = self._objeto(
+                b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB "
+                b"/BitsPerComponent 8 /Filter /DCTDecode /Length %d >>" % (largura, altura, len(jpeg)),
+                jpeg,
+            )
+            w, h = largura * 72 / self.dpi, altura * 72 / self.dpi
+            desenho = b"q %.2f 0 0 %.2f 0 0 cm /Im0 Do Q" % (w, h)
+            conteudo = self._objeto(b"<< /Length %d >>" % len(desenho), desenho)
+            self._filhos.append(self._objeto(
+                b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] "
+                b"/Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>" % (w, h, imagem, conteudo)
+            ))
+            self.paginas += 1
+
+    def fechar(self):
+        if self._pdf is not None:
+            self._pdf.close()
+        if self._arquivo is None:
+            return
+        escrever = self._arquivo.write
+        for numero, corpo in ((1, b"<< /Type /Catalog /Pages 2 0 R >>"),
+                              (2, b"<< /Type /Pages /Kids [%s] /Count %d >>"
+                               % (b" ".join(b"%d 0 R" % k for k in self._filhos), len(self._filhos)))):
+            self._offsets[numero - 1] = self._arquivo.tell()
+            escrever(b"%d 0 obj\n%s\nendobj\n" % (numero, corpo))
+        xref = self._arquivo.tell()
+        escrever(b"xref\n0 %d\n0000000000 65535 f \n" % (len(self._offsets) + 1))
+        escrever(b"".join(b"%010d 00000 n \n" % offset for offset in self._offsets))
+        escrever(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(self._offsets) + 1, xref))
+        self._arquivo.close()
+
+
+def _pagina_texto(documento, linhas):
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=A4_PAISAGEM)
+    fig.text(0.06, 0.92, "\n".join(linhas), va="top", family="monospace", fontsize=10)
+    documento.figura(fig)
+
+
+def _capa(documento, n_cenarios, modelos, base_path):
+    linhas = [
+        "Relatório de Cenários — Inadimplência Projetada (18 meses)", "",
+        f"Data: {date.today():%d/%m/%Y}    Cenários: {n_cenarios}    Modelos: {base_path}", "",
+    ]
+    for segmento, ativos in modelos.items():
+        versoes = ", ".join(f"{nome} v{ativo.versao}" if ativo.versao else nome for nome, ativo in ativos.items())
+        linhas.append(f"{NOMES.get(segmento, segmento)}: {versoes}")
+    linhas += ["", "Linhas cheias: cenário. Tracejadas: Cenário Estável (tendências zeradas) do mesmo modelo.",
+               "Nivel: modelo do simulador macro (app.py). Demais: modelos de variação (app_2.py).",
+               "Os modelos de variação só respondem à tendência da Selic: IPCA, Dólar e horizonte não os",
+               "alteram (as curvas deles se repetem entre cenários com a mesma Selic; na tabela, vazios)."]
+    _pagina_texto(documento, linhas)
+
+
+def _resumo(documento, finais, months=MESES):
+    linhas = [f"Resumo — variação no mês {months} sobre todos os cenários (p.p.)", "",
+              f"{'segmento':<10} {'modelo':<13} {'mín':>8} {'mediana':>8} {'máx':>8}"]
+    for (segmento, nome), partes in finais.items():
+        valores = np.concatenate(partes)
+        linhas.append(f"{segmento:<10} {nome:<13} {valores.min():>+8.2f} {np.median(valores):>+8.2f} {valores.max():>+8.2f}")
+    _pagina_texto(documento, linhas)
+
+
+# --- 3. Geração ---
+class _Tabela:
+    """
+    Escrita em fluxo: grupos de linhas no Parquet, acréscimos no CSV.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = Path(caminho)
+        self.parquet = self.caminho.suffix.lower() == ".parquet"
+        self._escritor = None
+        self.linhas = 0
+
+    def anexar(self, df):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            tabela = pa.Table.from_pandas(df, preserve_index=False)
+            if self._escritor is None:
+                self._escritor = pq.ParquetWriter(self.caminho, tabela.schema, compression="zstd")
+            self._escritor.write_table(tabela)
+        else:
+            df.to_csv(self.caminho, mode="a" if self.linhas else "w", header=not self.linhas, index=False, float_format="%.6g")
+        self.linhas += len(df)
+
+    def fechar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+
+
+def _blocos(cenarios, tamanho):
+    n = len(cenarios["selic_trend"])
+    for inicio in range(0, n, tamanho):
+        yield inicio + 1, {col: valores[inicio:inicio + tamanho] for col, valores in cenarios.items()}
+
+
+def gerar(cenarios, saida, pdf=None, base_path="models", segmentos=SEGMENTOS, algoritmos=ALGORITMOS,
+          workers=None, bloco=BLOCO, dpi=120, months=MESES, log=print):
+    """
+    Gera a tabela (CSV/Parquet, pela extensão de 'saida') e, se pedido, o PDF. Devolve os tempos por etapa.
+    """
+    inicio = time.perf_counter()
+    modelos = carregar_modelos(base_path, segmentos, algoritmos)
+    if not modelos:
+        raise FileNotFoundError(f"Nenhum modelo encontrado em '{base_path}'.")
+    tempos = {"carga": time.perf_counter() - inicio, "projecao": 0.0, "tabela": 0.0, "pdf": 0.0}
+    n_cenarios = len(cenarios["selic_trend"])
+    workers = workers or os.cpu_count() or 1
+
+    tabela = _Tabela(saida)
+    # Com o pool as páginas chegam prontas (JPEG); sem ele, ficam vetoriais
+    paralelo = bool(pdf) and workers > 1
+    documento = Documento(pdf, vetorial=not paralelo, dpi=dpi) if pdf else None
+    executor = ProcessPoolExecutor(max_workers=workers) if paralelo else None
+    folha = None
+    em_voo = deque()
+    finais = {}
+
+    try:
+        for primeiro, cenarios_bloco in _blocos(cenarios, bloco):
+            t = time.perf_counter()
+            projecoes = projetar_bloco(modelos, cenarios_bloco, months)
+            tempos["projecao"] += time.perf_counter() - t
+
+            t = time.perf_counter()
+            tabela.anexar(tabela_bloco(cenarios_bloco, projecoes, primeiro, months))
+            tempos["tabela"] += time.perf_counter() - t
+
+            if documento is None:
+                continue
+            t = time.perf_counter()
+            if primeiro == 1:
+                _capa(documento, n_cenarios, modelos, base_path)
+            for chave, (preds, _, inicio_bloco) in projecoes.items():
+                finais.setdefault(chave, []).append(preds[:, -1] - inicio_bloco)
+            paginas = paginas_bloco(cenarios_bloco, projecoes, primeiro)
+            if executor is None:
+                folha = folha or Folha(_estrutura(paginas[0]))
+                for pagina in paginas:
+                    documento.figura(folha.preencher(pagina))
+            else:
+                em_voo.append(executor.submit(renderizar_paginas, paginas, dpi))
+                # Janela limitada: o bloco mais antigo vai para o PDF antes de projetar mais
+                while len(em_voo) >= 2 * workers:
+                    documento.imagens(em_voo.popleft().result())
+            tempos["pdf"] += time.perf_counter() - t
+            log(f"  {min(primeiro + bloco - 1, n_cenarios)}/{n_cenarios} cenários")
+
+        t = time.perf_counter()
+        while em_voo:
+            documento.imagens(em_voo.popleft().result())
+        if documento is not None:
+            _resumo(documento, finais, months)
+        tempos["pdf"] += time.perf_counter() - t
+    finally:
+        tabela.fechar()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if documento is not None:
+            documento.fechar()
+
+    tempos["linhas"] = tabela.linhas
+    tempos["paginas"] = documento.paginas if documento is not None else 0
+    return tempos
+
+
+# --- 4. Linha de Comando ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Relatório de cenários para todos os segmentos e algoritmos.")
+    parser.add_argument("--selic", nargs=3, default=["0", "0", "1"], metavar=("INI", "FIM", "N"), help="Tendência da Selic (pp/mês)")
+    parser.add_argument("--ipca", nargs=3, default=["0", "0", "1"], metavar=("INI", "FIM", "N"), help="Tendência do IPCA (pp/mês)")
+    parser.add_argument("--dolar", nargs=3, default=["0", "0", "1"], metavar=("INI", "FIM", "N"), help="Tendência do Dólar (R$/mês)")
+    parser.add_argument("--horizon", nargs="+", type=int, default=[MESES], help="Meses em que a tendência vale")
+    parser.add_argument("--lista", help="CSV com a lista de cenários (substitui a grade)")
+    parser.add_argument("--segmentos", nargs="+", default=SEGMENTOS, choices=SEGMENTOS)
+    parser.add_argument("--algoritmos", nargs="+", default=list(ALGORITMOS), choices=ALGORITMOS)
+    parser.add_argument("--models", default="models", help="Pasta dos artefatos")
+    parser.add_argument("--saida", default="relatorio.parquet", help="Tabela: .parquet ou .csv")
+    parser.add_argument("--pdf", help="PDF com uma página por cenário")
+    parser.add_argument("--workers", type=int, default=None, help="Processos que desenham as páginas (1 = PDF vetorial)")
+    parser.add_argument("--bloco", type=int, default=BLOCO, help="Cenários por bloco")
+    parser.add_argument("--dpi", type=int, default=120, help="Resolução das páginas desenhadas no pool")
+    args = parser.parse_args(argv)
+
+    if args.lista:
+        cenarios = ler_lista(args.lista, MESES)
+    else:
+        cenarios = montar_grade(_eixo(args.selic), _eixo(args.ipca), _eixo(args.dolar), args.horizon)
+
+    inicio = time.perf_counter()
+    tempos = gerar(cenarios, args.saida, args.pdf, args.models, args.segmentos, args.algoritmos,
+                   args.workers, args.bloco, args.dpi)
+    total = time.perf_counter() - inicio
+
+    print(f"{len(cenarios['selic_trend'])} cenários | {tempos['linhas']} linhas em {args.saida}"
+          + (f" | {tempos['paginas']} páginas em {args.pdf}" if args.pdf else "") + f" | {total:.1f}s")
+    print("  " + " | ".join(f"{etapa} {tempos[etapa]:.2f}s" for etapa in ("carga", "projecao", "tabela", "pdf")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Sensibilidade do modelo a cada feature, mantendo as demais constantes (Ceteris Paribus).
+
+- Modelos lineares compilados (ModeloLinear): conta exata com os pesos já na escala original.
+- Demais modelos (RandomForest, XGBoost, ...): uma única previsão em lote sobre a grade de todas as features.
+"""
+import numpy as np
+
+from src.compilacao import ModeloLinear
+from src.simulacao import predict_rows, predict_tensor
+
+
+def _desvios(scaler, n_features):
+    # Desvio padrão de treino de cada feature: define a largura das grades e dos choques
+    scale = getattr(scaler, "scale_", None)
+    return np.ones(n_features) if scale is None else np.asarray(scale, dtype=float)
+
+
+def montar_grades(scaler, feature_names, x_base, grades=None, n_pontos=40, amplitude=3.0):
+    """
+    Grade (features x pontos): x_base ± amplitude desvios para cada feature.
+    - grades: {coluna: valores} substitui a grade padrão (ex: Selic de 2% a 25%); precisa ter n_pontos valores.
+    """
+    x_base = np.asarray(x_base, dtype=float).ravel()
+    desvios = _desvios(scaler, len(x_base))
+    matriz = x_base[:, None] + desvios[:, None] * np.linspace(-amplitude, amplitude, n_pontos)
+
+    for col, valores in (grades or {}).items():
+        valores = np.asarray(valores, dtype=float)
+        if len(valores) != n_pontos:
+            raise ValueError(f"A grade de '{col}' tem {len(valores)} pontos, esperado {n_pontos}.")
+        matriz[feature_names.index(col)] = valores
+    return matriz
+
+
+def curvas_resposta(model, scaler, feature_names, x_base, grades=None, n_pontos=40, amplitude=3.0):
+    """
+    Curva de reação de todas as features de uma vez.
+    Devolve (grades, previsões), ambas (features x pontos): linha j = feature j variando, demais no x_base.
+    """
+    x_base = np.asarray(x_base, dtype=float).ravel()
+    matriz = montar_grades(scaler, feature_names, x_base, grades, n_pontos, amplitude)
+
+    if isinstance(model, ModeloLinear):
+        base = float(predict_rows(model, scaler, x_base[None, :])[0])
+        return matriz, base + model.pesos[:, None] * (matriz - x_base[:, None])
+
+    # Tensor (features x pontos x features): cópia do x_base com a diagonal trocada pela grade
+    n = len(x_base)
+    X = np.broadcast_to(x_base, (n, n_pontos, n)).copy()
+    idx = np.arange(n)
+    X[idx, :, idx] = matriz
+    return matriz, predict_tensor(model, scaler, X)
+
+
+def _choques(model, scaler, x_base, passos):
+    """
+    Previsões com cada feature deslocada em -passo e +passo (2 x features linhas, uma chamada só).
+    """
+    n = len(x_base)
+    X = np.tile(x_base, (2 * n, 1))
+    idx = np.arange(n)
+    X[idx, idx] -= passos
+    X[n + idx, idx] += passos
+    preds = predict_rows(model, scaler, X)
+    return preds[:n], preds[n:]
+
+
+def jacobiano(model, scaler, x_base, passo=0.5):
+    """
+    Derivada parcial da previsão em relação a cada feature (unidade da feature original).
+    Lineares: os próprios pesos. Árvores (derivada zero quase sempre): diferença central com
+    passo de 'passo' desvios padrão, que mede a inclinação média em torno do ponto.
+    """
+    x_base = np.asarray(x_base, dtype=float).ravel()
+    if isinstance(model, ModeloLinear):
+        return model.pesos.copy()
+
+    passos = passo * _desvios(scaler, len(x_base))
+    baixo, alto = _choques(model, scaler, x_base, passos)
+    return (alto - baixo) / (2 * passos)
+
+
+def tornado(model, scaler, x_base, choque=1.0):
+    """
+    Impacto na previsão de um choque de -choque e +choque desvios padrão em cada feature.
+    Devolve (impacto_baixo, impacto_alto), ambos relativos à previsão no x_base.
+    """
+    x_base = np.asarray(x_base, dtype=float).ravel()
+    passos = choque * _desvios(scaler, len(x_base))
+
+    if isinstance(model, ModeloLinear):
+        return -model.pesos * passos, model.pesos * passos
+
+    base = float(predict_rows(model, scaler, x_base[None, :])[0])
+    baixo, alto = _choques(model, scaler, x_base, passos)
+    return baixo - base, alto - base
@@ -0,0 +1,352 @@
+"""
+Serviço HTTP de projeções: os mesmos modelos dos apps, sem Streamlit, para sistemas de
+ALM, provisão IFRS 9 e afins.
+
+Rotas (JSON):
+    GET  /saude           modelos carregados e estatísticas dos micro-lotes
+    POST /delta           delta do próximo mês, como no app_1.py
+                          {"segmento": "PF", "selic": 10.5, "ipca": 0.4, "dolar_ptax": 5.1, "inad_anterior": 3.5}
+    POST /projecao        18 meses do modelo de nível, como no app.py (mais o "Cenário Estável")
+                          {"segmento": "PF", "selic_trend": 0.1, "ipca_trend": 0.0, "dolar_trend": 0.0,
+                           "horizon": 18, "selic_inicial": 10.5, "ipca_inicial": 0.4, "dolar_inicial": 5.1}
+    POST /projecao_delta  18 meses do modelo de delta, como no app_2.py
+                          {"segmento": "PF", "algoritmo": "RandomForest", "selic_trend": 0.1, "start_inad": 3.2}
+    POST /lote            vários cenários de nível numa chamada
+                          {"segmento": "PF", "cenarios": [{"selic_trend": 0.1, ...}, ...], "months": 18}
+
+Os modelos são carregados na subida e resolvidos pelo cache de ativos a cada lote: um modelo
+retreinado ou registrado com o servidor no ar entra no lote seguinte, sem reiniciar. Pedidos que chegam com poucos milissegundos de diferença
+para o mesmo modelo são juntados (micro-lote) e resolvidos por uma única previsão vetorizada,
+numa thread fora do event loop.
+
+Uso:
+    python -m src.servico --porta 8000 --models models
+"""
+import argparse
+import asyncio
+import contextlib
+import math
+import os
+import re
+import time
+
+import numpy as np
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from src.artefatos import SEGMENTOS
+from src.cache import carregar_ativo
+from src.grade_cenarios import inputs_segmento
+from src.registro import ErroArtefato
+from src.simulacao import predict_rows, project_deltas, project_levels, vetor_entrada
+
+ALGORITMOS = ["RandomForest", "XGBoost", "Ridge"]
+JANELA_PADRAO = 0.002
+LOTE_MAXIMO = 512
+MESES_MAXIMO = 18
+# Nomes de segmento/algoritmo: viram parte do nome dos arquivos do modelo
+NOME_VALIDO = re.compile(r"^[A-Za-z0-9_]+$")
+
+
+class ErroPedido(ValueError):
+    """
+    Pedido inválido (campo faltando, segmento sem modelo...): vira resposta 4xx.
+    """
+
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class MicroLote:
+    """
+    Junta os pedidos que chegam dentro de 'janela' segundos (ou até 'maximo' pedidos)
+    e resolve todos com uma chamada de resolver(itens) -> resultados, na mesma ordem.
+    """
+
+    def __init__(self, resolver, janela=JANELA_PADRAO, maximo=LOTE_MAXIMO):
+        self.resolver = resolver
+        self.janela = janela
+        self.maximo = maximo
+        self._fila = []
+        self._agendado = None
+        self.lotes = 0
+        self.pedidos = 0
+
+    async def enviar(self, item):
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self._fila.append((item, futuro))
+        if len(self._fila) >= self.maximo:
+            self._disparar()
+        elif self._agendado is None:
+            self._agendado = loop.call_later(self.janela, self._disparar)
+        return await futuro
+
+    def _disparar(self):
+        if self._agendado is not None:
+            self._agendado.cancel()
+            self._agendado = None
+        fila, self._fila = self._fila, []
+        if fila:
+            self.lotes += 1
+            self.pedidos += len(fila)
+            asyncio.ensure_future(self._resolver(fila))
+
+    async def _resolver(self, fila):
+        loop = asyncio.get_running_loop()
+        try:
+            resultados = await loop.run_in_executor(None, self.resolver, [item for item, _ in fila])
+        except Exception as e:
+            resultados = [e] * len(fila)
+        for (_, futuro), resultado in zip(fila, resultados):
+            if futuro.done():
+                continue
+            if isinstance(resultado, Exception):
+                futuro.set_exception(resultado)
+            else:
+                futuro.set_result(resultado)
+
+    def stats(self):
+        return {"lotes": self.lotes, "pedidos": self.pedidos,
+                "media_por_lote": round(self.pedidos / self.lotes, 2) if self.lotes else 0.0}
+
+
+# --- 1. Resolvedores (um lote = um modelo) ---
+def resolver_delta(ativo, linhas):
+    """
+    Uma linha (vetor de entrada) por pedido: um único predict.
+    """
+    return predict_rows(ativo.model, ativo.scaler, np.vstack(linhas)).tolist()
+
+
+def resolver_niveis(ativo, itens, months=18):
+    """
+    itens: (inputs_iniciais, is_decimal, selic_trend, ipca_trend, dolar_trend, horizon).
+    Pedidos com o mesmo ponto de partida viram uma chamada só (com uma linha extra para o cenário estável).
+    Devolve (projeção, base) por pedido.
+    """
+    grupos = {}
+    for k, (inputs_iniciais, is_decimal, *_) in enumerate(itens):
+        grupos.setdefault((tuple(sorted(inputs_iniciais.items())), is_decimal), []).append(k)
+
+    resultados = [None] * len(itens)
+    for (inicio, is_decimal), indices in grupos.items():
+        trends = np.array([itens[k][2:] for k in indices] + [(0.0, 0.0, 0.0, months)], dtype=float)
+        preds = project_levels(
+            ativo.model, ativo.scaler, ativo.cols, dict(inicio),
+            trends[:, 0], trends[:, 1], trends[:, 2], months=months, is_decimal=is_decimal, horizonte=trends[:, 3]
+        )
+        base = preds[-1].tolist()
+        for k, linha in zip(indices, preds[:-1]):
+            resultados[k] = (linha.tolist(), base)
+    return resultados
+
+
+def resolver_deltas(ativo, itens, months=18):
+    """
+    itens: (start_inad, selic_trend). Cenário e base de todos os pedidos numa única chamada.
+    """
+    n = len(itens)
+    start_inad = np.array([item[0] for item in itens] * 2, dtype=float)
+    trends = np.array([item[1] for item in itens] + [0.0] * n, dtype=float)
+    preds = project_deltas(ativo.model, ativo.scaler, ativo.cols, ativo.last_vals, start_inad, trends, months)
+    return [(preds[k].tolist(), preds[n + k].tolist()) for k in range(n)]
+
+
+# --- 2. Estado do Serviço ---
+class Servico:
+    """
+    Um micro-lote por (tipo, modelo). O Ativo vem do carregar_ativo a cada lote (mtime dos artefatos):
+    'ativos' guarda só a última versão vista, para o /saude.
+    """
+
+    def __init__(self, base_path="models", janela=JANELA_PADRAO):
+        self.base_path = base_path
+        self.janela = janela
+        self.ativos = {}
+        self.lotes = {}
+
+    def carregar(self):
+        chaves = SEGMENTOS + [f"{seg}_{algo}" for seg in SEGMENTOS for algo in ALGORITMOS]
+        for chave in chaves:
+            try:
+                self.ativos[chave] = carregar_ativo(chave, self.base_path)
+            except FileNotFoundError:
+                continue
+        if not self.ativos:
+            raise FileNotFoundError(f"Nenhum modelo encontrado em '{self.base_path}'.")
+
+    def ativo(self, chave):
+        try:
+            self.ativos[chave] = carregar_ativo(chave, self.base_path)
+        except FileNotFoundError:
+            self.ativos.pop(chave, None)
+            raise ErroPedido(f"Modelo '{chave}' não carregado.", status=404)
+        return self.ativos[chave]
+
+    def lote(self, tipo, chave, resolver):
+        if (tipo, chave) not in self.lotes:
+            self.ativo(chave)
+            self.lotes[(tipo, chave)] = MicroLote(lambda itens: resolver(self.ativo(chave), itens), self.janela)
+        return self.lotes[(tipo, chave)]
+
+
+def _numero(corpo, campo, padrao=None):
+    valor = corpo.get(campo, padrao)
+    if valor is None:
+        raise ErroPedido(f"Campo obrigatório ausente: '{campo}'.")
+    try:
+        valor = float(valor)
+    except (TypeError, ValueError):
+        raise ErroPedido(f"Campo '{campo}' deve ser numérico.")
+    # NaN/Infinity viram projeções que o JSON da resposta não representa
+    if not math.isfinite(valor):
+        raise ErroPedido(f"Campo '{campo}' deve ser um número finito.")
+    return valor
+
+
+def _nome(corpo, campo, padrao):
+    valor = corpo.get(campo, padrao)
+    if not isinstance(valor, str) or not NOME_VALIDO.match(valor):
+        raise ErroPedido(f"Campo '{campo}' deve ser um texto não vazio (letras, dígitos e '_').")
+    return valor
+
+
+def _cenario_nivel(ativo, corpo, months=18):
+    if not isinstance(corpo, dict):
+        raise ErroPedido("Cada cenário deve ser um objeto JSON.")
+    inputs_iniciais, is_decimal = inputs_segmento(
+        ativo.last_vals,
+        **{campo: _numero(corpo, campo) for campo in ("selic_inicial", "ipca_inicial", "dolar_inicial") if corpo.get(campo) is not None}
+    )
+    horizon = _numero(corpo, "horizon", months)
+    if horizon < 0:
+        raise ErroPedido("Campo 'horizon' não pode ser negativo.")
+    return (inputs_iniciais, is_decimal, _numero(corpo, "selic_trend", 0.0), _numero(corpo, "ipca_trend", 0.0),
+            _numero(corpo, "dolar_trend", 0.0), horizon)
+
+
+# --- 3. Rotas ---
+async def _corpo(request):
+    try:
+        corpo = await request.json()
+    except ValueError:
+        raise ErroPedido("Corpo da requisição não é um JSON válido.")
+    if not isinstance(corpo, dict):
+        raise ErroPedido("O corpo da requisição deve ser um objeto JSON.")
+    return corpo
+
+
+def rota(funcao):
+    async def tratar(request):
+        inicio = time.perf_counter()
+        try:
+            resposta = await funcao(request.app.state.servico, request)
+        except ErroPedido as e:
+            return JSONResponse({"erro": str(e)}, status_code=e.status)
+        except ErroArtefato as e:
+            return JSONResponse({"erro": str(e)}, status_code=500)
+        resposta["latencia_ms"] = round((time.perf_counter() - inicio) * 1000, 3)
+        return JSONResponse(resposta)
+    return tratar
+
+
+async def saude(servico, request):
+    return {
+        "modelos": sorted(servico.ativos),
+        "micro_lotes": {f"{tipo}:{chave}": lote.stats() for (tipo, chave), lote in servico.lotes.items()},
+    }
+
+
+async def delta(servico, request):
+    corpo = await _corpo(request)
+    segmento = _nome(corpo, "segmento", "PF")
+    ativo = servico.ativo(segmento)
+    if ativo.meta is None:
+        raise ErroPedido(f"Modelo '{segmento}' sem metadados (meta_{segmento}.pkl).", status=404)
+
+    last_features = ativo.meta.get("X_ultimo_real", {})
+    input_values = {col: _numero(corpo, col, last_features.get(col, padrao))
+                    for col, padrao in (("selic", 10.75), ("ipca", 0.5), ("dolar_ptax", 5.0))}
+    input_values["inad_anterior"] = _numero(corpo, "inad_anterior", ativo.meta["valor_ultimo_real"])
+
+    x_input = vetor_entrada(ativo.cols, last_features, input_values)
+    delta_pred = await servico.lote("delta", segmento, resolver_delta).enviar(x_input)
+    return {
+        "segmento": segmento,
+        "delta": delta_pred,
+        "previsao": max(0.0, input_values["inad_anterior"] + delta_pred),
+    }
+
+
+async def projecao(servico, request):
+    corpo = await _corpo(request)
+    segmento = _nome(corpo, "segmento", "PF")
+    item = _cenario_nivel(servico.ativo(segmento), corpo)
+    proj, base = await servico.lote("niveis", segmento, resolver_niveis).enviar(item)
+    return {"segmento": segmento, "projecao": proj, "base": base}
+
+
+async def projecao_delta(servico, request):
+    corpo = await _corpo(request)
+    chave = f"{_nome(corpo, 'segmento', 'PF')}_{_nome(corpo, 'algoritmo', 'RandomForest')}"
+    ativo = servico.ativo(chave)
+    item = (_numero(corpo, "start_inad", ativo.last_vals.get("target_lag_1", 3.0)), _numero(corpo, "selic_trend", 0.0))
+    proj, base = await servico.lote("deltas", chave, resolver_deltas).enviar(item)
+    return {"modelo": chave, "projecao": proj, "base": base}
+
+
+async def lote(servico, request):
+    corpo = await _corpo(request)
+    segmento = _nome(corpo, "segmento", "PF")
+    ativo = servico.ativo(segmento)
+    months = _numero(corpo, "months", MESES_MAXIMO)
+    if months != int(months) or not 1 <= months <= MESES_MAXIMO:
+        raise ErroPedido(f"Campo 'months' deve ser um inteiro entre 1 e {MESES_MAXIMO}.")
+    months = int(months)
+    cenarios = corpo.get("cenarios")
+    if not isinstance(cenarios, list) or not cenarios:
+        raise ErroPedido("Campo 'cenarios' deve ser uma lista não vazia.")
+
+    itens = [_cenario_nivel(ativo, cenario, months) for cenario in cenarios]
+    loop = asyncio.get_running_loop()
+    resultados = await loop.run_in_executor(None, resolver_niveis, ativo, itens, months)
+    return {"segmento": segmento, "projecoes": [proj for proj, _ in resultados]}
+
+
+def criar_app(base_path="models", janela=JANELA_PADRAO):
+    servico = Servico(base_path, janela)
+
+    @contextlib.asynccontextmanager
+    async def ciclo(app):
+        # Pré-carga: o primeiro pedido já encontra os modelos na memória
+        servico.carregar()
+        app.state.servico = servico
+        yield
+
+    rotas = [
+        Route("/saude", rota(saude), methods=["GET"]),
+        Route("/delta", rota(delta), methods=["POST"]),
+        Route("/projecao", rota(projecao), methods=["POST"]),
+        Route("/projecao_delta", rota(projecao_delta), methods=["POST"]),
+        Route("/lote", rota(lote), methods=["POST"]),
+    ]
+    return Starlette(routes=rotas, lifespan=ciclo)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço HTTP de projeções de inadimplência.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8000)
+    parser.add_argument("--models", default=os.environ.get("SIMULADOR_MODELS", "models"), help="Pasta dos artefatos")
+    parser.add_argument("--janela-ms", type=float, default=JANELA_PADRAO * 1000, help="Janela do micro-lote")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    uvicorn.run(criar_app(args.models, args.janela_ms / 1000), host=args.host, port=args.porta, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
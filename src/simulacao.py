@@ -0,0 +1,228 @@
+import warnings
+from datetime import datetime
+
+import numpy as np
+
+from src.defasagens import EstadoDefasagens, decompor, estado_inicial, ler_historico
+from src.instrumentacao import medir
+
+# Meses de colheita usados na flag 'periodo_safra'
+MESES_SAFRA = (2, 3, 4, 5)
+
+
+# --- 1. Blocos Básicos ---
+def calendario(mes_inicial, months=18):
+    """
+    Mês do calendário (1-12) de cada passo da projeção, começando no mês seguinte ao inicial.
+    """
+    return (int(mes_inicial) + np.arange(months)) % 12 + 1
+
+
+def mes_inicial(valores):
+    return int(valores.get('mes', datetime.now().month))
+
+
+def feature_tensor(feature_names, valores, caminhos, n_cenarios, months=18, historico=None):
+    """
+    Monta o tensor (cenários x meses x features) na ordem do modelo.
+    - caminhos: {coluna: array (cenários x meses) ou (meses,)} com os valores simulados da variável
+      da coluna ('selic_lag_6' -> 'selic'). Todas as colunas dessa variável (a corrente e os lags) saem
+      do EstadoDefasagens: no mês t, o lag k lê o valor simulado de t - k ou, antes do início, o observado.
+    - valores: último valor observado, mantido constante (Ceteris Paribus). Os lags de uma variável
+      parada também vêm do estado: andam pelo histórico até alcançar o último valor.
+    - historico: {variável: últimos meses observados}; padrão, a cauda do df_modelagem_v3.csv.
+    Colunas ausentes nos dois viram 0, como o reindex(fill_value=0) fazia.
+    """
+    with medir("features"):
+        series = {decompor(col)[0]: caminho for col, caminho in caminhos.items()}
+        base = ler_historico() if historico is None else historico
+        # Variáveis sem caminho mas com lags no modelo ficam paradas no último valor (Ceteris Paribus);
+        # os lags delas ainda andam pelo histórico
+        for col in feature_names:
+            serie, k = decompor(col)
+            if k and serie not in series and serie in base:
+                series[serie] = np.full(months, float(valores.get(serie, base[serie][-1])))
+        if historico is None:
+            estado = estado_inicial(tuple(feature_names), tuple(series))
+        else:
+            estado = EstadoDefasagens.para_colunas(feature_names, series, historico)
+        simuladas = set(estado.plano(feature_names).posicoes.tolist())
+
+        X = np.zeros((n_cenarios, months, len(feature_names)))
+        for j, col in enumerate(feature_names):
+            if j not in simuladas and col in valores:
+                X[:, :, j] = float(valores[col])
+        estado.trajetoria(feature_names, series, X, continuar=False)
+    return X
+
+
+def transform(scaler, X):
+    # O scaler foi treinado com DataFrame; com array puro o resultado é o mesmo, só silenciamos o aviso
+    with medir("transform"), warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        return scaler.transform(X)
+
+
+def predict_rows(model, scaler, X):
+    """
+    Escala e prevê uma matriz (linhas x features).
+    Modelos compilados (src.compilacao) já trazem o scaler embutido e recebem X na escala original.
+    """
+    if not getattr(model, "inclui_scaler", False):
+        X = transform(scaler, X)
+    with medir("predict"):
+        return np.asarray(model.predict(X), dtype=float)
+
+
+def predict_tensor(model, scaler, X):
+    """
+    Escala e prevê o tensor inteiro em uma única chamada (em vez de uma por mês).
+    """
+    flat = X.reshape(-1, X.shape[-1])
+    return predict_rows(model, scaler, flat).reshape(X.shape[:-1])
+
+
+def _vetores(*trends):
+    return np.broadcast_arrays(*[np.atleast_1d(np.asarray(t, dtype=float)) for t in trends])
+
+
+# --- 2. Modelo de Nível (app.py) ---
+def detectar_escala(last_vals):
+    """
+    Verifica se a Selic salva está em decimal (ex: 0.11) ou % (11.0).
+    Devolve o flag e os valores de Selic/IPCA para EXIBIÇÃO (sempre em %).
+    """
+    raw_selic = float(last_vals.get('selic_lag_6', 10.0))
+    is_decimal = raw_selic < 1.0 # Se for menor que 1, assumimos que é decimal
+
+    display_selic = raw_selic * 100 if is_decimal else raw_selic
+    display_ipca = float(last_vals.get('ipca_lag_6', 0.5))
+    if is_decimal and display_ipca < 1: display_ipca *= 100
+
+    return is_decimal, display_selic, display_ipca
+
+
+def caminhos_nivel(feature_names, inputs_iniciais, selic_trend, ipca_trend, dolar_trend, months=18, is_decimal=False, horizonte=None):
+    """
+    Trajetórias de Selic, IPCA, Dólar e sazonalidade para cada cenário (mesma lógica do predict_scenario).
+    - horizonte: meses em que a tendência vale; depois disso os indicadores ficam parados no último nível.
+    """
+    if horizonte is None:
+        horizonte = months
+    selic_trend, ipca_trend, dolar_trend, horizonte = _vetores(selic_trend, ipca_trend, dolar_trend, horizonte)
+
+    # --- AJUSTE DE ESCALA (TRADUÇÃO) ---
+    if is_decimal:
+        base_selic = float(inputs_iniciais.get('selic_lag_6', 0.10)) / 100
+        base_ipca = float(inputs_iniciais.get('ipca_lag_6', 0.005)) / 100
+    else:
+        base_selic = float(inputs_iniciais.get('selic_lag_6', 10.0))
+        base_ipca = float(inputs_iniciais.get('ipca_lag_6', 0.5))
+
+    base_dolar = float(inputs_iniciais.get('dolar_ptax_lag_6', 5.0))
+    factor = 100 if is_decimal else 1
+    passos = np.minimum(np.arange(1, months + 1), horizonte[:, None])
+
+    new_selic = np.maximum(0, (base_selic * factor) + (selic_trend[:, None] * passos))
+    new_ipca = np.maximum(-1, (base_ipca * factor) + (ipca_trend[:, None] * passos))
+
+    caminhos = {
+        'selic_lag_6': new_selic / factor if is_decimal else new_selic,
+        'ipca_lag_6': new_ipca / factor if is_decimal else new_ipca,
+    }
+    if 'dolar_ptax_lag_6' in feature_names:
+        caminhos['dolar_ptax_lag_6'] = np.maximum(2.0, base_dolar + (dolar_trend[:, None] * passos))
+
+    meses = calendario(mes_inicial(inputs_iniciais), months)
+    if 'mes' in feature_names:
+        caminhos['mes'] = meses
+    if 'periodo_safra' in feature_names:
+        caminhos['periodo_safra'] = np.isin(meses, MESES_SAFRA).astype(float)
+
+    return caminhos, len(selic_trend)
+
+
+def project_levels(model, scaler, feature_names, inputs_iniciais, selic_trend, ipca_trend, dolar_trend, months=18, is_decimal=False, horizonte=None):
+    """
+    Projeção vetorizada do nível de inadimplência.
+    Aceita tendências escalares ou vetores (um cenário por posição) e devolve um array (cenários x meses).
+    Ex: selic_trend=[0.25, 0.0] calcula o cenário do usuário e o "Cenário Estável" numa chamada só.
+    """
+    caminhos, n = caminhos_nivel(feature_names, inputs_iniciais, selic_trend, ipca_trend, dolar_trend, months, is_decimal, horizonte)
+    X = feature_tensor(feature_names, inputs_iniciais, caminhos, n, months)
+    return np.maximum(0.0, predict_tensor(model, scaler, X))
+
+
+# --- 3. Modelo de Delta Autorregressivo (app_2.py) ---
+def caminhos_delta(feature_names, initial_input, selic_trend, months=18):
+    """
+    Trajetórias da Selic (todas as colunas que contêm 'selic') e do mês, como no run_simulation.
+    """
+    (selic_trend,) = _vetores(selic_trend)
+
+    # Valor base da Selic (pega o lag mais recente disponível ou define 10.5 como padrão)
+    selic_base = initial_input.get('selic_lag_6', initial_input.get('selic', 10.5))
+    passos = np.arange(1, months + 1)
+    new_selic = np.clip(selic_base + selic_trend[:, None] * passos, 2.0, 30.0)
+
+    caminhos = {col: new_selic for col in feature_names if 'selic' in col.lower()}
+    if 'mes' in feature_names:
+        caminhos['mes'] = calendario(mes_inicial(initial_input), months)
+
+    return caminhos, len(selic_trend)
+
+
+def acumular(deltas, start_inad):
+    """
+    Soma os deltas mês a mês com a trava de inadimplência >= 0.
+    Única parte sequencial da simulação: a trava impede um cumsum direto.
+    O loop é só nos meses; todas as linhas (cenários/modelos) andam juntas.
+    """
+    n, months = deltas.shape
+    current_inad = np.array(np.broadcast_to(np.asarray(start_inad, dtype=float), (n,)))
+    niveis = np.empty((n, months))
+    for i in range(months):
+        current_inad = np.maximum(0.0, current_inad + deltas[:, i])
+        niveis[:, i] = current_inad
+    return niveis
+
+
+def project_deltas(model, scaler, feature_names, initial_input, start_inad, selic_trend, months=18):
+    """
+    Projeção dos modelos de delta: features em lote, acumulação no loop enxuto.
+    Devolve um array (cenários x meses) com o nível acumulado.
+    """
+    caminhos, n = caminhos_delta(feature_names, initial_input, selic_trend, months)
+    X = feature_tensor(feature_names, initial_input, caminhos, n, months)
+    deltas = predict_tensor(model, scaler, X)
+    return acumular(deltas, start_inad)
+
+
+def project_deltas_modelos(modelos, feature_names, initial_input, start_inad, selic_trend, months=18):
+    """
+    Arena: as mesmas trajetórias para vários modelos de delta que usam as mesmas colunas.
+    O tensor de features é montado uma vez e a acumulação roda uma vez para todos.
+    - modelos: lista de (model, scaler)
+    Devolve um array (modelos x cenários x meses).
+    """
+    caminhos, n = caminhos_delta(feature_names, initial_input, selic_trend, months)
+    X = feature_tensor(feature_names, initial_input, caminhos, n, months)
+    deltas = np.concatenate([predict_tensor(model, scaler, X) for model, scaler in modelos])
+    start_inad = np.tile(np.broadcast_to(np.asarray(start_inad, dtype=float), (n,)), len(modelos))
+    return acumular(deltas, start_inad).reshape(len(modelos), n, months)
+
+
+# --- 4. Delta de Um Mês (app_1.py) ---
+def vetor_entrada(feature_names, last_features, input_values, historico=None):
+    """
+    Vetor de entrada do próximo mês na ordem do modelo: último valor observado (ausentes em 0) com os
+    inputs do usuário nas colunas correntes. Os lags dessas variáveis vêm do histórico observado
+    (selic_lag_3 do próximo mês é a Selic de dois meses atrás), não mais do próprio input.
+    """
+    with medir("features"):
+        x_input = np.array([float(last_features.get(col, 0)) for col in feature_names])
+        estado = EstadoDefasagens.para_colunas(feature_names, list(input_values),
+                                               ler_historico() if historico is None else historico)
+        estado.avancar(input_values)
+        estado.ler(estado.plano(feature_names), x_input[None, :])
+    return x_input
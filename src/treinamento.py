@@ -0,0 +1,379 @@
+"""
+Pipeline de treinamento (no lugar dos notebooks 04–08): todos os segmentos × algoritmos em paralelo.
+
+Duas famílias de modelos, nas features focadas do notebook 08:
+- nivel: Ridge sobre a inadimplência em nível -> model_{segmento}.pkl (app.py)
+- delta: Ridge, RandomForest e XGBoost sobre a variação mensal -> model_{segmento}_{algoritmo}.pkl (app_2.py)
+
+Cada combinação segmento/família/algoritmo é uma tarefa no pool de processos: busca em grade com
+validação cruzada temporal (TimeSeriesSplit, scaler ajustado só na parte de treino de cada dobra,
+como no notebook 06) e reajuste dos melhores hiperparâmetros na base inteira.
+
+Cache em disco por hash de conteúdo (PASTA_CACHE):
+- features_*.npz: matriz X/y de cada segmento/família, chaveada pelo hash do CSV;
+- dobra_*.json: RMSE das dobras de cada combinação de hiperparâmetros, chaveado pelo hash de X/y;
+- resultado_*.pkl: modelo final de cada tarefa. Segmento cujo X/y não mudou nem entra no pool.
+Os artefatos só são regravados quando o conteúdo muda (o cache de ativos dos apps vê o mtime).
+
+Saída na pasta dos apps: model_*, scaler_*, columns_*, last_values_* (mesmo formato do notebook 08);
+se a pasta foi migrada para o registro, as chaves alteradas ganham versão nova.
+
+Uso:
+    python -m src.treinamento
+    python -m src.treinamento --segmentos PF PJ --algoritmos Ridge RandomForest --workers 4
+    python -m src.treinamento --models /tmp/modelos --relatorio treino.json --sem-cache
+"""
+import argparse
+import hashlib
+import importlib.util
+import io
+import itertools
+import json
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+from src.defasagens import CSV_MODELAGEM
+from src.registro import escrever_atomico, ler_indice as ler_registro, registrar_soltos
+
+PASTA_CACHE = ".cache/treinamento"
+
+TARGETS = {
+    "PF": "inad_pf_tot",
+    "PJ": "inad_pj_tot",
+    "Rural_PF": "inad_rd_pf_cr_rur_tot",
+    "Rural_PJ": "inad_rd_pj_cr_rur_tot",
+}
+FEATURES_FOCADAS = ["selic_lag_6", "ipca_lag_6", "dolar_ptax_lag_6", "mes", "periodo_safra"]
+FAMILIAS = {"nivel": ("Ridge",), "delta": ("Ridge", "RandomForest", "XGBoost")}
+
+# Grades em torno dos valores escolhidos à mão nos notebooks 05–08
+GRADES = {
+    "Ridge": {"alpha": [0.1, 0.5, 1.0, 5.0, 10.0]},
+    "RandomForest": {"n_estimators": [100, 150, 200], "max_depth": [6, 8, 10]},
+    "XGBoost": {"n_estimators": [100, 200], "learning_rate": [0.05, 0.1], "max_depth": [4, 6]},
+}
+N_DOBRAS = 5
+SEMENTE = 42
+
+
+# --- 1. Features ---
+def _hash(*partes):
+    h = hashlib.sha256()
+    for parte in partes:
+        h.update(parte if isinstance(parte, bytes) else json.dumps(parte, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+def montar_features(df, target_col, familia):
+    """
+    X/y de um segmento. nivel: igual ao notebook 08. delta: alvo = diff() do nível, primeira linha descartada.
+    Devolve (X, y, datas, colunas).
+    """
+    cols = [c for c in FEATURES_FOCADAS if c in df.columns]
+    df_temp = df[cols + [target_col]].copy()
+    if familia == "delta":
+        df_temp[target_col] = df_temp[target_col].diff()
+    df_temp = df_temp.dropna()
+    return (df_temp[cols].to_numpy(dtype=float), df_temp[target_col].to_numpy(dtype=float),
+            df_temp.index.strftime("%Y-%m-%d").to_numpy(), cols)
+
+
+def carregar_features(csv_path, segmentos, familias, pasta_cache, usar_cache=True):
+    """
+    Matrizes de todas as combinações segmento/família. O CSV só é lido (pandas) se alguma faltar no cache.
+    Devolve {(segmento, familia): dict(X, y, datas, cols, hash)}.
+    """
+    hash_csv = _hash(Path(csv_path).read_bytes())
+    pasta_cache = Path(pasta_cache)
+    df = None
+    matrizes = {}
+    for segmento, familia in itertools.product(segmentos, familias):
+        caminho = pasta_cache / f"features_{_hash(hash_csv, TARGETS[segmento], familia, FEATURES_FOCADAS)[:16]}.npz"
+        if usar_cache and caminho.exists():
+            with np.load(caminho, allow_pickle=False) as npz:
+                X, y, datas, cols = npz["X"], npz["y"], npz["datas"], npz["cols"].tolist()
+        else:
+            if df is None:
+                df = pd.read_csv(csv_path, index_col="data", parse_dates=True)
+            if TARGETS[segmento] not in df.columns:
+                continue
+            X, y, datas, cols = montar_features(df, TARGETS[segmento], familia)
+            buffer = io.BytesIO()
+            np.savez(buffer, X=X, y=y, datas=datas.astype(str), cols=np.array(cols))
+            escrever_atomico(caminho, buffer.getvalue())
+        matrizes[(segmento, familia)] = {
+            "X": X, "y": y, "datas": datas, "cols": cols,
+            "hash": _hash(X.tobytes(), y.tobytes(), cols),
+        }
+    return matrizes
+
+
+# --- 2. Busca e Ajuste (processo do pool) ---
+def estimador(algoritmo, params):
+    """
+    Instancia o algoritmo com os hiperparâmetros. n_jobs=1: o paralelismo fica no pool de processos.
+    """
+    if algoritmo == "Ridge":
+        from sklearn.linear_model import Ridge
+        return Ridge(**params)
+    if algoritmo == "RandomForest":
+        from sklearn.ensemble import RandomForestRegressor
+        return RandomForestRegressor(random_state=SEMENTE, n_jobs=1, **params)
+    if algoritmo == "XGBoost":
+        from xgboost import XGBRegressor
+        return XGBRegressor(random_state=SEMENTE, n_jobs=1, **params)
+    raise ValueError(f"Algoritmo desconhecido: {algoritmo}")
+
+
+def combinacoes(grade):
+    nomes = sorted(grade)
+    return [dict(zip(nomes, valores)) for valores in itertools.product(*(grade[n] for n in nomes))]
+
+
+def _ajustar(algoritmo, params, X, y):
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler().fit(X)
+    model = estimador(algoritmo, params).fit(scaler.transform(X), y)
+    return scaler, model
+
+
+def _rmse_dobras(algoritmo, params, X, y, dobras):
+    from sklearn.model_selection import TimeSeriesSplit
+
+    rmses = []
+    for treino, teste in TimeSeriesSplit(n_splits=dobras).split(X):
+        scaler, model = _ajustar(algoritmo, params, X[treino], y[treino])
+        erro = model.predict(scaler.transform(X[teste])) - y[teste]
+        rmses.append(float(np.sqrt(np.mean(erro ** 2))))
+    return rmses
+
+
+def treinar(tarefa):
+    """
+    Busca em grade + reajuste final de uma tarefa. Roda no processo do pool: recebe só arrays e dicts.
+    As dobras já calculadas (mesmo X/y, algoritmo e hiperparâmetros) vêm do cache.
+    """
+    inicio = time.perf_counter()
+    algoritmo, X, y = tarefa["algoritmo"], tarefa["X"], tarefa["y"]
+    pasta_cache = Path(tarefa["pasta_cache"])
+
+    placar, calculadas, em_cache = [], 0, 0
+    for params in combinacoes(tarefa["grade"]):
+        caminho = pasta_cache / f"dobra_{_hash(tarefa['hash'], algoritmo, params, tarefa['dobras'], sklearn.__version__)[:16]}.json"
+        if tarefa["usar_cache"] and caminho.exists():
+            rmses = json.loads(caminho.read_text(encoding="utf-8"))
+            em_cache += 1
+        else:
+            rmses = _rmse_dobras(algoritmo, params, X, y, tarefa["dobras"])
+            escrever_atomico(caminho, json.dumps(rmses).encode("utf-8"))
+            calculadas += 1
+        placar.append({"params": params, "rmse_dobras": rmses, "rmse": float(np.mean(rmses))})
+    busca = time.perf_counter() - inicio
+
+    melhor = min(placar, key=lambda linha: linha["rmse"])
+    scaler, model = _ajustar(algoritmo, melhor["params"], X, y)
+
+    return {
+        "scaler": scaler, "model": model, "melhor": melhor, "placar": placar,
+        "combinacoes_calculadas": calculadas, "combinacoes_em_cache": em_cache,
+        "busca_s": busca, "ajuste_s": time.perf_counter() - inicio - busca, "pid": os.getpid(),
+    }
+
+
+# --- 3. Artefatos ---
+def chave_artefato(segmento, familia, algoritmo):
+    # Nomes que os apps procuram: model_PF.pkl (app.py) e model_PF_Ridge.pkl (app_2.py)
+    return segmento if familia == "nivel" else f"{segmento}_{algoritmo}"
+
+
+def _pickle(objeto):
+    buffer = io.BytesIO()
+    joblib.dump(objeto, buffer)
+    return buffer.getvalue()
+
+
+def conteudos(matriz, resultado):
+    """
+    Bytes dos quatro arquivos de uma chave, no formato dos notebooks (columns: só cabeçalho;
+    last_values: X.iloc[-1].to_csv() com a data na primeira linha).
+    """
+    cols, ultima = matriz["cols"], matriz["X"][-1]
+    last_values = [f",{matriz['datas'][-1]}"] + [f"{col},{float(valor)!r}" for col, valor in zip(cols, ultima)]
+    return {
+        "model": ("pkl", _pickle(resultado["model"])),
+        "scaler": ("pkl", _pickle(resultado["scaler"])),
+        "columns": ("csv", (",".join(cols) + "\n").encode("utf-8")),
+        "last_values": ("csv", ("\n".join(last_values) + "\n").encode("utf-8")),
+    }
+
+
+def gravar(base_path, chave, arquivos):
+    """
+    Grava (troca atômica) só os arquivos cujo conteúdo mudou. Devolve a lista dos regravados.
+    """
+    base_path = Path(base_path)
+    base_path.mkdir(parents=True, exist_ok=True)
+    regravados = []
+    for prefixo, (ext, conteudo) in arquivos.items():
+        caminho = base_path / f"{prefixo}_{chave}.{ext}"
+        if caminho.exists() and caminho.read_bytes() == conteudo:
+            continue
+        escrever_atomico(caminho, conteudo)
+        regravados.append(caminho.name)
+    return regravados
+
+
+# --- 4. Orquestração ---
+def tarefas(segmentos, algoritmos):
+    """
+    Combinações segmento/família/algoritmo, das mais caras para as mais baratas (balanceia o pool).
+    """
+    custo = {"XGBoost": 0, "RandomForest": 1, "Ridge": 2}
+    lista = [
+        (segmento, familia, algoritmo)
+        for familia, algos in FAMILIAS.items()
+        for algoritmo in algos if algoritmo in algoritmos
+        for segmento in segmentos
+    ]
+    return sorted(lista, key=lambda t: custo[t[2]])
+
+
+def disponiveis(algoritmos):
+    # XGBoost é opcional: sem o pacote, as tarefas dele ficam de fora (o app_2 mostra 'não encontrado')
+    return [a for a in algoritmos if a != "XGBoost" or importlib.util.find_spec("xgboost") is not None]
+
+
+def executar(csv_path=CSV_MODELAGEM, base_path="models", segmentos=None, algoritmos=None,
+             workers=None, pasta_cache=PASTA_CACHE, usar_cache=True, grades=None, dobras=N_DOBRAS):
+    """
+    Roda o pipeline inteiro. Devolve o relatório: tempos por etapa e, por chave, melhores
+    hiperparâmetros, RMSE da validação cruzada, tempos e arquivos regravados.
+    """
+    segmentos = list(segmentos or TARGETS)
+    algoritmos = disponiveis(algoritmos or FAMILIAS["delta"])
+    grades = grades or GRADES
+    Path(pasta_cache).mkdir(parents=True, exist_ok=True)
+    etapas = {}
+    inicio_total = time.perf_counter()
+
+    inicio = time.perf_counter()
+    matrizes = carregar_features(csv_path, segmentos, FAMILIAS, pasta_cache, usar_cache)
+    etapas["features"] = time.perf_counter() - inicio
+
+    # Tarefas cujo resultado final já está no cache (mesmo X/y, grade, dobras e sklearn) não vão ao pool
+    inicio = time.perf_counter()
+    resultados, pendentes = {}, {}
+    for segmento, familia, algoritmo in tarefas(segmentos, algoritmos):
+        matriz = matrizes.get((segmento, familia))
+        if matriz is None:
+            continue
+        chave = chave_artefato(segmento, familia, algoritmo)
+        assinatura = _hash(matriz["hash"], algoritmo, grades[algoritmo], dobras, sklearn.__version__)
+        caminho = Path(pasta_cache) / f"resultado_{assinatura[:16]}.pkl"
+        if usar_cache and caminho.exists():
+            with open(caminho, "rb") as f:
+                resultados[chave] = dict(pickle.load(f), origem="cache")
+            continue
+        pendentes[chave] = (caminho, {
+            "algoritmo": algoritmo, "X": matriz["X"], "y": matriz["y"], "hash": matriz["hash"],
+            "grade": grades[algoritmo], "dobras": dobras,
+            "pasta_cache": str(pasta_cache), "usar_cache": usar_cache,
+        })
+
+    if pendentes:
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(pendentes))) as executor:
+            futuros = {executor.submit(treinar, tarefa): chave for chave, (_, tarefa) in pendentes.items()}
+            for futuro in as_completed(futuros):
+                chave = futuros[futuro]
+                resultado = futuro.result()
+                escrever_atomico(pendentes[chave][0], pickle.dumps(resultado, protocol=pickle.HIGHEST_PROTOCOL))
+                resultados[chave] = dict(resultado, origem="treinado")
+    etapas["treino"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    gravados = {}
+    for segmento, familia, algoritmo in tarefas(segmentos, algoritmos):
+        chave = chave_artefato(segmento, familia, algoritmo)
+        if chave in resultados:
+            gravados[chave] = gravar(base_path, chave, conteudos(matrizes[(segmento, familia)], resultados[chave]))
+    etapas["gravacao"] = time.perf_counter() - inicio
+
+    # Pasta migrada: chaves alteradas (ou ainda fora do índice) ganham bundle novo
+    inicio = time.perf_counter()
+    registro = ler_registro(base_path)
+    registradas = []
+    if registro:
+        for chave, arquivos in gravados.items():
+            if arquivos or chave not in registro:
+                registrar_soltos(chave, base_path)
+                registradas.append(chave)
+    etapas["registro"] = time.perf_counter() - inicio
+    etapas["total"] = time.perf_counter() - inicio_total
+
+    return {
+        "etapas": {etapa: round(segundos, 4) for etapa, segundos in etapas.items()},
+        "workers": min(workers or os.cpu_count() or 1, len(pendentes)),
+        "registradas": registradas,
+        "modelos": {
+            chave: {
+                "origem": resultado["origem"],
+                "params": resultado["melhor"]["params"],
+                "rmse_cv": round(resultado["melhor"]["rmse"], 6),
+                "combinacoes": len(resultado["placar"]),
+                "combinacoes_calculadas": resultado["combinacoes_calculadas"] if resultado["origem"] == "treinado" else 0,
+                "busca_s": round(resultado["busca_s"], 4) if resultado["origem"] == "treinado" else 0.0,
+                "ajuste_s": round(resultado["ajuste_s"], 4) if resultado["origem"] == "treinado" else 0.0,
+                "arquivos": gravados.get(chave, []),
+            }
+            for chave, resultado in resultados.items()
+        },
+    }
+
+
+# --- 5. Linha de Comando ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Treina todos os segmentos/algoritmos em paralelo.")
+    parser.add_argument("--csv", default=CSV_MODELAGEM, help="Base de modelagem")
+    parser.add_argument("--models", default="models", help="Pasta dos artefatos dos apps")
+    parser.add_argument("--segmentos", nargs="+", default=list(TARGETS), choices=list(TARGETS))
+    parser.add_argument("--algoritmos", nargs="+", default=list(FAMILIAS["delta"]), choices=list(FAMILIAS["delta"]))
+    parser.add_argument("--workers", type=int, default=None, help="Processos do pool (padrão: núcleos)")
+    parser.add_argument("--dobras", type=int, default=N_DOBRAS, help="Dobras do TimeSeriesSplit")
+    parser.add_argument("--cache", default=PASTA_CACHE, help="Pasta do cache de features/dobras/resultados")
+    parser.add_argument("--sem-cache", action="store_true", help="Ignora o cache (mas o regrava)")
+    parser.add_argument("--relatorio", default=None, help="Grava o relatório de tempos em JSON")
+    args = parser.parse_args(argv)
+
+    faltando = sorted(set(args.algoritmos) - set(disponiveis(args.algoritmos)))
+    if faltando:
+        print(f"Aviso: {', '.join(faltando)} não instalado(s); essas tarefas ficam de fora.")
+
+    relatorio = executar(args.csv, args.models, args.segmentos, args.algoritmos, args.workers,
+                         args.cache, not args.sem_cache, dobras=args.dobras)
+
+    print(f"{'chave':<24} {'origem':<9} {'RMSE cv':>9} {'busca s':>8} {'ajuste s':>8}  hiperparâmetros / arquivos")
+    for chave, info in sorted(relatorio["modelos"].items()):
+        params = ", ".join(f"{k}={v}" for k, v in info["params"].items())
+        arquivos = f"  -> {len(info['arquivos'])} arquivo(s)" if info["arquivos"] else ""
+        print(f"{chave:<24} {info['origem']:<9} {info['rmse_cv']:>9.4f} {info['busca_s']:>8.2f} {info['ajuste_s']:>8.2f}  {params}{arquivos}")
+    print(f"\nTempos por etapa ({relatorio['workers']} processo(s)):")
+    for etapa, segundos in relatorio["etapas"].items():
+        print(f"  {etapa:<10} {segundos:>8.3f} s")
+    if relatorio["registradas"]:
+        print(f"Registro: {', '.join(relatorio['registradas'])}")
+
+    if args.relatorio:
+        escrever_atomico(args.relatorio, json.dumps(relatorio, indent=2, ensure_ascii=False).encode("utf-8"))
+
+
+if __name__ == "__main__":
+    main()
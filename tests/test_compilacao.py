@@ -0,0 +1,153 @@
+"""
+Paridade dos caminhos compilados (src.compilacao) com o predict nativo: os Ridge dos models/ e
+RandomForest/XGBoost pequenos treinados aqui (1 e 100 mil linhas, empates, NaN e a delegação ao nativo).
+Só resultados: a comparação de tempo compilado x nativo fica nos casos arvores/* do benchmarks.suite.
+
+Uso:
+    python -m pytest -q tests/test_compilacao.py
+"""
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pytest
+
+from src.compilacao import ModeloLinear, compilar_linear
+from src.registro import arquivo_segmento
+from src.simulacao import transform
+
+PASTA_MODELOS = Path(__file__).resolve().parents[1] / "models"
+MODELOS = sorted(PASTA_MODELOS.glob("model_*.pkl"))
+
+
+# --- 1. Lineares (Ridge dos models/) ---
+@pytest.mark.parametrize("path_model", MODELOS, ids=lambda p: p.stem)
+def test_linear_compilado_igual_scaler_mais_predict(path_model):
+    chave = path_model.stem[len("model_"):]
+    model = joblib.load(path_model)
+    scaler = joblib.load(arquivo_segmento(PASTA_MODELOS, "scaler", chave, "pkl"))
+
+    compilado = compilar_linear(model, scaler)
+    assert isinstance(compilado, ModeloLinear)
+
+    rng = np.random.default_rng(0)
+    X = scaler.mean_ + scaler.scale_ * rng.uniform(-3, 3, size=(1000, scaler.n_features_in_))
+    esperado = model.predict(transform(scaler, X))
+    np.testing.assert_allclose(compilado.predict(X), esperado, rtol=1e-9, atol=1e-9)
+    # Uma linha só (o caminho do slider)
+    np.testing.assert_allclose(compilado.predict(X[:1]), esperado[:1], rtol=1e-9, atol=1e-9)
+
+
+# --- 2. Árvores (RandomForest e XGBoost treinados aqui) ---
+N_FEATURES = 8
+
+
+def _dados(n, seed, faltantes=0.0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, N_FEATURES))
+    if faltantes:
+        X[rng.random(X.shape) < faltantes] = np.nan
+    return X
+
+
+def _floresta():
+    from sklearn.ensemble import RandomForestRegressor
+
+    X = _dados(2000, 0, faltantes=0.1)
+    y = np.nansum(X[:, :3], axis=1) + np.random.default_rng(1).normal(size=len(X))
+    return RandomForestRegressor(n_estimators=30, max_depth=8, n_jobs=1, random_state=0).fit(X, y)
+
+
+def _xgboost():
+    xgboost = pytest.importorskip("xgboost")
+    X = _dados(2000, 0, faltantes=0.1)
+    y = np.nansum(X[:, :3], axis=1) + np.random.default_rng(1).normal(size=len(X))
+    return xgboost.XGBRegressor(n_estimators=50, max_depth=6, n_jobs=1, random_state=0).fit(X, y)
+
+
+@pytest.fixture(scope="module", params=["floresta", "xgboost"])
+def arvores(request):
+    """
+    (modelo nativo, compilado, tolerância): o XGBoost soma as folhas em float32.
+    """
+    from src.compilacao import compilar_floresta, compilar_xgboost
+
+    if request.param == "floresta":
+        model = _floresta()
+        return model, compilar_floresta(model), 1e-12
+    model = _xgboost()
+    return model, compilar_xgboost(model), 1e-5
+
+
+def test_arvores_uma_linha(arvores):
+    model, compilado, tol = arvores
+    X = _dados(1, 2)
+    np.testing.assert_allclose(compilado.predict(X), model.predict(X), rtol=0, atol=tol)
+
+
+def test_arvores_cem_mil_linhas(arvores):
+    model, compilado, tol = arvores
+    X = _dados(100_000, 3)
+    esperado = model.predict(X)
+    np.testing.assert_allclose(compilado.percorrer(X), esperado, rtol=0, atol=tol)
+    # Acima de linhas_nativo o predict é o nativo: mesmo resultado, bit a bit
+    np.testing.assert_array_equal(compilado.predict(X), esperado)
+
+
+def test_arvores_empate_no_limiar(arvores):
+    model, compilado, tol = arvores
+    rng = np.random.default_rng(4)
+    X = _dados(2000, 4)
+    # Cada coluna recebe limiares de nós que dividem por ela: x == limiar decide o lado
+    for j in range(N_FEATURES):
+        limiares = compilado.limiar[(compilado.feature == j) & np.isfinite(compilado.limiar)]
+        if len(limiares):
+            X[:, j] = rng.choice(limiares, size=len(X))
+    np.testing.assert_allclose(compilado.percorrer(X), model.predict(X), rtol=0, atol=tol)
+
+
+def test_arvores_faltantes_seguem_o_padrao_do_no(arvores):
+    model, compilado, tol = arvores
+    # Treinados com NaN: há nós que mandam o faltante para cada lado
+    internos = np.isfinite(compilado.limiar)
+    assert compilado.faltante_esquerda is not None
+    assert compilado.faltante_esquerda[internos].any() and not compilado.faltante_esquerda[internos].all()
+
+    X = _dados(5000, 5, faltantes=0.3)
+    X[0] = np.nan
+    np.testing.assert_allclose(compilado.percorrer(X), model.predict(X), rtol=0, atol=tol)
+
+
+class _Contador:
+    """
+    Embrulha o modelo nativo e conta os predicts que chegam nele.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.chamadas = 0
+
+    def predict(self, X):
+        self.chamadas += 1
+        return self.model.predict(X)
+
+
+def test_arvores_delegacao_em_linhas_nativo(arvores):
+    from src.compilacao import LINHAS_NATIVO_FLORESTA, LINHAS_NATIVO_XGBOOST, ModeloArvores
+
+    model, compilado, tol = arvores
+    assert compilado.linhas_nativo == (LINHAS_NATIVO_XGBOOST if compilado.estrito else LINHAS_NATIVO_FLORESTA)
+
+    contador = _Contador(model)
+    espiao = ModeloArvores.de_arrays(
+        {nome: getattr(compilado, nome) for nome in ("feature", "limiar", "filhos", "valor", "raizes", "faltante_esquerda")},
+        compilado.escala, compilado.base, compilado.estrito, compilado.n_features_in_, compilado.profundidade,
+        nativo=contador, linhas_nativo=compilado.linhas_nativo)
+
+    X = _dados(compilado.linhas_nativo + 1, 6)
+    # Exatamente linhas_nativo: ainda o percurso compilado
+    np.testing.assert_allclose(espiao.predict(X[:-1]), model.predict(X[:-1]), rtol=0, atol=tol)
+    assert contador.chamadas == 0
+    # Uma linha a mais: o nativo
+    np.testing.assert_allclose(espiao.predict(X), model.predict(X), rtol=0, atol=tol)
+    assert contador.chamadas == 1